@@ -0,0 +1,292 @@
+"""End-to-end pipeline benchmark on synthetic media.
+
+Times each stage of the CaptionLab pipeline and writes the results as JSON
+(benchmarks/results/ by default) so runs can be compared across versions:
+
+  decode       whisper.audio.load_audio on the fixture (needs ffmpeg)
+  model_load   loading each Whisper model, per backend
+  transcribe   transcribe_media per model size and backend (workers.backends),
+               with the speed-up of each backend over openai-whisper
+  cascade      with --refine-model: each model as the draft of a two-pass
+               cascade, with the share of audio the larger model re-decoded
+  clips        with --batch-clips: that many short clips transcribed one
+               transcribe_media call at a time, then together with
+               transcribe_batch_media, in clips per hour
+  translate    translate_segments against a local stub translator
+  mt           with --translators: cues per second of each translation
+               backend (workers.translators) on the same cues, with the
+               speed-up of each over the online Google path
+  segments     SegmentTable build time and memory against a list of dicts
+  words        word-timing storage per word, checked against WORD_BYTES_BUDGET
+  resegment    re-cutting segments into readable cues (with and without word
+               timings; .long: every segment over the limits, ~40 words each)
+  serialize    write_srt
+  overlay      subtitle lookups at 10 Hz over the whole duration
+
+Audio stages report a real-time factor (processing seconds / media
+seconds, lower is faster). Every stage records the process peak RSS
+after it ran.
+
+    python benchmarks/pipeline_benchmark.py --durations 30 300 --models tiny base
+    python benchmarks/pipeline_benchmark.py --models small --backends whisper ctranslate2 --threads 4
+    python benchmarks/pipeline_benchmark.py --models tiny base --refine-model medium
+    python benchmarks/pipeline_benchmark.py --durations 30 --models base --batch-clips 16 --clip-seconds 10
+    python benchmarks/pipeline_benchmark.py --skip-transcription   # text stages only
+    python benchmarks/pipeline_benchmark.py --skip-transcription --translators google marian --mt-cues 500
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic_media import ensure_fixtures, make_segments
+from utils.helpers import find_segment_text
+from utils.memory import peak_rss_mb
+from utils.resegment import resegment
+from utils.segment_table import WORD_BYTES_BUDGET, SegmentTable
+from workers.backends import DEFAULT_BACKEND, get_backend
+from workers.pipeline import (
+    DEFAULT_BATCH_SIZE, acquire_whisper_model, checkout_whisper_model, release_whisper_model, transcribe_batch_media,
+    transcribe_media, translate_segments, write_srt
+)
+from workers.translators import GOOGLE_TRANSLATOR, get_translator
+
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SEGMENTS_PER_MINUTE = 20  # Typical Whisper segment density for dialogue
+OVERLAY_TICK_SECONDS = 0.1  # VideoPlayer.subtitle_timer interval
+
+
+class StubTranslator:
+    """Offline stand-in for GoogleTranslator with an optional per-call latency."""
+    latency = 0.0
+
+    def __init__(self, source="auto", target="en"):
+        self.target = target
+
+    def translate(self, text):
+        if self.latency:
+            time.sleep(self.latency)
+        return f"[{self.target}] {text}"
+
+
+def allocated_bytes(function):
+    """Bytes still allocated by the object function() builds."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        value = function()
+        return value, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def timed(results, stage, function, media_seconds=None, **extra):
+    started = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - started
+    entry = {"stage": stage, "seconds": round(seconds, 6), "peak_rss_mb": peak_rss_mb()}
+    if media_seconds:
+        entry["media_seconds"] = media_seconds
+        entry["rtf"] = round(seconds / media_seconds, 6)
+    entry.update(extra)
+    results.append(entry)
+    rtf = f"  RTF {entry['rtf']:.4f}" if "rtf" in entry else ""
+    print(f"  {stage:<24} {seconds * 1000:10.1f} ms{rtf}")
+    return value
+
+
+def clip_throughput(results, models, backends, threads, clips, clip_seconds):
+    """Clips per hour for clips short enough to batch, one at a time and batched."""
+    audio_path, video_path = ensure_fixtures(FIXTURES_DIR, clip_seconds)
+    media_path = video_path or audio_path
+    print(f"{clips} clips of {clip_seconds}s")
+    for model_name in models:
+        for backend in backends:
+            suffix = model_name if backend == DEFAULT_BACKEND else f"{backend}.{model_name}"
+            with checkout_whisper_model(model_name, backend, threads) as model:
+                timed(results, f"clips.sequential.{suffix}",
+                      lambda: [transcribe_media(model, media_path, "en", backend=backend, threads=threads)
+                               for _ in range(clips)],
+                      clips * clip_seconds, clips=clips, clip_seconds=clip_seconds, backend=backend)
+                sequential = results[-1]
+                items = [(media_path, "en", None)] * DEFAULT_BATCH_SIZE
+                timed(results, f"clips.batched.{suffix}",
+                      lambda: [transcribe_batch_media(model, items[:min(DEFAULT_BATCH_SIZE, clips - first)],
+                                                      backend=backend, threads=threads)
+                               for first in range(0, clips, DEFAULT_BATCH_SIZE)],
+                      clips * clip_seconds, clips=clips, clip_seconds=clip_seconds, backend=backend,
+                      batch_size=DEFAULT_BATCH_SIZE)
+                batched = results[-1]
+            for entry in (sequential, batched):
+                entry["clips_per_hour"] = round(clips * 3600 / entry["seconds"], 1)
+            batched["speedup"] = round(sequential["seconds"] / batched["seconds"], 2)
+            print(f"  {'':<24} {sequential['clips_per_hour']:.0f} -> {batched['clips_per_hour']:.0f} clips/hour "
+                  f"({batched['speedup']:.2f}x)")
+
+
+def translation_throughput(results, translators, target, cues, threads):
+    """Cues per second of each translator on the same English cues, after a one-cue warm-up."""
+    segments = SegmentTable.from_segments(make_segments(cues, cues * 3.0))
+    subtitle_data = {"text": segments.full_text(), "segments": segments, "language": "en"}
+    warm_up = {"text": "", "segments": SegmentTable.from_segments(make_segments(1, 3.0)), "language": "en"}
+    print(f"{cues} cues en -> {target}")
+    baseline = None
+    for name in translators:
+        translate_segments(warm_up, target, translator=name, threads=threads)  # Model load, first connection
+        timed(results, f"mt.{name}", lambda: translate_segments(subtitle_data, target, translator=name, threads=threads),
+              cues=cues, target=target, threads=threads)
+        entry = results[-1]
+        entry["cues_per_second"] = round(cues / entry["seconds"], 1)
+        if name == GOOGLE_TRANSLATOR:
+            baseline = entry["seconds"]
+        elif baseline:
+            entry["speedup"] = round(baseline / entry["seconds"], 2)
+        print(f"  {'':<24} {entry['cues_per_second']:.1f} cues/s"
+              + (f" ({entry['speedup']:.2f}x the online path)" if "speedup" in entry else ""))
+
+
+def run_benchmark(durations, models, skip_transcription, stub_latency, backends=(DEFAULT_BACKEND,), threads=None,
+                  refine_model=None, batch_clips=0, clip_seconds=10):
+    StubTranslator.latency = stub_latency
+    results = []
+    if batch_clips and not skip_transcription:
+        clip_throughput(results, models, backends, threads, batch_clips, clip_seconds)
+    for duration in durations:
+        print(f"Duration {duration}s")
+        if not skip_transcription:
+            audio_path, video_path = ensure_fixtures(FIXTURES_DIR, duration)
+            media_path = video_path or audio_path
+            import whisper
+            timed(results, "decode", lambda: whisper.audio.load_audio(media_path), duration, duration=duration)
+            for model_name in models:
+                baseline_rtf = None
+                for backend in backends:
+                    # Stage names of the default backend are unchanged, so older result files still compare
+                    suffix = model_name if backend == DEFAULT_BACKEND else f"{backend}.{model_name}"
+                    model = timed(results, f"model_load.{suffix}",
+                                  lambda: acquire_whisper_model(model_name, backend, threads), duration=duration)
+                    try:
+                        data = timed(results, f"transcribe.{suffix}",
+                                     lambda: transcribe_media(model, media_path, "en", backend=backend, threads=threads),
+                                     duration, duration=duration, backend=backend, threads=threads)
+                    finally:
+                        release_whisper_model(model_name, model, backend, threads)
+                    results[-1]["segments"] = len(data["segments"])
+                    if backend == DEFAULT_BACKEND:
+                        baseline_rtf = results[-1]["rtf"]
+                    elif baseline_rtf:
+                        results[-1]["speedup"] = round(baseline_rtf / results[-1]["rtf"], 2)
+                        print(f"  {'':<24} {results[-1]['speedup']:.2f}x faster than {DEFAULT_BACKEND}")
+                if refine_model and refine_model != model_name:
+                    backend = backends[0]
+                    with checkout_whisper_model(model_name, backend, threads) as model:
+                        data = timed(results, f"cascade.{model_name}+{refine_model}",
+                                     lambda: transcribe_media(model, media_path, "en", backend=backend, threads=threads,
+                                                              refine_model=refine_model),
+                                     duration, duration=duration, backend=backend)
+                    results[-1].update(segments=len(data["segments"]), **data["cascade"])
+                    print(f"  {'':<24} {data['cascade']['spans']} span(s), "
+                          f"{data['cascade']['refined_fraction']:.0%} of the audio re-decoded")
+
+        segment_dicts = make_segments(max(1, int(duration / 60 * SEGMENTS_PER_MINUTE)), duration)
+        segments = timed(results, "segments.build", lambda: SegmentTable.from_segments(segment_dicts),
+                         duration=duration, segments=len(segment_dicts))
+        results[-1]["table_bytes"] = allocated_bytes(lambda: SegmentTable.from_segments(segment_dicts))[1]
+        results[-1]["dict_list_bytes"] = allocated_bytes(lambda: [dict(s) for s in segments])[1]
+        word_dicts = make_segments(len(segment_dicts), duration, with_words=True)
+        word_table, word_bytes = allocated_bytes(lambda: SegmentTable.from_segments(word_dicts))
+        word_count = len(word_table.all_words())
+        timed(results, "words.build", lambda: SegmentTable.from_segments(word_dicts), duration=duration, words=word_count)
+        bytes_per_word = word_table.all_words().nbytes() / max(word_count, 1)
+        results[-1].update(table_bytes=word_bytes, bytes_per_word=round(bytes_per_word, 1),
+                           within_budget=bytes_per_word <= WORD_BYTES_BUDGET)
+        timed(results, "resegment", lambda: resegment(segments), duration=duration, segments=len(segments))
+        timed(results, "resegment.words", lambda: resegment(word_table), duration=duration, segments=len(word_table))
+        long_table = SegmentTable.from_segments(make_segments(len(segment_dicts), duration, words_per_segment=40, with_words=True))
+        timed(results, "resegment.long", lambda: resegment(long_table), duration=duration, segments=len(long_table),
+              words=len(long_table.all_words()))
+        print(f"  {'words.memory':<24} {word_bytes / 1e6:10.2f} MB for {word_count} words "
+              f"({bytes_per_word:.1f} B/word, budget {WORD_BYTES_BUDGET})")
+        subtitle_data = {"text": " ".join(s["text"] for s in segments), "segments": segments, "language": "en"}
+        timed(results, "translate.stub", lambda: translate_segments(subtitle_data, "fr", translator_factory=StubTranslator),
+              duration, duration=duration, segments=len(segments), stub_latency=stub_latency)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            srt_path = os.path.join(tmp_dir, "bench.srt")
+            timed(results, "serialize.srt", lambda: write_srt(segments, srt_path), duration, duration=duration,
+                  segments=len(segments))
+        ticks = int(duration / OVERLAY_TICK_SECONDS)
+        timed(results, "overlay.lookup", lambda: [find_segment_text(segments, i * OVERLAY_TICK_SECONDS) for i in range(ticks)],
+              duration, duration=duration, segments=len(segments), lookups=ticks)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CaptionLab pipeline on synthetic media.")
+    parser.add_argument("--durations", type=int, nargs="+", default=[30, 120], help="Media durations in seconds")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base"], help="Whisper model sizes to transcribe with")
+    parser.add_argument("--backends", nargs="+", default=[DEFAULT_BACKEND],
+                        help="Transcription backends to compare (installed ones only)")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads per transcription (default: backend's own)")
+    parser.add_argument("--refine-model", help="Also run each model as the draft of a cascade refined with this model")
+    parser.add_argument("--batch-clips", type=int, default=0,
+                        help="Also measure clips/hour for this many short clips, one at a time and batched")
+    parser.add_argument("--clip-seconds", type=int, default=10, help="Length of each clip for --batch-clips")
+    parser.add_argument("--skip-transcription", action="store_true", help="Only run the text stages (no whisper/ffmpeg)")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Simulated network latency per translation call")
+    parser.add_argument("--translators", nargs="+", default=[],
+                        help="Also measure translation throughput of these translators (google first for the speed-up)")
+    parser.add_argument("--mt-target", default="fr", help="Target language for --translators")
+    parser.add_argument("--mt-cues", type=int, default=200, help="Cues translated for --translators")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/pipeline-<revision>-<time>.json)")
+    args = parser.parse_args(argv)
+
+    backends = [name for name in args.backends if get_backend(name).available()]
+    for name in sorted(set(args.backends) - set(backends)):
+        print(f"Skipping backend '{name}': {', '.join(get_backend(name).requires)} not installed")
+    results = run_benchmark(args.durations, args.models, args.skip_transcription, args.stub_latency_ms / 1000.0,
+                            backends, args.threads, args.refine_model, args.batch_clips, args.clip_seconds)
+    translators = [name for name in args.translators if get_translator(name).available()]
+    for name in sorted(set(args.translators) - set(translators)):
+        print(f"Skipping translator '{name}': {', '.join(get_translator(name).requires)} not installed")
+    if translators:
+        translation_throughput(results, translators, args.mt_target, args.mt_cues, args.threads)
+    revision = git_revision()
+    report = {
+        "benchmark": "pipeline",
+        "revision": revision,
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"pipeline-{revision or 'local'}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
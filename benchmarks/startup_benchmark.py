@@ -0,0 +1,141 @@
+"""Cold-start benchmark for CaptionLab.
+
+Runs each measurement in a fresh interpreter and fails (exit code 1) when
+a median goes over its budget in startup_budgets.json, or when importing
+the application pulls in one of the heavy libraries that must only load
+on first use. Window runs use the built-in startup profiler
+(CAPTIONLAB_PROFILE_STARTUP) and `-X importtime`, so each startup phase is
+checked against its own budget; --report writes all of it as JSON.
+
+    python benchmarks/startup_benchmark.py            # import + window
+    python benchmarks/startup_benchmark.py --no-window --runs 10
+    python benchmarks/startup_benchmark.py --report startup_report.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SCRIPT = os.path.join(ROOT, "version2.py")
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budgets.json")
+sys.path.insert(0, ROOT)
+
+from utils.startup_profiler import PROFILE_ENV, parse_importtime
+
+TOP_IMPORTS = 15  # Slowest modules kept in the report
+FORBIDDEN_AT_IMPORT = ("whisper", "torch", "deep_translator", "google.generativeai", "nltk", "sumy")
+
+IMPORT_PROBE = (
+    "import json, sys, time; t = time.perf_counter(); import version2; "
+    "print(json.dumps({'seconds': time.perf_counter() - t, "
+    "'heavy': [m for m in %r if m in sys.modules]}))" % (FORBIDDEN_AT_IMPORT,)
+)
+
+
+def measure_import():
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_window():
+    """Launch the app once; return wall time, the profiler report and -X importtime data."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        report_path = os.path.join(tmp_dir, "startup.json")
+        env = dict(os.environ, CAPTIONLAB_EXIT_AFTER_STARTUP="1")
+        env[PROFILE_ENV] = report_path
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        started = time.perf_counter()
+        process = subprocess.run([sys.executable, "-X", "importtime", APP_SCRIPT], cwd=ROOT, env=env,
+                                 check=True, capture_output=True, text=True)
+        seconds = time.perf_counter() - started
+        with open(report_path, encoding="utf-8") as f:
+            report = json.load(f)
+    report["wall_seconds"] = seconds
+    report["imports"] = parse_importtime(process.stderr)
+    return report
+
+
+def slowest_imports(reports, count=TOP_IMPORTS):
+    """Median cumulative import time of the slowest top-level modules."""
+    names = {name for report in reports for name in report["imports"]}
+    medians = {}
+    for name in names:
+        values = [report["imports"][name]["cumulative"] for report in reports if name in report["imports"]]
+        medians[name] = statistics.median(values)
+    return dict(sorted(medians.items(), key=lambda item: item[1], reverse=True)[:count])
+
+
+def load_budgets(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure CaptionLab cold start.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budgets", default=BUDGETS_FILE, help="JSON file with import/window/phase budgets in seconds")
+    parser.add_argument("--no-window", action="store_true", help="Skip the window measurement (no display/VLC)")
+    parser.add_argument("--report", help="Write the measurements to this JSON file")
+    args = parser.parse_args(argv)
+
+    budgets = load_budgets(args.budgets)
+    failures = []
+    summary = {"runs": args.runs, "budgets": budgets}
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_median = statistics.median(r["seconds"] for r in imports)
+    summary["import_seconds"] = import_median
+    print(f"import version2: median {import_median * 1000:.0f} ms over {args.runs} runs (budget {budgets['import'] * 1000:.0f} ms)")
+    if import_median > budgets["import"]:
+        failures.append("import time over budget")
+    heavy = sorted({m for r in imports for m in r["heavy"]})
+    if heavy:
+        print(f"Heavy modules imported at startup: {', '.join(heavy)}")
+        failures.append("heavy modules imported eagerly")
+
+    if not args.no_window:
+        reports = [measure_window() for _ in range(args.runs)]
+        window_median = statistics.median(r["wall_seconds"] for r in reports)
+        summary["window_seconds"] = window_median
+        print(f"window shown: median {window_median * 1000:.0f} ms over {args.runs} runs (budget {budgets['window'] * 1000:.0f} ms)")
+        if window_median > budgets["window"]:
+            failures.append("window time over budget")
+
+        summary["phases"] = {}
+        phase_names = sorted({name for r in reports for name in r["phases"]},
+                             key=lambda name: reports[0]["phases"].get(name, {}).get("start", 0))
+        for name in phase_names:
+            median = statistics.median(r["phases"][name]["seconds"] for r in reports if name in r["phases"])
+            budget = budgets["phases"].get(name)
+            summary["phases"][name] = median
+            status = ""
+            if budget is not None and median > budget:
+                status = f"  OVER BUDGET ({budget * 1000:.0f} ms)"
+                failures.append(f"phase '{name}' over budget")
+            print(f"  {name:<28} {median * 1000:8.1f} ms{status}")
+        summary["marks"] = reports[0]["marks"]
+        summary["slowest_imports"] = slowest_imports(reports)
+        print("Slowest imports (cumulative):")
+        for name, seconds in summary["slowest_imports"].items():
+            print(f"  {name:<40} {seconds * 1000:8.1f} ms")
+
+    summary["failures"] = failures
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Synthetic media for benchmarks: speech-like audio and a blank video.
+
+Nothing is downloaded. The audio is a 16 kHz mono WAV of short voiced
+"syllables" (a pitch-varying tone with a few harmonics and an amplitude
+envelope) separated by pauses, which exercises Whisper's decoder roughly
+like speech does. The video is a black frame muxed with that audio by
+ffmpeg, when ffmpeg is on the PATH.
+"""
+import math
+import os
+import random
+import shutil
+import struct
+import subprocess
+import wave
+
+SAMPLE_RATE = 16000
+
+
+def _syllable(duration, pitch, rng):
+    count = int(duration * SAMPLE_RATE)
+    harmonics = [(1, 1.0), (2, 0.5), (3, 0.25), (4, 0.12)]
+    vibrato = rng.uniform(3.0, 6.0)
+    samples = []
+    phase = 0.0
+    for i in range(count):
+        t = i / SAMPLE_RATE
+        envelope = math.sin(math.pi * i / count)  # Attaque et chute douces
+        frequency = pitch * (1 + 0.03 * math.sin(2 * math.pi * vibrato * t))
+        phase += 2 * math.pi * frequency / SAMPLE_RATE
+        value = sum(weight * math.sin(k * phase) for k, weight in harmonics)
+        samples.append(0.25 * envelope * value)
+    return samples
+
+
+def write_speech_like_wav(path, duration_seconds, seed=0):
+    """Write a WAV of the requested duration and return its path."""
+    rng = random.Random(seed)
+    total = int(duration_seconds * SAMPLE_RATE)
+    written = 0
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        while written < total:
+            if rng.random() < 0.15:
+                chunk = [0.0] * int(rng.uniform(0.2, 0.8) * SAMPLE_RATE)  # Pause entre les "phrases"
+            else:
+                chunk = _syllable(rng.uniform(0.12, 0.35), rng.uniform(110, 240), rng)
+            chunk = chunk[:total - written]
+            noise = [0.01 * rng.uniform(-1, 1) for _ in chunk]
+            wav.writeframes(b"".join(struct.pack("<h", int(32767 * max(-1.0, min(1.0, s + n)))) for s, n in zip(chunk, noise)))
+            written += len(chunk)
+    return path
+
+
+def write_blank_video(path, audio_path, duration_seconds, size="320x240"):
+    """Mux a black video track with the audio; return the path, or None without ffmpeg."""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    subprocess.run([
+        ffmpeg, "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"color=c=black:s={size}:d={duration_seconds}:r=10",
+        "-i", audio_path, "-shortest", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", path
+    ], check=True)
+    return path
+
+
+def make_segments(count, duration_seconds, words_per_segment=9, seed=0, with_words=False):
+    """Whisper-shaped segment dicts covering duration_seconds, for the text stages.
+
+    with_words adds Whisper-style "words" entries (word, start, end, probability).
+    """
+    rng = random.Random(seed)
+    vocabulary = ["the", "video", "shows", "how", "we", "build", "caption", "tools", "for", "editors",
+                  "and", "translate", "every", "line", "into", "several", "languages", "quickly"]
+    step = duration_seconds / max(count, 1)
+    segments = []
+    for i in range(count):
+        words = [rng.choice(vocabulary) for _ in range(words_per_segment)]
+        segment = {
+            "id": i + 1,
+            "start": round(i * step, 3),
+            "end": round(i * step + step * 0.9, 3),
+            "text": " ".join(words).capitalize() + "."
+        }
+        if with_words:
+            word_step = (segment["end"] - segment["start"]) / words_per_segment
+            segment["words"] = [{"word": " " + word, "start": round(segment["start"] + j * word_step, 3),
+                                 "end": round(segment["start"] + (j + 1) * word_step, 3),
+                                 "probability": round(rng.uniform(0.5, 1.0), 3)}
+                                for j, word in enumerate(words)]
+        segments.append(segment)
+    return segments
+
+
+def ensure_fixtures(folder, duration_seconds):
+    """Create (or reuse) the audio and video fixtures for one duration."""
+    os.makedirs(folder, exist_ok=True)
+    audio_path = os.path.join(folder, f"speech_like_{duration_seconds}s.wav")
+    video_path = os.path.join(folder, f"blank_{duration_seconds}s.mp4")
+    if not os.path.exists(audio_path):
+        write_speech_like_wav(audio_path, duration_seconds, seed=duration_seconds)
+    if not os.path.exists(video_path):
+        video_path = write_blank_video(video_path, audio_path, duration_seconds)
+    return audio_path, video_path
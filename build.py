@@ -1,51 +1,165 @@
+import argparse
+import importlib.util
+import json
 import os
+import statistics
 import subprocess
 import sys
 import shutil
+import time
+
+APP_NAME = "CaptionLab"
+# main.py still imports the old ui.main_window module; version2.py is the application
+ENTRY_SCRIPT = "version2.py"
+
+# Modules that torch / whisper can pull in but CaptionLab never uses at runtime.
+# Leaving them out shrinks the bundle and what a onefile build has to unpack.
+EXCLUDED_MODULES = [
+    "tensorboard", "torch.utils.tensorboard", "torch.testing._internal",
+    "torchvision", "torchaudio", "triton", "caffe2",
+    "matplotlib", "IPython", "notebook", "jupyter", "pytest", "tkinter",
+]
+
+# CPU-only torch wheels do not ship the CUDA/cuDNN libraries (several GB)
+CPU_TORCH_INDEX = "https://download.pytorch.org/whl/cpu"
+
+LAUNCH_RUNS = 3
+
 
 def run_command(command):
     print(f"Running: {command}")
     process = subprocess.run(command, shell=True, check=False) # Changed check to False to avoid immediate exit on error
     if process.returncode != 0:
         print(f"Command failed with exit code {process.returncode}")
-        print(f"Output: {process.stdout.decode()}")
-        print(f"Error: {process.stderr.decode()}")
         sys.exit(1)
 
-def main():
+
+def remove_path(path):
+    if not os.path.exists(path):
+        return
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        print(f"  Removed {path}")
+    except OSError as e:
+        print(f"  Error removing {path}: {e}")
+        print("  Please close any programs that might be using these files and try again.")
+        sys.exit(1) # Exit if cleanup fails
+
+
+def pyinstaller_command(mode, dist_path, optimize):
+    options = [
+        f"--{mode}", "--windowed", "--noconfirm", "--noupx",
+        "--icon=icon.ico", f"--name {APP_NAME}",
+        f"--distpath {dist_path}", f"--workpath build/{mode}",
+        f'--add-data "icons{os.pathsep}icons"',
+        "--collect-data whisper",  # mel filters and tokenizer files
+    ]
+    if importlib.util.find_spec("faster_whisper"):
+        options.append("--collect-data faster_whisper")  # Optional CTranslate2 backend (VAD model)
+    if optimize:
+        # Bytecode is compiled at build time with this level (asserts stripped at 1;
+        # 2 also strips docstrings, which some torch internals rely on)
+        options.append(f"--optimize {optimize}")
+    options += [f"--exclude-module {module}" for module in EXCLUDED_MODULES]
+    return "pyinstaller " + " ".join(options) + f" {ENTRY_SCRIPT}"
+
+
+def executable_path(mode, dist_path):
+    exe_name = APP_NAME + (".exe" if sys.platform == "win32" else "")
+    if mode == "onefile":
+        return os.path.join(dist_path, exe_name)
+    return os.path.join(dist_path, APP_NAME, exe_name)
+
+
+def bundle_stats(mode, dist_path):
+    root = executable_path(mode, dist_path) if mode == "onefile" else os.path.join(dist_path, APP_NAME)
+    if os.path.isfile(root):
+        return {"bytes": os.path.getsize(root), "files": 1}
+    total = files = 0
+    for folder, _, names in os.walk(root):
+        for name in names:
+            total += os.path.getsize(os.path.join(folder, name))
+            files += 1
+    return {"bytes": total, "files": files}
+
+
+def measure_launch(exe, runs=LAUNCH_RUNS):
+    """Seconds from process start until the window is up (the app quits right after)."""
+    env = dict(os.environ, CAPTIONLAB_EXIT_AFTER_STARTUP="1")
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([exe], env=env, check=False, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def build(mode, dist_path, optimize):
+    print(f"Building {mode} bundle (without UPX compression)...")
+    run_command(pyinstaller_command(mode, dist_path, optimize))
+
+
+def compare_launch_times(dist_root, optimize):
+    results = {}
+    for mode in ("onefile", "onedir"):
+        dist_path = os.path.join(dist_root, mode)
+        build(mode, dist_path, optimize)
+        timings = measure_launch(executable_path(mode, dist_path))
+        results[mode] = dict(bundle_stats(mode, dist_path), launches=timings, median=statistics.median(timings))
+
+    print("\nLaunch time (process start -> window shown, app quits immediately):")
+    for mode, result in results.items():
+        print(f"  {mode:<8} median {result['median']:6.2f}s  runs {', '.join(f'{t:.2f}s' for t in result['launches'])}"
+              f"  size {result['bytes'] / 1e6:.0f} MB in {result['files']} file(s)")
+    if results["onedir"]["median"] > 0:
+        print(f"  onedir starts {results['onefile']['median'] / results['onedir']['median']:.1f}x faster; "
+              f"onefile unpacks {results['onefile']['bytes'] / 1e6:.0f} MB to a temp dir on every launch.")
+    report_path = os.path.join(dist_root, "launch_times.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"  Results written to {report_path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=f"Build the {APP_NAME} executable with PyInstaller.")
+    parser.add_argument("--mode", choices=["onedir", "onefile", "compare"], default="onedir",
+                        help="onedir starts fastest (default); compare builds both and measures launch time")
+    parser.add_argument("--optimize", type=int, choices=[0, 1, 2], default=1, help="Bytecode optimization level")
+    parser.add_argument("--cpu-torch", action="store_true", help="Install the CPU-only torch wheel before building")
+    parser.add_argument("--skip-install", action="store_true", help="Do not pip install the requirements")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
     # Nettoyer les anciens fichiers de build
     print("Cleaning up previous build...")
-    for folder in ["build", "dist"]:
-        if os.path.exists(folder):
-            try:
-                shutil.rmtree(folder)
-                print(f"  Removed {folder}/")
-            except OSError as e:
-                print(f"  Error removing {folder}/: {e}")
-                print("  Please close any programs that might be using these files and try again.")
-                sys.exit(1) # Exit if cleanup fails
-    if os.path.exists("CaptionLab.spec"):
-        try:
-            os.remove("CaptionLab.spec")
-            print("  Removed CaptionLab.spec")
-        except OSError as e:
-            print(f"  Error removing CaptionLab.spec: {e}")
-            print("  Please close any programs that might be using this file and try again.")
-            sys.exit(1)
+    for path in ["build", "dist", f"{APP_NAME}.spec"]:
+        remove_path(path)
 
     # Créer l'icône
     print("Creating icon...")
-    run_command("python create_icon.py")
-    
+    run_command(f'"{sys.executable}" create_icon.py')
+
     # Installer les dépendances
-    print("Installing requirements...")
-    run_command("pip install -r requirements.txt")
-    
-    # Construire l'exécutable avec --noupx
-    print("Building executable (without UPX compression)...")
-    run_command("pyinstaller --onefile --windowed --icon=icon.ico --name CaptionLab --noupx main.py")
-    
+    if not args.skip_install:
+        if args.cpu_torch:
+            print("Installing CPU-only torch...")
+            run_command(f'"{sys.executable}" -m pip install torch --index-url {CPU_TORCH_INDEX}')
+        print("Installing requirements...")
+        run_command(f'"{sys.executable}" -m pip install -r requirements.txt')
+
+    if args.mode == "compare":
+        compare_launch_times("dist", args.optimize)
+    else:
+        build(args.mode, "dist", args.optimize)
+        print(f"Executable: {executable_path(args.mode, 'dist')}")
+
     print("Done!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
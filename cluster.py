@@ -0,0 +1,187 @@
+"""Run CaptionLab on several machines (workers.cluster).
+
+The coordinator queues media and writes the subtitles; workers pull jobs,
+transcribe and translate them, and send the segments back. All machines
+need the same cluster key: CAPTIONLAB_CLUSTER_KEY, or the key file the
+coordinator creates on its first start (~/.captionlab/cluster.key, copy it
+to the workers).
+
+Examples:
+    python cluster.py coordinator /archive/2019 --output /archive/subtitles --target fr --listen 0.0.0.0:7650
+    python cluster.py worker coordinator-host:7650 --slots 2 --models base small
+
+    # Trying it on one machine:
+    python cluster.py coordinator samples --output out &
+    python cluster.py worker 127.0.0.1:7650 --name w1 --exit-when-idle &
+    python cluster.py worker 127.0.0.1:7650 --name w2 --exit-when-idle
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+
+from utils.fingerprint import media_fingerprint
+from utils.folder_watcher import MEDIA_EXTENSIONS, FolderWatcher
+from utils.job_queue import DEFAULT_MAX_ATTEMPTS, JobQueue
+from utils.resegment import CueLimits
+from workers.backends import BACKENDS, DEFAULT_BACKEND
+from workers.cluster import (
+    DEFAULT_KEY_FILE, DEFAULT_PORT, IDLE_POLL_SECONDS, LEASE_SECONDS, ClusterWorker, Coordinator, load_cluster_key
+)
+from workers.pipeline import DEFAULT_WHISPER_MODEL
+from workers.translators import parse_target
+
+DEFAULT_QUEUE_DB = "captionlab_cluster.db"
+
+
+def parse_address(text, default_host):
+    host, _, port = text.rpartition(":")
+    return (host or default_host, int(port))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Spread CaptionLab jobs over several machines.")
+    parser.add_argument("--key-file", default=DEFAULT_KEY_FILE, help="Cluster key file (ignored if CAPTIONLAB_CLUSTER_KEY is set)")
+    roles = parser.add_subparsers(dest="role", required=True)
+
+    coordinator = roles.add_parser("coordinator", help="Queue media and collect the subtitles")
+    coordinator.add_argument("inputs", nargs="+", help="Media files, or folders whose media files are queued")
+    coordinator.add_argument("--output", required=True, help="Folder where SRT files are written")
+    coordinator.add_argument("--db", default=DEFAULT_QUEUE_DB, help=f"Job queue database (default: {DEFAULT_QUEUE_DB})")
+    coordinator.add_argument("--listen", default=f"127.0.0.1:{DEFAULT_PORT}",
+                             help=f"host:port workers connect to (default: 127.0.0.1:{DEFAULT_PORT})")
+    coordinator.add_argument("--watch", action="store_true", help="Keep watching the input folders for new media")
+    coordinator.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS,
+                             help="Silence after which a worker is lost and its jobs are requeued")
+    coordinator.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Attempts before a job is marked failed")
+    coordinator.add_argument("--retry-failed", action="store_true", help="Requeue failed jobs on startup")
+    coordinator.add_argument("--model", default=DEFAULT_WHISPER_MODEL, help="Whisper model name")
+    coordinator.add_argument("--backend", default=DEFAULT_BACKEND, choices=sorted(BACKENDS),
+                             help=f"Transcription backend (default: {DEFAULT_BACKEND})")
+    coordinator.add_argument("--refine-model", default=None, help="Larger model for low-confidence passages")
+    coordinator.add_argument("--no-downgrade", action="store_true",
+                             help="Only give a job to workers with memory for its model")
+    coordinator.add_argument("--source-language", default=None, help="Whisper source language code (default: auto)")
+    coordinator.add_argument("--no-language-id", action="store_true", help="Skip the language pre-pass")
+    coordinator.add_argument("--target", action="append", default=[],
+                             help="Target language code, optionally with its translator (fr:marian); repeat for several")
+    coordinator.add_argument("--word-timestamps", action="store_true", help="Keep per-word timings from Whisper")
+    coordinator.add_argument("--no-resegment", action="store_true", help="Keep Whisper's segments as they are")
+
+    worker = roles.add_parser("worker", help="Run jobs for a coordinator")
+    worker.add_argument("coordinator", help="host:port of the coordinator")
+    worker.add_argument("--slots", type=int, default=1, help="Jobs run at the same time")
+    worker.add_argument("--threads", type=int, default=None, help="CPU threads per transcription (default: all cores)")
+    worker.add_argument("--models", nargs="+", default=None,
+                        help="Models this worker accepts jobs for (default: any; offline: those in the model store)")
+    worker.add_argument("--name", default=None, help="Name shown by the coordinator (default: host name)")
+    worker.add_argument("--cache", default=None, help="Folder for media being processed")
+    worker.add_argument("--exit-when-idle", action="store_true", help="Stop once the coordinator has no jobs left")
+    return parser.parse_args(argv)
+
+
+def media_files(inputs):
+    for path in inputs:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(MEDIA_EXTENSIONS) and os.path.isfile(os.path.join(path, name)):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def run_coordinator(args, authkey):
+    try:
+        targets = [parse_target(text) for text in args.target]
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    params = {
+        "model": args.model,
+        "backend": args.backend,
+        "threads": None,  # Each worker uses its own --threads
+        "refine_model": args.refine_model,
+        "source_language": args.source_language,
+        "language_id": not args.no_language_id,
+        "allow_downgrade": not args.no_downgrade,
+        "target_languages": [target for target, _ in targets],
+        "translators": {target: choice for target, choice in targets if choice},
+        "word_timestamps": args.word_timestamps,
+        "cue_limits": None if args.no_resegment else CueLimits().to_dict(),
+    }
+    queue = JobQueue(args.db)
+    if args.retry_failed:
+        print(f"Requeued {queue.retry_failed()} failed job(s).")
+
+    def enqueue(path):
+        try:
+            job_id = queue.enqueue(os.path.abspath(path), media_fingerprint(path), params)
+        except OSError as e:
+            print(f"Could not read {path}: {e}")
+            return
+        if job_id is not None:
+            print(f"Queued job {job_id}: {os.path.basename(path)}")
+
+    for path in media_files(args.inputs):
+        enqueue(path)
+    watchers = [FolderWatcher(folder, enqueue) for folder in args.inputs if args.watch and os.path.isdir(folder)]
+    for watcher in watchers:
+        watcher.start()
+
+    coordinator = Coordinator(queue, args.output, parse_address(args.listen, "127.0.0.1"), authkey,
+                              lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    stop_requested = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_requested.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_requested.set())
+    threading.Thread(target=coordinator.serve_forever, name="Coordinator", daemon=True).start()
+    host, port = coordinator.address
+    print(f"Coordinator listening on {host}:{port}." + (" Press Ctrl+C to stop." if watchers else ""))
+    while not stop_requested.wait(1.0):
+        if not watchers and coordinator.drained():
+            stop_requested.wait(2 * IDLE_POLL_SECONDS)  # Idle workers hear that the queue is drained
+            break
+    for watcher in watchers:
+        watcher.stop()
+    coordinator.close()
+    counts = queue.counts()
+    print(f"Queue: {counts['pending']} pending, {counts['done']} done, {counts['failed']} failed "
+          f"({coordinator.stats['requeued']} requeued from lost workers, "
+          f"{coordinator.stats['duplicates']} duplicate result(s) dropped).")
+    queue.close()
+
+
+def run_worker(args, authkey):
+    worker = ClusterWorker(parse_address(args.coordinator, "127.0.0.1"), authkey, slots=args.slots,
+                           models=args.models, threads=args.threads, exit_when_idle=args.exit_when_idle,
+                           name=args.name, **({"cache_dir": args.cache} if args.cache else {}))
+    stop_requested = threading.Event()
+
+    def on_signal(*_):
+        if stop_requested.is_set():
+            print("Cancelling running jobs...")
+        worker.stop(cancel_running=stop_requested.is_set())
+        stop_requested.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    print(f"Worker '{worker.capabilities['name']}' pulling from {args.coordinator} with {worker.slots} slot(s).")
+    worker.run()
+    print(f"Worker stopped after {worker.completed} job(s).")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        authkey = load_cluster_key(args.key_file, create=args.role == "coordinator")
+    except OSError as e:
+        print(f"No cluster key ({e}): set CAPTIONLAB_CLUSTER_KEY or copy the coordinator's key file.")
+        sys.exit(1)
+    if args.role == "coordinator":
+        run_coordinator(args, authkey)
+    else:
+        run_worker(args, authkey)
+
+
+if __name__ == "__main__":
+    main()
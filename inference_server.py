@@ -0,0 +1,74 @@
+"""CaptionLab inference service (workers.inference_service).
+
+Keeps Whisper models loaded in one place and runs the transcription,
+translation and summary jobs of every CaptionLab window on this machine;
+identical requests are run once. Windows started while the service is
+running send their jobs to it, and run them in process otherwise.
+
+Example:
+    python inference_server.py --preload base --preload small --inference-workers 2
+"""
+import argparse
+import signal
+import sys
+import threading
+
+from utils.job_executor import DEFAULT_INFERENCE_WORKERS, DEFAULT_IO_WORKERS, INFERENCE, JobExecutor
+from workers.backends import BACKENDS, DEFAULT_BACKEND
+from workers.inference_service import DEFAULT_HOST, InferenceClient, InferenceServer
+from workers.pipeline import preload_job
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve CaptionLab transcription jobs to local clients.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=0, help="Port to listen on (default: any free port)")
+    parser.add_argument("--inference-workers", type=int, default=DEFAULT_INFERENCE_WORKERS,
+                        help="Transcriptions run at the same time")
+    parser.add_argument("--io-workers", type=int, default=DEFAULT_IO_WORKERS, help="Translations and summaries run at the same time")
+    parser.add_argument("--preload", action="append", default=[], help="Whisper model to load at startup; repeat for several")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=sorted(BACKENDS),
+                        help=f"Backend of the preloaded models (default: {DEFAULT_BACKEND})")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads of the preloaded models (default: all cores)")
+    return parser.parse_args(argv)
+
+
+def report_preload(model_name, future):
+    if future.cancelled():
+        return
+    error = future.exception()
+    print(f"Preloaded '{model_name}'." if error is None else f"Could not preload '{model_name}': {error}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    running = InferenceClient.discover()
+    if running is not None:
+        try:
+            print(f"An inference service is already running (pid {running.ping()['pid']}).")
+            sys.exit(1)
+        except (OSError, EOFError):
+            pass  # Its file outlived it: take over
+
+    executor = JobExecutor(inference_workers=args.inference_workers, io_workers=args.io_workers)
+    server = InferenceServer(args.host, args.port, executor=executor)
+    for model_name in args.preload:
+        # Preloading goes through the inference lane so the model lands in the process that transcribes
+        # (with several inference workers, only one of them holds it)
+        handle = executor.submit(INFERENCE, preload_job, model_name, args.backend, args.threads)
+        handle.add_done_callback(lambda future, name=model_name: report_preload(name, future))
+
+    def on_signal(*_):
+        print("Stopping the inference service...")
+        threading.Thread(target=server.close, daemon=True).start()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    host, port = server.address
+    print(f"Inference service listening on {host}:{port} (clients find it through {server.path}).")
+    server.serve_forever()
+    print(f"Stopped after {server.connections} request(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Manage CaptionLab's verified local model store (utils.model_store).
+
+Examples:
+    python model_store.py import /media/usb/captionlab-models   # base.pt, faster-whisper-base/, opus-mt-en-fr/, ...
+    python model_store.py download-mt en fr                      # OPUS-MT translation model, converted to int8
+    python model_store.py verify --full
+    python model_store.py list
+    python model_store.py remove whisper large
+
+Set CAPTIONLAB_MODEL_STORE to use another store folder (e.g. a shared one)
+and CAPTIONLAB_OFFLINE=1 to forbid downloads of models that are not stored.
+"""
+import argparse
+import sys
+import time
+
+from utils.model_store import CTRANSLATE2_KIND, MT_KIND, WHISPER_KIND, ModelStore, ModelStoreError
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the verified local model store.")
+    parser.add_argument("--store", default=None, help="Store folder (default: CAPTIONLAB_MODEL_STORE or ~/.captionlab/models)")
+    parser.add_argument("--workers", type=int, default=None, help="Files hashed in parallel")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Copy and checksum the models found in a folder")
+    import_parser.add_argument("folder")
+    verify_parser = commands.add_parser("verify", help="Check every stored file against its checksum")
+    verify_parser.add_argument("--full", action="store_true", help="Hash files even if unchanged since their last check")
+    download_parser = commands.add_parser("download-mt", help="Download and convert an OPUS-MT translation model")
+    download_parser.add_argument("source", help="Source language code, e.g. en")
+    download_parser.add_argument("target", help="Target language code, e.g. fr")
+    commands.add_parser("list", help="List stored models")
+    remove_parser = commands.add_parser("remove", help="Delete a stored model")
+    remove_parser.add_argument("kind", choices=[WHISPER_KIND, CTRANSLATE2_KIND, MT_KIND])
+    remove_parser.add_argument("model")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    store = ModelStore(args.store)
+    started = time.perf_counter()
+    if args.command == "import":
+        try:
+            imported = store.import_directory(args.folder, workers=args.workers)
+        except (OSError, ModelStoreError) as e:
+            print(f"Import failed: {e}")
+            sys.exit(1)
+        if not imported:
+            print(f"No models found in {args.folder} (expected <model>.pt files or CTranslate2 model folders).")
+            sys.exit(1)
+        for kind, model_name in imported:
+            print(f"Imported {kind} '{model_name}'")
+        print(f"Done in {time.perf_counter() - started:.1f}s -> {store.root}")
+    elif args.command == "download-mt":
+        from workers.translators import download_mt_model
+        try:
+            imported = download_mt_model(args.source, args.target, store)
+        except (OSError, ValueError, ModelStoreError) as e:
+            print(f"Download failed: {e}")
+            sys.exit(1)
+        for kind, model_name in imported:
+            print(f"Imported {kind} '{model_name}'")
+        print(f"Done in {time.perf_counter() - started:.1f}s -> {store.root}")
+    elif args.command == "verify":
+        results = store.verify(full=args.full, workers=args.workers)
+        failures = {member: error for member, error in results.items() if error}
+        for member, error in sorted(failures.items()):
+            print(f"FAILED {member}: {error}")
+        print(f"{len(results) - len(failures)}/{len(results)} file(s) OK in {time.perf_counter() - started:.1f}s")
+        if failures:
+            sys.exit(1)
+    elif args.command == "list":
+        entries = store.entries().values()
+        for kind, model_name in store.models():
+            size = sum(entry["size"] for entry in entries if entry["kind"] == kind and entry["model"] == model_name)
+            print(f"{kind:<12} {model_name:<16} {size / (1024 * 1024):8.0f} MB")
+    elif args.command == "remove":
+        removed = store.remove(args.kind, args.model)
+        print(f"Removed {removed} file(s)." if removed else f"{args.kind} '{args.model}' is not in the store.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import json
+import os
+import socket
+import tempfile
+import unittest
+
+from utils.checkpoint_log import CheckpointInUseError, open_checkpoint
+
+
+class CheckpointLockTest(unittest.TestCase):
+    def setUp(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        self.directory = temporary.name
+
+    def open(self):
+        return open_checkpoint("fingerprint", "small", "whisper", "en", False, directory=self.directory)
+
+    def test_second_run_cannot_open_a_log_in_use(self):
+        log = self.open()
+        log.append(120.0, [{"start": 0.0, "end": 2.0, "text": " Hello"}], "en")
+        with self.assertRaises(CheckpointInUseError):
+            self.open()
+        log.close()
+        resumed = self.open()
+        self.assertEqual(resumed.resume_seconds, 120.0)
+        resumed.close()
+        self.assertFalse(os.path.exists(resumed.path + ".lock"))
+
+    def test_lock_of_a_dead_process_is_taken_over(self):
+        log = self.open()
+        log.close()
+        with open(log.path + ".lock", "w", encoding="utf-8") as f:
+            json.dump({"pid": 999999999, "host": socket.gethostname()}, f)
+        self.open().close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import time
+import unittest
+
+from utils import tracing
+from utils.job_executor import INFERENCE, JobExecutor
+
+
+def traced_job(name, progress=None, cancel_token=None):
+    with tracing.span(name, items=3):
+        tracing.count(name + ".hit")
+    return tracing.enabled()
+
+
+class InferenceTracingTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = JobExecutor(inference_workers=1, io_workers=1, use_processes=True)
+        self.addCleanup(self.executor.shutdown)
+        self.addCleanup(tracing.set_enabled, tracing.enabled())
+        tracing.clear()
+
+    def wait_for_stage(self, name, seconds=10):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if name in tracing.summary()["stages"]:
+                return tracing.summary()
+            time.sleep(0.02)
+        self.fail(f"span {name} never came back from the inference process")
+
+    def test_spans_of_an_inference_process_reach_this_process(self):
+        tracing.set_enabled(True)
+        self.assertTrue(self.executor.submit(INFERENCE, traced_job, "child.stage").result(timeout=60))
+        summary = self.wait_for_stage("child.stage")
+        self.assertEqual(summary["stages"]["child.stage"]["attrs"], {"items": 3})
+        self.assertEqual(summary["counters"]["child.stage.hit"], 1)
+
+    def test_tracing_stays_off_in_the_inference_process(self):
+        tracing.set_enabled(False)
+        self.assertFalse(self.executor.submit(INFERENCE, traced_job, "quiet.stage").result(timeout=60))
+
+
+if __name__ == "__main__":
+    unittest.main()
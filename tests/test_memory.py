@@ -0,0 +1,40 @@
+import unittest
+
+from utils.memory import InsufficientMemoryError, MemoryGovernor, model_footprint_mb, smaller_models
+
+
+class MemoryGovernorTest(unittest.TestCase):
+    def test_admitted_model_holds_memory_until_released(self):
+        # available never drops here, like a model still reading its weights
+        governor = MemoryGovernor(reserve_mb=0, wait_seconds=0, available=lambda: 8000, total=lambda: 16000)
+        first = governor.admit("large-v3")
+        self.assertEqual(first.model_name, "large-v3")
+        second = governor.admit("large-v3")
+        self.assertEqual(second.model_name, "small")
+        with self.assertRaises(InsufficientMemoryError):
+            governor.without_wait().admit("medium", allow_downgrade=False)
+        first.release()
+        first.release()
+        with second:
+            pass
+        self.assertEqual(governor.reserved_mb(), 0)
+        with governor.admit("large-v3") as third:
+            self.assertEqual(third.model_name, "large-v3")
+
+    def test_downgrade_skips_models_that_cannot_be_loaded(self):
+        governor = MemoryGovernor(reserve_mb=0, wait_seconds=0, available=lambda: 3500, total=lambda: 16000)
+        with governor.admit("large-v3") as reservation:
+            self.assertEqual(reservation.model_name, "turbo")
+        with governor.admit("large-v3", loadable=lambda name: name != "turbo") as reservation:
+            self.assertEqual(reservation.model_name, "medium")
+
+    def test_large_and_turbo_names(self):
+        self.assertEqual(smaller_models("large-v3"), ["turbo", "medium", "small", "base", "tiny"])
+        self.assertEqual(smaller_models("large-v3-turbo"), ["medium", "small", "base", "tiny"])
+        self.assertEqual(smaller_models("medium.en"), ["small.en", "base.en", "tiny.en"])
+        self.assertEqual(model_footprint_mb("large-v2"), model_footprint_mb("large"))
+        self.assertEqual(model_footprint_mb("turbo"), model_footprint_mb("large-v3-turbo"))
+
+
+if __name__ == "__main__":
+    unittest.main()
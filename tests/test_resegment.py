@@ -0,0 +1,70 @@
+import random
+import unittest
+
+from utils.resegment import CueLimits, resegment, wrap_text
+from utils.segment_table import SegmentTable
+
+
+def timed_segment(start, words):
+    entries = [{"word": f" {word}", "start": start + i * 0.3, "end": start + i * 0.3 + 0.25, "probability": 0.9}
+               for i, word in enumerate(words)]
+    return {"start": start, "end": entries[-1]["end"], "text": "".join(entry["word"] for entry in entries),
+            "words": entries}
+
+
+class ResegmentWordOffsetsTest(unittest.TestCase):
+    def test_long_segment_without_words_owns_no_words(self):
+        # A segment over the limits without word timings, between word-timed ones, is cut by characters
+        segments = [
+            timed_segment(0.0, ["one", "two", "three"]),
+            {"start": 2.0, "end": 30.0, "text": " ".join(["lorem ipsum dolor"] * 20), "words": []},
+            timed_segment(31.0, ["foo", "bar"]),
+            timed_segment(33.0, ["baz", "qux"]),
+        ]
+        cues = resegment(SegmentTable.from_segments(segments), CueLimits())
+
+        word_counts = [len(cues.words_for(i)) for i in range(len(cues))]
+        self.assertGreater(len(cues), 4)
+        self.assertEqual(word_counts, [3] + [0] * (len(cues) - 3) + [2, 2])
+        self.assertEqual([word["word"] for word in cues.words_for(len(cues) - 2)], [" foo", " bar"])
+        self.assertEqual([word["word"] for word in cues.words_for(len(cues) - 1)], [" baz", " qux"])
+
+
+class ResegmentLineLimitsTest(unittest.TestCase):
+    def assertWithinLimits(self, cues, limits):
+        for text in cues.texts():
+            lines = text.split("\n")
+            self.assertLessEqual(len(lines), limits.max_lines, text)
+            self.assertLessEqual(max(map(len, lines)), limits.max_chars_per_line, text)
+
+    def test_text_without_a_balanced_split_is_cut(self):
+        # 83 characters, but no space leaves both lines within 42
+        text = " ".join(["a" * 27, "b" * 39, "c" * 14])
+        segments = [{"start": 0.0, "end": 5.0, "text": text}, {"start": 5.1, "end": 5.5, "text": "dd"}]
+        limits = CueLimits()
+        cues = resegment(SegmentTable.from_segments(segments), limits)
+        self.assertWithinLimits(cues, limits)
+        self.assertEqual(" ".join(cues.texts()).split(), text.split() + ["dd"])
+
+    def test_random_segments_fit_the_limits(self):
+        rng = random.Random(7)
+        segments, timed, start = [], [], 0.0
+        for _ in range(2000):
+            words = ["".join(rng.choice("abcdefghij") for _ in range(rng.choice([1, 2, 4, 6, 9, 14, 30])))
+                     for _ in range(rng.randint(1, 25))]
+            duration = rng.uniform(0.3, 12.0)
+            segments.append({"start": start, "end": start + duration, "text": " ".join(words)})
+            timed.append(timed_segment(start, words))
+            start += max(duration, timed[-1]["end"] - start) + rng.choice([0.0, 0.1, 1.5])
+        for limits in (CueLimits(), CueLimits(max_chars_per_line=20, max_lines=3)):
+            self.assertWithinLimits(resegment(SegmentTable.from_segments(segments), limits), limits)
+            self.assertWithinLimits(resegment(SegmentTable.from_segments(timed), limits), limits)
+
+    def test_wrap_text_never_exceeds_max_lines(self):
+        text = " ".join(["word"] * 40)
+        self.assertEqual(len(wrap_text(text, 42, 2).split("\n")), 2)
+        self.assertEqual(wrap_text("x" * 60, 42, 2), "x" * 42 + "\n" + "x" * 18)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+
+from utils.segment_table import SegmentTable
+
+
+class SegmentTableTest(unittest.TestCase):
+    def test_from_segments_keeps_whisper_id_zero(self):
+        table = SegmentTable.from_segments([
+            {"id": 0, "start": 0.0, "end": 1.0, "text": "first"},
+            {"id": 1, "start": 1.0, "end": 2.0, "text": "second"},
+            {"start": 2.0, "end": 3.0, "text": "third"},
+        ])
+        self.assertEqual(list(table.ids), [0, 1, 3])
+        self.assertEqual(table[0]["id"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
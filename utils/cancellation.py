@@ -0,0 +1,70 @@
+"""Cooperative cancellation for long-running jobs.
+
+A CancellationToken is handed to each stage of a job; the stage calls
+token.raise_if_cancelled() between chunks of work (decoded audio blocks,
+Whisper decoder steps, translation requests, streamed Gemini chunks) and
+the JobCancelled exception unwinds the job, releasing models and buffers on
+the way out. Resources that block without a check point (a subprocess, a
+socket) register a callback with on_cancel() that closes them.
+"""
+import threading
+
+
+class JobCancelled(Exception):
+    """Raised inside a job whose token was cancelled."""
+
+
+class CancellationToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = ""
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="Cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancellation callback failed: {e}")
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled(self.reason)
+
+    def on_cancel(self, callback):
+        """Run callback() when the token is cancelled (immediately if it already is).
+
+        Returns a function that unregisters the callback.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout=None):
+        """Sleep up to timeout seconds; True if the token was cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+
+def check(token):
+    """raise_if_cancelled() for an optional token."""
+    if token is not None:
+        token.raise_if_cancelled()
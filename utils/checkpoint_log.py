@@ -0,0 +1,213 @@
+"""On-disk checkpoints of long transcriptions.
+
+A long file is transcribed in chunks (see workers.pipeline); each finished
+chunk is appended to a log, one JSON line per chunk:
+
+    {"header": {"fingerprint", "model", "backend", "language", "word_timestamps"}}
+    {"end": 120.4, "language": "en", "segments": [...]}   # chunk covering up to 120.4 s
+    ...
+
+A line is written with a single write and fsynced, and a line without its
+newline (the process died half-way) is cut off when the log is reopened, so
+the log only ever holds whole chunks. Running the same media with the same
+model, backend and language again resumes after the last chunk; the log is
+removed once the final result is stored.
+
+A run holds a "<log>.lock" file (created with O_EXCL, holding its pid)
+while it writes the log. A second run of the same media gets
+CheckpointInUseError and transcribes without a checkpoint rather than
+interleaving its chunks with the first run's. A lock left by a process that
+died is taken over.
+"""
+import hashlib
+import json
+import os
+import socket
+import time
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.expanduser("~"), ".captionlab", "checkpoints")
+CHECKPOINT_MAX_AGE_DAYS = 14  # Logs of runs that were never finished are dropped after this
+
+
+class CheckpointInUseError(OSError):
+    """Another run is writing this checkpoint log."""
+
+
+def _process_alive(pid):
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    if os.name == "nt":  # os.kill() would terminate it
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass  # Exists, owned by another user
+    return True
+
+
+def _acquire_lock(lock_path):
+    """Create lock_path for this process; raises CheckpointInUseError while a live process holds it."""
+    owner = {"pid": os.getpid(), "host": socket.gethostname()}
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            try:
+                with open(lock_path, encoding="utf-8") as f:
+                    holder = json.load(f)
+            except (OSError, ValueError):
+                holder = {}  # Being written, or unreadable: treat as held
+            if (holder.get("host") != owner["host"] or not isinstance(holder.get("pid"), int)
+                    or _process_alive(holder["pid"])):
+                raise CheckpointInUseError(f"checkpoint {os.path.basename(lock_path)} is in use by another run")
+            try:
+                os.remove(lock_path)  # Left by a process that died
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(owner, f)
+        return
+    raise CheckpointInUseError(f"checkpoint {os.path.basename(lock_path)} is in use by another run")
+
+
+def checkpoint_key(fingerprint, model_name, backend, language, word_timestamps):
+    text = json.dumps([fingerprint, model_name, backend, language or "auto", bool(word_timestamps)])
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CheckpointLog:
+    def __init__(self, path, header, lock_path=None):
+        self.path = path
+        self.header = header
+        self.lock_path = lock_path  # Removed by close()
+        self.chunks = []
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        valid_bytes = 0
+        chunks = []
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # Torn write at the end
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if valid_bytes == 0:
+                if record.get("header") != self.header:
+                    break  # Another run hashed to this name, or an older format: start over
+            else:
+                chunks.append(record)
+            valid_bytes += len(line)
+        if valid_bytes == 0:
+            self._start()
+            return
+        if valid_bytes < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_bytes)
+        self.chunks = chunks
+
+    def _start(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._line({"header": self.header}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.chunks = []
+
+    @staticmethod
+    def _line(record):
+        return (json.dumps(record, separators=(",", ":"), default=float) + "\n").encode("utf-8")
+
+    @property
+    def resume_seconds(self):
+        """Audio time covered by the stored chunks."""
+        return self.chunks[-1]["end"] if self.chunks else 0.0
+
+    def segments(self):
+        return [segment for chunk in self.chunks for segment in chunk["segments"]]
+
+    def language(self):
+        return self.chunks[0].get("language") if self.chunks else None
+
+    def append(self, end_seconds, segments, language=None):
+        record = {"end": end_seconds, "language": language, "segments": segments}
+        with open(self.path, "ab") as f:
+            f.write(self._line(record))
+            f.flush()
+            os.fsync(f.fileno())
+        self.chunks.append(record)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.chunks = []
+
+    def close(self):
+        """Stop writing the log and let another run open it."""
+        lock_path, self.lock_path = self.lock_path, None
+        if lock_path:
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+
+
+def open_checkpoint(fingerprint, model_name, backend, language, word_timestamps, directory=DEFAULT_CHECKPOINT_DIR):
+    """The checkpoint log of this run, with the chunks of an interrupted earlier run if there was one.
+
+    The log is locked until its close(); raises CheckpointInUseError when another run holds it.
+    """
+    header = {"fingerprint": fingerprint, "model": model_name, "backend": backend, "language": language or "auto",
+              "word_timestamps": bool(word_timestamps)}
+    key = checkpoint_key(fingerprint, model_name, backend, language, word_timestamps)
+    path = os.path.join(directory, f"{key}.jsonl")
+    os.makedirs(directory, exist_ok=True)
+    _acquire_lock(path + ".lock")
+    try:
+        return CheckpointLog(path, header, lock_path=path + ".lock")
+    except BaseException:
+        os.remove(path + ".lock")
+        raise
+
+
+def collect_garbage(directory=DEFAULT_CHECKPOINT_DIR, max_age_days=CHECKPOINT_MAX_AGE_DAYS):
+    """Remove logs not written to for max_age_days; returns how many were removed."""
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
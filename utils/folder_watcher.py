@@ -0,0 +1,149 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+MEDIA_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".webm", ".flv", ".mp3", ".wav", ".m4a", ".flac")
+
+# inotify constants (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+_IN_EVENT_HEADER = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Minimal ctypes binding for a single non-recursive inotify watch."""
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def read_names(self, timeout):
+        """Wait up to timeout seconds and return the file names that changed."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _IN_EVENT_HEADER.size <= len(data):
+            _, _, _, name_len = _IN_EVENT_HEADER.unpack_from(data, offset)
+            offset += _IN_EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if name:
+                names.append(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """Watch a folder for new media files and report them once they are stable.
+
+    inotify is used on Linux to notice files as soon as they appear; elsewhere
+    (or if inotify is unavailable, e.g. on some network shares) the folder is
+    polled. Either way a file is only reported after its size and mtime have
+    stayed unchanged for stable_seconds, so half-copied files are never picked up.
+    """
+
+    def __init__(self, folder, on_ready, stable_seconds=5.0, poll_interval=2.0,
+                 extensions=MEDIA_EXTENSIONS, use_inotify=True):
+        self.folder = os.path.abspath(folder)
+        self.on_ready = on_ready
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+        self.mode = None
+        self._candidates = {}  # path -> (size, mtime, unchanged_since)
+        self._reported = {}  # path -> (size, mtime) at the time it was reported
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="FolderWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _is_media(self, name):
+        return not name.startswith(".") and name.lower().endswith(self.extensions)
+
+    def _scan(self):
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._is_media(entry.name):
+                        st = entry.stat()
+                        if self._reported.get(entry.path) != (st.st_size, st.st_mtime):
+                            self._consider(entry.path)
+        except OSError as e:
+            print(f"Could not scan watch folder {self.folder}: {e}")
+
+    def _consider(self, path):
+        if path not in self._candidates:
+            self._candidates[path] = (-1, -1, time.monotonic())
+
+    def _check_candidates(self):
+        now = time.monotonic()
+        for path, (size, mtime, since) in list(self._candidates.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._candidates[path]  # Supprimé ou déplacé entre-temps
+                continue
+            if (st.st_size, st.st_mtime) != (size, mtime):
+                self._candidates[path] = (st.st_size, st.st_mtime, now)
+            elif now - since >= self.stable_seconds and st.st_size > 0:
+                del self._candidates[path]
+                if self._reported.get(path) != (size, mtime):
+                    self._reported[path] = (size, mtime)
+                    try:
+                        self.on_ready(path)
+                    except Exception as e:
+                        print(f"Error handling {path}: {e}")
+
+    def _run(self):
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = _Inotify(self.folder)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}), falling back to polling.")
+        self.mode = "inotify" if inotify else "polling"
+        self._scan()
+        try:
+            while not self._stop_event.is_set():
+                # Candidates still settling need a regular tick even with inotify
+                timeout = min(self.poll_interval, 1.0) if self._candidates else self.poll_interval
+                if inotify:
+                    for name in inotify.read_names(timeout):
+                        if self._is_media(name):
+                            self._consider(os.path.join(self.folder, name))
+                else:
+                    self._stop_event.wait(timeout)
+                    self._scan()
+                self._check_candidates()
+        finally:
+            if inotify:
+                inotify.close()
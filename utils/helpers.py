@@ -1,13 +1,15 @@
 import ssl
-import nltk
 import os
 
+from utils.segment_table import SegmentTable
+
 def fix_ssl():
     """Fix SSL certificate verification issues"""
     ssl._create_default_https_context = ssl._create_unverified_context
 
 def ensure_nltk_data_basic():
     """Ensure basic NLTK data is downloaded"""
+    import nltk
     try:
         nltk.data.find('tokenizers/punkt')
     except LookupError:
@@ -20,12 +22,23 @@ def ensure_nltk_data_basic():
 
 def format_srt_timestamp(seconds_float):
     """Convert seconds to SRT timestamp format"""
-    hours = int(seconds_float // 3600)
-    minutes = int((seconds_float % 3600) // 60)
-    seconds = int(seconds_float % 60)
-    milliseconds = int((seconds_float % 1) * 1000)
+    seconds_float = max(0.0, float(seconds_float))  # Also numpy.float32, which is not a float instance
+    total_seconds = int(seconds_float)
+    milliseconds = int((seconds_float - total_seconds) * 1000)
+    hours = total_seconds // 3600
+    minutes = (total_seconds % 3600) // 60
+    seconds = total_seconds % 60
     return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
 
+def find_segment_text(segments, time_sec):
+    """Text of the segment on screen at time_sec, or "" between segments"""
+    if isinstance(segments, SegmentTable):
+        return segments.text_at_time(time_sec)  # Binary search on the start times
+    for segment in segments:
+        if segment.get("start", 0) <= time_sec <= segment.get("end", float('inf')):
+            return segment.get("text", "")
+    return ""
+
 def create_temp_srt_file(segments, output_path):
     """Create a temporary SRT file from segments"""
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -0,0 +1,327 @@
+"""Shared, bounded executor for every CaptionLab job.
+
+Jobs run on one of two lanes:
+
+    INFERENCE  Whisper transcription, in a pool of worker processes (one by
+               default: Whisper already uses every core). Loaded models stay
+               in the worker process from one job to the next.
+    IO         translation, Gemini, ffprobe and other network/disk work, on
+               a thread pool.
+
+A lane runs at most its worker count of jobs; the others wait in a priority
+queue (lower number first, then submission order). Submitting a job whose
+key is already queued or running returns the existing JobHandle instead of
+starting a duplicate; the job is only cancelled once every submitter has
+cancelled it.
+
+A job function is called as fn(*args, progress=..., cancel_token=..., **kwargs).
+progress(*event) forwards an event tuple to the listeners registered on the
+handle and cancel_token is a utils.cancellation.CancellationToken. Inference
+jobs run in another process, so fn, its arguments and its result must be
+picklable; events travel back through a queue and cancellation through a
+shared flag per running job. Each inference job gets the tracing switch
+(utils.tracing) of the submitting process, and the spans and counters it
+recorded come back through the event queue into that process's buffer.
+"""
+import concurrent.futures
+import heapq
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import tracing
+from utils.cancellation import CancellationToken, JobCancelled
+
+INFERENCE = "inference"
+IO = "io"
+
+PRIORITY_HIGH = 0     # Started from the main window, the user is waiting for it
+PRIORITY_NORMAL = 10  # Batch queue
+PRIORITY_LOW = 20     # Background work (duration probes)
+
+DEFAULT_INFERENCE_WORKERS = 1
+DEFAULT_IO_WORKERS = 4
+CANCEL_POLL_SECONDS = 0.1
+# "1" runs inference jobs on threads of this process instead (debugging, or
+# platforms where starting processes is a problem)
+INPROCESS_ENV = "CAPTIONLAB_INPROCESS_INFERENCE"
+
+
+# --- Inference process side ---
+_child_events = None
+_child_cancel_flags = None
+
+
+def _init_inference_process(events, cancel_flags):
+    global _child_events, _child_cancel_flags
+    _child_events = events
+    _child_cancel_flags = cancel_flags
+
+
+def _run_in_process(job_id, slot, fn, args, kwargs, trace=False):
+    tracing.set_enabled(trace)
+    token = CancellationToken()
+    finished = threading.Event()
+
+    def watch_cancel_flag():
+        while not finished.wait(CANCEL_POLL_SECONDS):
+            if _child_cancel_flags[slot]:
+                token.cancel()
+                return
+
+    threading.Thread(target=watch_cancel_flag, name="CancelWatch", daemon=True).start()
+    try:
+        return fn(*args, progress=lambda *event: _child_events.put((job_id, event)), cancel_token=token, **kwargs)
+    finally:
+        finished.set()
+        if trace:
+            _child_events.put((None, tracing.take()))  # Merged by JobExecutor._relay_events()
+
+
+class JobHandle:
+    """Future of one submitted job, shared by every submitter of the same key."""
+
+    def __init__(self, job_id, kind, key, priority, call):
+        self.job_id = job_id
+        self.kind = kind
+        self.key = key
+        self.priority = priority
+        self.future = concurrent.futures.Future()
+        self.cancel_token = CancellationToken()
+        self._call = call
+        self._started = False
+        self._slot = None
+        self._unregister_flag = None
+        self._listeners = []
+        self._subscribers = 1
+        self._lock = threading.Lock()
+
+    def _subscribe(self):
+        with self._lock:
+            if self.cancel_token.cancelled or self.future.done():
+                return False
+            self._subscribers += 1
+            return True
+
+    def add_progress_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _emit(self, *event):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Progress listener failed: {e}")
+
+    def add_done_callback(self, callback):
+        """callback(future) once the job finished, failed or was cancelled (right away if it already has)."""
+        self.future.add_done_callback(callback)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def cancel(self, reason="Cancelled"):
+        """Withdraw one submitter; the job itself is cancelled when none is left.
+
+        Returns True if the job was cancelled.
+        """
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers > 0:
+                return False
+        self.cancel_token.cancel(reason)
+        return True
+
+
+class _Lane:
+    def __init__(self, workers):
+        self.workers = workers
+        self.pending = []  # Heap of (priority, job_id, handle)
+        self.running = 0
+
+
+class JobExecutor:
+    def __init__(self, inference_workers=DEFAULT_INFERENCE_WORKERS, io_workers=DEFAULT_IO_WORKERS, use_processes=None):
+        if use_processes is None:
+            use_processes = os.getenv(INPROCESS_ENV) != "1"
+        self.use_processes = use_processes
+        self._lanes = {INFERENCE: _Lane(inference_workers), IO: _Lane(io_workers)}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._by_key = {}
+        self._running = {}  # job_id -> handle, to route events coming back from the processes
+        thread_workers = io_workers + (0 if use_processes else inference_workers)
+        self._threads = concurrent.futures.ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="Job")
+        # The process pool is only started by the first inference job
+        self._context = multiprocessing.get_context("spawn")  # fork is unsafe with Qt and torch threads
+        self._processes = None
+        self._events = None
+        self._cancel_flags = None
+        self._free_slots = list(range(inference_workers))
+        self._closed = False
+
+    def submit(self, kind, fn, *args, key=None, priority=PRIORITY_NORMAL, on_progress=None, **kwargs):
+        """Queue fn on a lane and return its JobHandle.
+
+        With a key (any hashable describing the work, e.g. file + model +
+        options), a queued or running job with the same key is shared
+        rather than started twice. on_progress(event) is registered before
+        the job can start, so no event is missed.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The job executor has been shut down")
+            existing = self._by_key.get(key) if key is not None else None
+            if existing is not None and existing._subscribe():
+                tracing.count("executor.dedup")
+                if on_progress: existing.add_progress_listener(on_progress)
+                if priority < existing.priority and not existing._started:
+                    # Moved up the queue; the old heap entry is skipped once the job has started
+                    existing.priority = priority
+                    heapq.heappush(self._lanes[kind].pending, (priority, existing.job_id, existing))
+                return existing
+            handle = JobHandle(next(self._ids), kind, key, priority, (fn, args, kwargs))
+            if on_progress: handle.add_progress_listener(on_progress)
+            if key is not None:
+                self._by_key[key] = handle
+            heapq.heappush(self._lanes[kind].pending, (priority, handle.job_id, handle))
+        handle.cancel_token.on_cancel(lambda: self._cancel_pending(handle))
+        self._dispatch(kind)
+        return handle
+
+    def _cancel_pending(self, handle):
+        with self._lock:
+            if self._by_key.get(handle.key) is handle:
+                del self._by_key[handle.key]
+        handle.future.cancel()  # Only succeeds while the job is still queued
+
+    def _dispatch(self, kind):
+        lane = self._lanes[kind]
+        while True:
+            with self._lock:
+                if self._closed or lane.running >= lane.workers or not lane.pending:
+                    return
+                _, _, handle = heapq.heappop(lane.pending)
+                if handle._started or handle.future.done():
+                    continue  # Duplicate entry of a re-prioritized job, or cancelled while queued
+                if not handle.future.set_running_or_notify_cancel():
+                    continue
+                handle._started = True
+                lane.running += 1
+                self._running[handle.job_id] = handle
+            try:
+                self._start(handle)
+            except Exception as e:
+                self._finish(handle, error=e)
+
+    def _start(self, handle):
+        fn, args, kwargs = handle._call
+        handle._call = None
+        handle._emit("started")
+        if handle.kind == INFERENCE and self.use_processes:
+            pool = self._process_pool()
+            with self._lock:
+                slot = handle._slot = self._free_slots.pop()
+            self._cancel_flags[slot] = 0
+            handle._unregister_flag = handle.cancel_token.on_cancel(lambda: self._cancel_flags.__setitem__(slot, 1))
+            pool_future = pool.submit(_run_in_process, handle.job_id, slot, fn, args, kwargs, tracing.enabled())
+        else:
+            pool_future = self._threads.submit(fn, *args, progress=handle._emit, cancel_token=handle.cancel_token, **kwargs)
+        pool_future.add_done_callback(lambda future: self._finish(handle, future))
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                workers = self._lanes[INFERENCE].workers
+                if self._events is None:
+                    self._events = self._context.Queue()
+                    self._cancel_flags = self._context.RawArray("b", workers)
+                    threading.Thread(target=self._relay_events, name="JobEvents", daemon=True).start()
+                self._processes = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=workers, mp_context=self._context,
+                    initializer=_init_inference_process, initargs=(self._events, self._cancel_flags))
+            return self._processes
+
+    def _relay_events(self):
+        while True:
+            item = self._events.get()
+            if item is None:
+                return
+            job_id, event = item
+            if job_id is None:
+                tracing.merge(event)  # Spans and counters of a finished job
+                continue
+            with self._lock:
+                handle = self._running.get(job_id)
+            if handle is not None:
+                handle._emit(*event)
+
+    def _finish(self, handle, pool_future=None, error=None):
+        result = None
+        if pool_future is not None:
+            if pool_future.cancelled():
+                error = JobCancelled("The job executor was shut down")
+            else:
+                error = pool_future.exception()
+                result = None if error is not None else pool_future.result()
+        with self._lock:
+            self._lanes[handle.kind].running -= 1
+            self._running.pop(handle.job_id, None)
+            if self._by_key.get(handle.key) is handle:
+                del self._by_key[handle.key]
+            if handle._slot is not None:
+                handle._unregister_flag()
+                self._free_slots.append(handle._slot)
+                handle._slot = None
+            if isinstance(error, BrokenProcessPool) and self._processes is not None:
+                # A worker process died (out of memory, crash in native code): start a fresh pool next time
+                self._processes.shutdown(wait=False)
+                self._processes = None
+        if error is None:
+            handle.future.set_result(result)
+        else:
+            handle.future.set_exception(error)
+        self._dispatch(handle.kind)
+
+    def stats(self):
+        with self._lock:
+            return {kind: {"workers": lane.workers, "running": lane.running,
+                           "queued": sum(1 for _, _, handle in lane.pending if not handle._started and not handle.future.done())}
+                    for kind, lane in self._lanes.items()}
+
+    def shutdown(self, cancel=True):
+        """Stop accepting jobs; with cancel, cancel queued and running ones. Does not wait."""
+        with self._lock:
+            self._closed = True
+            handles = [handle for lane in self._lanes.values() for _, _, handle in lane.pending]
+            handles += list(self._running.values())
+            processes, self._processes = self._processes, None
+        if cancel:
+            for handle in handles:
+                handle.cancel_token.cancel("Shutting down")
+                handle.future.cancel()
+        self._threads.shutdown(wait=False)
+        if processes is not None:
+            processes.shutdown(wait=False)
+        if self._events is not None:
+            self._events.put(None)
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+
+
+def default_executor():
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = JobExecutor()
+        return _default_executor
@@ -0,0 +1,148 @@
+import json
+import sqlite3
+import threading
+import time
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fingerprint TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    params TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+class JobQueue:
+    """Durable FIFO of media jobs stored in SQLite.
+
+    Each job is keyed by the media fingerprint, so the same file dropped twice
+    (or under a new name) is only processed once. Jobs left 'running' by a
+    crash or a restart are put back to 'pending' by recover().
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, path, fingerprint, params=None):
+        """Add a job; return its id, or None if this fingerprint is already known."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (fingerprint, path, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, path, json.dumps(params or {}), now, now))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self, accept=None):
+        """Atomically move the oldest pending job to 'running' and return it (or None).
+
+        With accept(job), the oldest pending job it returns True for is claimed
+        (e.g. one whose model the claiming machine can run).
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if accept is None:
+                    row = self._conn.execute(
+                        "SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (PENDING,)).fetchone()
+                else:
+                    rows = self._conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (PENDING,))
+                    row = next((row for row in rows if accept(self._row_to_job(row))), None)
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (RUNNING, time.time(), row["id"]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job["status"] = RUNNING
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job_id, result=None):
+        self._update(job_id, DONE, result=json.dumps(result) if result is not None else None, error=None)
+
+    def fail(self, job_id, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Record a failure; the job goes back to 'pending' until max_attempts is reached."""
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        status = PENDING if row is not None and row["attempts"] < max_attempts else FAILED
+        self._update(job_id, status, error=str(error))
+        return status
+
+    def release(self, job_id):
+        """Put a running job back to 'pending' without counting the attempt (e.g. it was cancelled)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), updated_at = ? WHERE id = ?",
+                (PENDING, time.time(), job_id))
+
+    def recover(self):
+        """Requeue jobs interrupted while running; return how many were requeued."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?", (PENDING, time.time(), RUNNING))
+            return cursor.rowcount
+
+    def retry_failed(self):
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), FAILED))
+            return cursor.rowcount
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def counts(self):
+        """Number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def _update(self, job_id, status, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        values = list(fields.values())
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET status = ?, updated_at = ?{', ' + assignments if assignments else ''} WHERE id = ?",
+                [status, time.time()] + values + [job_id])
+
+    @staticmethod
+    def _row_to_job(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
@@ -0,0 +1,58 @@
+"""Detected languages per media fingerprint.
+
+A file that went through language identification once (see
+workers.language_id) gets its report from here next time, so re-running a
+transcription with another model or other cue settings skips detection.
+"""
+import json
+import os
+import threading
+
+DEFAULT_LANGUAGE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".captionlab", "languages.json")
+MAX_ENTRIES = 2000  # Oldest reports are dropped beyond this
+
+
+class LanguageCache:
+    def __init__(self, path=DEFAULT_LANGUAGE_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, fingerprint):
+        with self._lock:
+            return self._data.get(fingerprint)
+
+    def put(self, fingerprint, report):
+        with self._lock:
+            self._data.pop(fingerprint, None)
+            self._data[fingerprint] = report  # Dicts keep insertion order: newest last
+            while len(self._data) > MAX_ENTRIES:
+                del self._data[next(iter(self._data))]
+            try:
+                self._save()
+            except OSError as e:
+                print(f"Could not save detected languages to {self.path}: {e}")
+
+
+_default_cache = None
+
+
+def default_language_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = LanguageCache()
+    return _default_cache
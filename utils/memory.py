@@ -0,0 +1,305 @@
+"""Memory budget for model-heavy jobs.
+
+MemoryGovernor decides, before a Whisper model is loaded, whether it fits
+in the memory the machine has available right now:
+
+    admit      it fits (after releasing idle cached models if needed)
+    queue      it would fit once other work frees memory: wait for that
+    downgrade  it cannot fit in time: use the largest smaller model that does
+               (among those the backend can load)
+    reject     nothing fits: fail at once with a clear message instead of
+               swapping or being killed half-way through the load
+
+An admitted model holds a Reservation of its footprint until its load has
+finished or failed: the available memory only drops while the weights are
+read, so without it two jobs admitted together would both see the memory
+as free.
+
+Footprints are approximate resident sizes of a loaded model on CPU
+(float32 for Whisper, int8 for CTranslate2), plus the decoding buffers.
+
+track_memory() and memory_stage() record the peak resident set size of
+each stage of a job: a sampler thread reads the process RSS while the job
+runs and charges it to the stage that is current. Outside track_memory()
+memory_stage() does nothing, so the calls can stay in the pipeline.
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.cancellation import check
+
+# Approximate MB resident once loaded (float32 weights + decoder buffers)
+MODEL_FOOTPRINT_MB = {"tiny": 400, "base": 550, "small": 1300, "medium": 3200, "turbo": 3400, "large": 6500}
+MODEL_SIZES = ("tiny", "base", "small", "medium", "turbo", "large")  # Smallest first, the downgrade order
+# Model names sized like another one (turbo: the large-v3 encoder with a 4-layer decoder)
+MODEL_SIZE_ALIASES = {"large-v1": "large", "large-v2": "large", "large-v3": "large", "large-v3-turbo": "turbo"}
+QUANTIZED_FOOTPRINT_SHARE = 0.35  # int8 weights are a quarter of float32, buffers stay
+DEFAULT_FOOTPRINT_MB = 1500  # Unknown model names
+MEMORY_RESERVE_MB = 1024  # Kept free for the GUI, ffmpeg and the rest of the system
+ADMISSION_WAIT_SECONDS = 120.0  # How long a job waits for memory before it is downgraded
+MEMORY_POLL_SECONDS = 2.0
+RSS_SAMPLE_SECONDS = 0.05
+
+
+class InsufficientMemoryError(RuntimeError):
+    """A model does not fit in the available memory and no smaller one was allowed."""
+
+
+def _meminfo_mb(field):
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def available_memory_mb():
+    """Memory that can be used without swapping, in MB (None if unknown)."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available / (1024 * 1024)
+    except ImportError:
+        return _meminfo_mb("MemAvailable")
+
+
+def total_memory_mb():
+    try:
+        import psutil
+        return psutil.virtual_memory().total / (1024 * 1024)
+    except ImportError:
+        return _meminfo_mb("MemTotal")
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB (None if unknown)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None if unknown)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def model_size(model_name):
+    """Entry of MODEL_SIZES for a model name (base.en -> base, large-v3 -> large), or the bare name if unknown."""
+    size = model_name.partition(".")[0]
+    return MODEL_SIZE_ALIASES.get(size, size)
+
+
+def model_footprint_mb(model_name, quantized=False):
+    footprint = MODEL_FOOTPRINT_MB.get(model_size(model_name), DEFAULT_FOOTPRINT_MB)
+    return footprint * QUANTIZED_FOOTPRINT_SHARE if quantized else footprint
+
+
+def smaller_models(model_name):
+    """Models smaller than model_name, largest first, keeping an English-only suffix where it exists."""
+    size, suffix = model_size(model_name), model_name.partition(".")[2]
+    if size not in MODEL_SIZES:
+        return []
+    smaller = reversed(MODEL_SIZES[:MODEL_SIZES.index(size)])
+    return [f"{name}.{suffix}" if suffix else name for name in smaller]
+
+
+class _Reserved:
+    """Memory held by admitted models still loading, shared by a governor and its without_wait() copies."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mb = 0.0
+
+
+class Reservation:
+    """Admission of model_name; holds its footprint off the budget until release() (or the end of a with block)."""
+
+    def __init__(self, model_name, mb=0.0, reserved=None):
+        self.model_name = model_name
+        self.mb = mb
+        self._reserved = reserved
+
+    def release(self):
+        reserved, self._reserved = self._reserved, None
+        if reserved is not None:
+            with reserved.lock:
+                reserved.mb -= self.mb
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class MemoryGovernor:
+    def __init__(self, reserve_mb=MEMORY_RESERVE_MB, wait_seconds=ADMISSION_WAIT_SECONDS,
+                 poll_seconds=MEMORY_POLL_SECONDS, available=available_memory_mb, total=total_memory_mb):
+        self.reserve_mb = reserve_mb
+        self.wait_seconds = wait_seconds
+        self.poll_seconds = poll_seconds
+        self._available = available
+        self._total = total
+        self._reserved = _Reserved()
+
+    def without_wait(self):
+        """Same budget and reservations, but admit() downgrades or fails at once instead of waiting."""
+        governor = MemoryGovernor(self.reserve_mb, 0, self.poll_seconds, self._available, self._total)
+        governor._reserved = self._reserved
+        return governor
+
+    def reserved_mb(self):
+        """Memory held by admitted models that have not finished loading."""
+        return self._reserved.mb
+
+    def budget_mb(self):
+        """Memory a new model may use right now (None if unknown)."""
+        available = self._available()
+        return None if available is None else available - self.reserve_mb - self._reserved.mb
+
+    def fits(self, model_name, quantized=False):
+        budget = self.budget_mb()
+        return budget is None or model_footprint_mb(model_name, quantized) <= budget
+
+    def could_ever_fit(self, model_name, quantized=False):
+        total = self._total()
+        return total is None or model_footprint_mb(model_name, quantized) <= total - self.reserve_mb
+
+    def _reserve(self, model_name, quantized):
+        """Reservation of model_name if it fits, else None; checking and reserving are one step."""
+        with self._reserved.lock:
+            if not self.fits(model_name, quantized):
+                return None
+            mb = model_footprint_mb(model_name, quantized)
+            self._reserved.mb += mb
+            return Reservation(model_name, mb, self._reserved)
+
+    def admit(self, model_name, quantized=False, allow_downgrade=True, release_cached=None, on_wait=None,
+              cancel_token=None, loadable=None):
+        """Reservation for the model to load in place of model_name; waits while memory may still free up.
+
+        The caller releases the reservation once the load has finished or
+        failed (reservation.model_name is the model admitted).
+        release_cached() drops idle cached models (returns how many).
+        on_wait(needed_mb, budget_mb) is called once if the job has to wait.
+        loadable(model_name) limits the downgrade to models that can be loaded
+        (installed package, model store when offline).
+        Raises InsufficientMemoryError when nothing fits.
+        """
+        reservation = self._reserve(model_name, quantized)
+        if reservation:
+            return reservation
+        if release_cached and release_cached():
+            reservation = self._reserve(model_name, quantized)
+            if reservation:
+                return reservation
+        if self.could_ever_fit(model_name, quantized) and self.wait_seconds > 0:
+            if on_wait: on_wait(model_footprint_mb(model_name, quantized), max(0.0, self.budget_mb() or 0.0))
+            deadline = time.monotonic() + self.wait_seconds
+            while time.monotonic() < deadline:
+                check(cancel_token)
+                time.sleep(self.poll_seconds)
+                reservation = self._reserve(model_name, quantized)
+                if reservation:
+                    return reservation
+        if allow_downgrade:
+            for smaller in smaller_models(model_name):
+                if loadable is not None and not loadable(smaller):
+                    continue
+                reservation = self._reserve(smaller, quantized)
+                if reservation:
+                    return reservation
+        budget = self.budget_mb() or 0.0
+        raise InsufficientMemoryError(
+            f"Model '{model_name}' needs about {model_footprint_mb(model_name, quantized) / 1024:.1f} GB, "
+            f"only {max(0.0, budget) / 1024:.1f} GB is available")
+
+
+_default_governor = None
+
+
+def default_governor():
+    global _default_governor
+    if _default_governor is None:
+        _default_governor = MemoryGovernor()
+    return _default_governor
+
+
+# --- Per-stage peak RSS ---
+_local = threading.local()
+
+
+class _Tracker:
+    def __init__(self):
+        self.stage = None
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="RssSampler", daemon=True)
+
+    def _sample(self):
+        while True:
+            self.record()
+            if self._stop.wait(RSS_SAMPLE_SECONDS):
+                return
+
+    def record(self):
+        rss = current_rss_mb()
+        stage = self.stage
+        if rss is not None and stage is not None:
+            self.peaks[stage] = max(self.peaks.get(stage, 0.0), rss)
+
+
+@contextmanager
+def track_memory():
+    """Record peak RSS per memory_stage() of the enclosed job; yields {stage: peak_mb}."""
+    tracker = _Tracker()
+    previous = getattr(_local, "tracker", None)
+    _local.tracker = tracker
+    tracker._thread.start()
+    try:
+        yield tracker.peaks
+    finally:
+        tracker._stop.set()
+        tracker._thread.join()
+        _local.tracker = previous
+        for stage, peak in tracker.peaks.items():
+            tracker.peaks[stage] = round(peak, 1)
+
+
+@contextmanager
+def memory_stage(name):
+    tracker = getattr(_local, "tracker", None)
+    if tracker is None:
+        yield
+        return
+    previous = tracker.stage
+    tracker.stage = name
+    tracker.record()
+    try:
+        yield
+    finally:
+        tracker.record()
+        tracker.stage = previous
@@ -0,0 +1,242 @@
+"""Verified local store of model weights.
+
+Offline machines cannot let Whisper download its checkpoints on first use,
+so models are provisioned into a store once (copied from a directory, e.g.
+a USB drive or a network share) and every file is checksummed:
+
+    <store>/manifest.json
+    <store>/whisper/base.pt                      openai-whisper checkpoint
+    <store>/ctranslate2/base/model.bin, ...      faster-whisper (CTranslate2) model directory
+    <store>/mt/en-fr/model.bin, source.spm, ...  OPUS-MT translation model (CTranslate2), one per language pair
+
+The manifest records each file's SHA-256 and size. Whisper checkpoints are
+also checked against the hash openai-whisper publishes for them. verify()
+re-hashes the files on a thread pool (hashlib releases the GIL, so files
+are hashed in parallel) and skips files whose size and mtime have not
+changed since their last successful check unless full=True.
+
+The store lives in ~/.captionlab/models, or in CAPTIONLAB_MODEL_STORE (a
+shared read-only directory works). With CAPTIONLAB_OFFLINE=1 a model that is
+not in the store is an error instead of a download.
+"""
+import concurrent.futures
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+DEFAULT_MODEL_STORE = os.path.join(os.path.expanduser("~"), ".captionlab", "models")
+MODEL_STORE_ENV = "CAPTIONLAB_MODEL_STORE"
+OFFLINE_ENV = "CAPTIONLAB_OFFLINE"
+MANIFEST_NAME = "manifest.json"
+HASH_CHUNK_BYTES = 8 << 20
+MAX_HASH_WORKERS = min(8, os.cpu_count() or 4)  # Disk bandwidth runs out before cores do
+WHISPER_KIND = "whisper"
+CTRANSLATE2_KIND = "ctranslate2"
+MT_KIND = "mt"
+CTRANSLATE2_REQUIRED_FILES = ("model.bin", "config.json")
+MT_REQUIRED_FILES = CTRANSLATE2_REQUIRED_FILES + ("source.spm", "target.spm")
+CTRANSLATE2_PREFIX = re.compile(r"^(faster-whisper-|whisper-)")  # Names of the converted models on the Hub
+MT_PREFIX = re.compile(r"^opus-mt-")
+
+
+class ModelStoreError(RuntimeError):
+    """A model is missing from the store, or its files do not match their checksums."""
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def published_whisper_sha256(model_name):
+    """SHA-256 openai-whisper publishes for a checkpoint (part of its download URL), or None."""
+    try:
+        import whisper
+    except ImportError:
+        return None
+    url = getattr(whisper, "_MODELS", {}).get(model_name)
+    return url.split("/")[-2] if url else None
+
+
+def offline():
+    return os.getenv(OFFLINE_ENV) == "1"
+
+
+class ModelStore:
+    def __init__(self, root=None):
+        self.root = root or os.getenv(MODEL_STORE_ENV) or DEFAULT_MODEL_STORE
+        self._lock = threading.Lock()
+        self._manifest = self._load()
+        self._verified_changed = False
+
+    # --- Manifest ---
+    def _load(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def entries(self):
+        """{relative path: {"kind", "model", "sha256", "size"}} of every stored file."""
+        with self._lock:
+            return {member: dict(entry) for member, entry in self._manifest.items()}
+
+    def models(self):
+        """Sorted (kind, model name) pairs in the store."""
+        return sorted({(entry["kind"], entry["model"]) for entry in self.entries().values()})
+
+    # --- Lookup ---
+    def model_path(self, kind, model_name):
+        """Checkpoint file (whisper) or model directory (ctranslate2) of a stored model, or None."""
+        if kind == WHISPER_KIND:
+            member = f"{WHISPER_KIND}/{model_name}.pt"
+            return os.path.join(self.root, member) if member in self._manifest else None
+        prefix = f"{kind}/{model_name}/"
+        if any(member.startswith(prefix) for member in self._manifest):
+            return os.path.join(self.root, kind, model_name)
+        return None
+
+    def require(self, kind, model_name, verify=True):
+        """Path of a stored model, checked against the manifest; raises ModelStoreError.
+
+        Returns None when the model is not stored and downloads are allowed.
+        """
+        path = self.model_path(kind, model_name)
+        if path is None:
+            if offline():
+                raise ModelStoreError(f"Model '{model_name}' ({kind}) is not in the model store {self.root}; "
+                                      f"import it with: python model_store.py import <folder>")
+            return None
+        if verify:
+            prefix = f"{kind}/{model_name}" + (".pt" if kind == WHISPER_KIND else "/")
+            failures = {member: error for member, error in self.verify(prefix=prefix).items() if error}
+            if failures:
+                raise ModelStoreError(f"Model '{model_name}' ({kind}) failed its integrity check: "
+                                      + "; ".join(f"{member}: {error}" for member, error in sorted(failures.items())))
+        return path
+
+    # --- Integrity ---
+    def _check(self, member, entry, full):
+        path = os.path.join(self.root, member)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return "missing"
+        if stat.st_size != entry["size"]:
+            return f"size {stat.st_size} instead of {entry['size']}"
+        if not full and entry.get("verified_mtime_ns") == stat.st_mtime_ns:
+            return None  # Unchanged since its last full hash
+        if sha256_file(path) != entry["sha256"]:
+            return "checksum mismatch"
+        with self._lock:
+            self._manifest[member]["verified_mtime_ns"] = stat.st_mtime_ns
+            self._verified_changed = True
+        return None
+
+    def verify(self, prefix="", full=False, workers=None):
+        """Check stored files in parallel; returns {relative path: None or the problem found}."""
+        entries = {member: entry for member, entry in self.entries().items() if member.startswith(prefix)}
+        if not entries:
+            return {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers or min(len(entries), MAX_HASH_WORKERS)) as pool:
+            futures = {member: pool.submit(self._check, member, entry, full) for member, entry in entries.items()}
+            results = {member: future.result() for member, future in futures.items()}
+        with self._lock:
+            if self._verified_changed:
+                self._verified_changed = False
+                try:
+                    self._save()  # Remember what was verified
+                except OSError:
+                    pass  # Read-only shared store: files are simply hashed again next time
+        return results
+
+    # --- Import ---
+    def _add_file(self, kind, model_name, source, member, expected_sha256=None):
+        sha256 = sha256_file(source)
+        if expected_sha256 and sha256 != expected_sha256:
+            raise ModelStoreError(f"{source} does not match the published checksum of '{model_name}'")
+        target = os.path.join(self.root, member)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.abspath(source) != os.path.abspath(target):
+            tmp_path = target + ".tmp"
+            shutil.copyfile(source, tmp_path)
+            if sha256_file(tmp_path) != sha256:
+                os.remove(tmp_path)
+                raise ModelStoreError(f"{source} changed while it was copied")
+            os.replace(tmp_path, target)
+        stat = os.stat(target)
+        return member, {"kind": kind, "model": model_name, "sha256": sha256, "size": stat.st_size,
+                        "verified_mtime_ns": stat.st_mtime_ns}
+
+    def import_directory(self, source_dir, workers=None):
+        """Copy the models found in source_dir into the store, hashing files in parallel.
+
+        Recognizes Whisper checkpoints (<model>.pt), CTranslate2 model
+        directories (containing model.bin and config.json, named <model> or
+        faster-whisper-<model>) and OPUS-MT translation models (a CTranslate2
+        directory with source.spm and target.spm, named <src>-<tgt> or
+        opus-mt-<src>-<tgt>). Returns the imported (kind, model) pairs.
+        """
+        jobs = []
+        for name in sorted(os.listdir(source_dir)):
+            path = os.path.join(source_dir, name)
+            if os.path.isfile(path) and name.endswith(".pt"):
+                model_name = name[:-len(".pt")]
+                jobs.append((WHISPER_KIND, model_name, path, f"{WHISPER_KIND}/{model_name}.pt",
+                             published_whisper_sha256(model_name)))
+            elif os.path.isdir(path) and all(os.path.isfile(os.path.join(path, required))
+                                             for required in CTRANSLATE2_REQUIRED_FILES):
+                if all(os.path.isfile(os.path.join(path, required)) for required in MT_REQUIRED_FILES):
+                    kind, model_name = MT_KIND, MT_PREFIX.sub("", name)
+                else:
+                    kind, model_name = CTRANSLATE2_KIND, CTRANSLATE2_PREFIX.sub("", name)
+                for file_name in sorted(os.listdir(path)):
+                    if os.path.isfile(os.path.join(path, file_name)):
+                        jobs.append((kind, model_name, os.path.join(path, file_name),
+                                     f"{kind}/{model_name}/{file_name}", None))
+        if not jobs:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers or min(len(jobs), MAX_HASH_WORKERS)) as pool:
+            added = list(pool.map(lambda job: self._add_file(*job), jobs))
+        with self._lock:
+            self._manifest.update(added)
+            self._save()
+        return sorted({(job[0], job[1]) for job in jobs})
+
+    def remove(self, kind, model_name):
+        prefix = f"{kind}/{model_name}" + (".pt" if kind == WHISPER_KIND else "/")
+        with self._lock:
+            members = [member for member in self._manifest if member.startswith(prefix)]
+            for member in members:
+                del self._manifest[member]
+                try:
+                    os.remove(os.path.join(self.root, member))
+                except FileNotFoundError:
+                    pass
+            self._save()
+        return len(members)
+
+
+_default_store = None
+
+
+def default_model_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = ModelStore()
+    return _default_store
@@ -0,0 +1,170 @@
+""".captionlab project files.
+
+A project keeps everything produced for one media file so it can be
+reopened without running Whisper, the translator or Gemini again. The file
+is a zip archive (deflate-compressed JSON members):
+
+    manifest.json             format version, media path/fingerprint/size,
+                              settings, and the list of members below
+    transcript.json           {"text", "language", "segments": <columns>}
+    translations/<lang>.json  same shape, one per target language
+    summary.txt
+
+Segments are stored in SegmentTable.to_columns() form (a few flat arrays
+and one text buffer), which is both small and fast to parse. Opening a
+project only reads the manifest; each member is decompressed on first
+access.
+"""
+import datetime
+import json
+import os
+import threading
+import zipfile
+
+from utils.segment_table import SegmentTable
+
+PROJECT_EXTENSION = ".captionlab"
+PROJECT_FORMAT = "captionlab-project"
+PROJECT_FORMAT_VERSION = 1
+
+MANIFEST_NAME = "manifest.json"
+TRANSCRIPT_NAME = "transcript.json"
+SUMMARY_NAME = "summary.txt"
+TRANSLATIONS_DIR = "translations/"
+
+
+class ProjectFormatError(ValueError):
+    """The file is not a readable .captionlab project."""
+
+
+def _subtitle_data_to_json(subtitle_data):
+    segments = subtitle_data.get("segments") or []
+    table = segments if isinstance(segments, SegmentTable) else SegmentTable.from_segments(segments)
+    return {
+        "text": subtitle_data.get("text", ""),
+        "language": subtitle_data.get("language", "unknown"),
+        "segments": table.to_columns(),
+    }
+
+
+def _subtitle_data_from_json(data):
+    return {
+        "text": data.get("text", ""),
+        "language": data.get("language", "unknown"),
+        "segments": SegmentTable.from_column_dict(data["segments"]),
+    }
+
+
+def _dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def save_project(path, media_path, subtitle_data=None, translations=None, summary="", settings=None,
+                 fingerprint=None, app_version=None):
+    """Write a project file atomically.
+
+    translations maps a language code to translated subtitle data; settings
+    is any JSON-serializable dict (model, languages, cue limits...).
+    """
+    manifest = {
+        "format": PROJECT_FORMAT,
+        "version": PROJECT_FORMAT_VERSION,
+        "app_version": app_version,
+        "saved_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "media": {
+            "path": os.path.abspath(media_path) if media_path else None,
+            "fingerprint": fingerprint,
+            "size": os.path.getsize(media_path) if media_path and os.path.exists(media_path) else None,
+        },
+        "settings": settings or {},
+        "transcript": None,
+        "translations": {},
+        "summary": None,
+    }
+    tmp_path = path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        if subtitle_data and subtitle_data.get("segments"):
+            archive.writestr(TRANSCRIPT_NAME, _dump(_subtitle_data_to_json(subtitle_data)))
+            manifest["transcript"] = TRANSCRIPT_NAME
+        for language, translated_data in (translations or {}).items():
+            if translated_data and translated_data.get("segments"):
+                member = f"{TRANSLATIONS_DIR}{language}.json"
+                archive.writestr(member, _dump(_subtitle_data_to_json(translated_data)))
+                manifest["translations"][language] = member
+        if summary:
+            archive.writestr(SUMMARY_NAME, summary.encode("utf-8"))
+            manifest["summary"] = SUMMARY_NAME
+        # Written last so a reader never sees a manifest pointing at missing members
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+class ProjectFile:
+    """Read side of a project; members are loaded lazily and cached."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            self._archive = zipfile.ZipFile(path, "r")
+            self.manifest = json.loads(self._archive.read(MANIFEST_NAME).decode("utf-8"))
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            raise ProjectFormatError(f"Not a CaptionLab project: {path} ({e})") from e
+        if self.manifest.get("format") != PROJECT_FORMAT:
+            raise ProjectFormatError(f"Not a CaptionLab project: {path}")
+        if self.manifest.get("version", 0) > PROJECT_FORMAT_VERSION:
+            raise ProjectFormatError(f"{os.path.basename(path)} was saved by a newer CaptionLab "
+                                     f"(format {self.manifest.get('version')})")
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        self._archive.close()
+
+    def _read(self, member):
+        with self._lock:
+            if member not in self._cache:
+                self._cache[member] = self._archive.read(member)
+            return self._cache[member]
+
+    @property
+    def media_path(self):
+        return self.manifest["media"].get("path")
+
+    @property
+    def fingerprint(self):
+        return self.manifest["media"].get("fingerprint")
+
+    @property
+    def settings(self):
+        return self.manifest.get("settings", {})
+
+    @property
+    def translation_languages(self):
+        return list(self.manifest.get("translations", {}))
+
+    def transcript(self):
+        """Original transcription as subtitle data (None if the project has none)."""
+        member = self.manifest.get("transcript")
+        return _subtitle_data_from_json(json.loads(self._read(member))) if member else None
+
+    def translation(self, language):
+        member = self.manifest.get("translations", {}).get(language)
+        return _subtitle_data_from_json(json.loads(self._read(member))) if member else None
+
+    def translations(self):
+        return {language: self.translation(language) for language in self.translation_languages}
+
+    def summary(self):
+        member = self.manifest.get("summary")
+        return self._read(member).decode("utf-8") if member else ""
+
+
+def open_project(path):
+    return ProjectFile(path)
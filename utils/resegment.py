@@ -0,0 +1,305 @@
+"""Split and merge transcript segments into readable subtitle cues.
+
+Whisper segments can run for 20+ seconds or 200+ characters. resegment()
+turns them into cues that respect CueLimits (characters per line, lines
+per cue, characters per second, minimum/maximum duration) in one linear
+pass:
+
+1. split: segments over the limits are cut into tokens (Whisper's word
+   timings when present, otherwise words timed by character position) and
+   filled greedily, preferring to cut after sentence or clause punctuation
+   and always cutting at long pauses; a cue whose text does not wrap into
+   max_lines lines is cut again;
+2. merge: cues shorter than the minimum duration join a neighbour when the
+   result still fits;
+3. timing: cue ends are pushed into the following silence until the cue
+   meets the minimum duration and the reading speed limit;
+4. wrap: text is broken into balanced lines.
+
+A cue fits when wrap_text() keeps every line within max_chars_per_line;
+only a single word longer than a whole cue can break that.
+
+Segments already within the limits go straight to steps 2-4, so typical
+transcripts are mostly a copy.
+"""
+import re
+from itertools import accumulate
+
+from utils.segment_table import SegmentTable, as_segment_table
+
+SENTENCE_END = (".", "?", "!", "…", "。", "？", "！")
+CLAUSE_END = (",", ";", ":", "，", "、", "；", "：")
+_BREAK_PRIORITY = dict([(mark, 2) for mark in SENTENCE_END] + [(mark, 1) for mark in CLAUSE_END])
+MAX_PAUSE_SECONDS = 1.0  # A silence this long between words always ends a cue
+MIN_CUE_GAP = 0.08  # Seconds kept free before the next cue when extending an end time
+
+_TOKEN_RE = re.compile(r"\s*\S+")
+
+
+class CueLimits:
+    """Readability limits for subtitle cues (defaults follow common broadcast guidelines)."""
+
+    def __init__(self, max_chars_per_line=42, max_lines=2, max_cps=17.0, min_duration=1.0, max_duration=7.0):
+        self.max_chars_per_line = max_chars_per_line
+        self.max_lines = max_lines
+        self.max_cps = max_cps
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+
+    @property
+    def max_chars(self):
+        return self.max_chars_per_line * self.max_lines
+
+    def to_dict(self):
+        return {"max_chars_per_line": self.max_chars_per_line, "max_lines": self.max_lines, "max_cps": self.max_cps,
+                "min_duration": self.min_duration, "max_duration": self.max_duration}
+
+    @classmethod
+    def from_dict(cls, values):
+        defaults = cls().to_dict()
+        return cls(**{key: values.get(key, default) for key, default in defaults.items()})
+
+    def __repr__(self):
+        return f"CueLimits({self.to_dict()})"
+
+
+def _text_tokens(text, start, end):
+    """Split stripped text into tokens timed by character position; returns (raws, starts, ends) columns."""
+    raws = _TOKEN_RE.findall(text)  # Contiguous: token k covers offsets[k]..offsets[k + 1]
+    scale = (end - start) / (len(text) or 1)
+    times = [start + scale * offset for offset in accumulate(map(len, raws), initial=0)]
+    return raws, times[:-1], times[1:]
+
+
+def _split_long_tokens(raws, starts, ends, max_chars):
+    """Cut tokens longer than a whole cue (unspaced scripts) into max_chars pieces; same columns as _text_tokens()."""
+    split_raws, split_starts, split_ends = [], [], []
+    for raw, start, end in zip(raws, starts, ends):
+        text = raw.strip()
+        if len(text) <= max_chars:
+            split_raws.append(raw)
+            split_starts.append(start)
+            split_ends.append(end)
+            continue
+        count = -(-len(text) // max_chars)
+        step = (end - start) / count
+        for n in range(count):
+            split_raws.append((" " if n == 0 and raw[:1].isspace() else "") + text[n * max_chars:(n + 1) * max_chars])
+            split_starts.append(start + n * step)
+            split_ends.append(start + (n + 1) * step)
+    return split_raws, split_starts, split_ends
+
+
+def _split_tokens(raws, starts, ends, limits):
+    """Greedily group tokens (parallel raw text/start/end columns) into cues; return (first, end) index ranges."""
+    max_chars, max_duration, min_duration = limits.max_chars, limits.max_duration, limits.min_duration
+    priorities = _BREAK_PRIORITY
+    widths = list(accumulate(map(len, raws), initial=0))  # widths[k]: characters of raws[:k]
+
+    def budget(first):
+        # The cue starting at first fits while widths[end] <= budget: its stripped text has max_chars at most
+        return widths[first] + len(raws[first]) - len(raws[first].lstrip()) + max_chars
+
+    cues = []
+    first = 0  # The cue being filled holds tokens first..i-1
+    first_start = starts[0] if raws else 0
+    limit = budget(0) if raws else 0
+    best_break = -1  # Token after which to cut, best punctuation seen so far
+    best_priority = 0
+    for i, raw in enumerate(raws):
+        start, end = starts[i], ends[i]
+        if i > first:
+            if start - ends[i - 1] >= MAX_PAUSE_SECONDS:
+                cues.append((first, i))
+                first, first_start, limit, best_break, best_priority = i, start, budget(i), -1, 0
+            elif widths[i + 1] > limit or end - first_start > max_duration:
+                # Cut at punctuation if it keeps at least half a cue on the left
+                cut = i
+                if best_break >= 0 and widths[best_break + 1] - limit + max_chars >= max_chars // 2:
+                    cut = best_break + 1
+                cues.append((first, cut))
+                first, best_break, best_priority = cut, -1, 0
+                for k in range(first, i):
+                    priority = priorities.get(raws[k][-1:], 0)
+                    if priority and priority >= best_priority:
+                        best_break, best_priority = k, priority
+                if first < i:
+                    limit = budget(first)
+                    if widths[i + 1] > limit:
+                        cues.append((first, i))
+                        first, best_break, best_priority = i, -1, 0
+                if first == i:
+                    limit = budget(i)
+                first_start = starts[first]
+        priority = priorities.get(raw[-1:], 0)  # Tokens never end with whitespace
+        if priority == 2 and end - first_start >= min_duration:
+            # A finished sentence long enough to read on its own
+            cues.append((first, i + 1))
+            first, best_break, best_priority = i + 1, -1, 0
+            if first < len(raws):
+                first_start, limit = starts[first], budget(first)
+        elif priority and priority >= best_priority:
+            best_break, best_priority = i, priority
+    if first < len(raws):
+        cues.append((first, len(raws)))
+    return cues
+
+
+def _fitted_cues(ranges, raws, fits):
+    """(first, end, text) of each (first, end) token range, cut further until its text fits.
+
+    A single token is kept as it is.
+    """
+    for first, end in ranges:
+        text = "".join(raws[first:end]).strip()
+        while end - first > 1 and not fits(text):
+            cut = end - 1
+            head = "".join(raws[first:cut]).strip()
+            while cut - first > 1 and not fits(head):
+                cut -= 1
+                head = "".join(raws[first:cut]).strip()
+            yield first, cut, head
+            first = cut
+            text = "".join(raws[first:end]).strip()
+        yield first, end, text
+
+
+def wrap_text(text, max_chars_per_line=42, max_lines=2):
+    """Break a cue into at most max_lines lines of at most max_chars_per_line, balanced when two lines suffice.
+
+    Words longer than a line are cut; text that does not fit (see fits_lines()) ends up on the last line.
+    """
+    if "\n" in text or "  " in text:
+        text = " ".join(text.split())
+    if len(text) <= max_chars_per_line or max_lines < 2:
+        return text
+    if len(text) <= 2 * max_chars_per_line and " " in text:
+        # Space closest to the middle, so both lines have similar lengths
+        middle = len(text) // 2
+        best = -1
+        for position in (text.rfind(" ", 0, middle + 1), text.find(" ", middle)):
+            if (position != -1 and position <= max_chars_per_line and len(text) - position - 1 <= max_chars_per_line
+                    and (best == -1 or abs(position - middle) < abs(best - middle))):
+                best = position
+        if best != -1:
+            return text[:best] + "\n" + text[best + 1:]
+    lines = []
+    rest = text
+    while len(rest) > max_chars_per_line and len(lines) < max_lines - 1:
+        cut = rest.rfind(" ", 0, max_chars_per_line + 1)  # Last space that keeps the line short enough
+        if cut == -1:
+            lines.append(rest[:max_chars_per_line])  # A word longer than the line
+            rest = rest[max_chars_per_line:]
+        else:
+            lines.append(rest[:cut])
+            rest = rest[cut + 1:]
+    lines.append(rest)
+    return "\n".join(lines)
+
+
+def fits_lines(text, max_chars_per_line=42, max_lines=2):
+    """Whether wrap_text() keeps text within max_lines lines of max_chars_per_line.
+
+    Greedy lines need the fewest lines, and wrap_text() only balances two
+    lines when they fit, so the greedy cuts decide without building the text.
+    """
+    if len(text) <= max_chars_per_line:
+        return True
+    if "\n" in text or "  " in text:
+        text = " ".join(text.split())
+    if max_lines < 2 or len(text) > max_chars_per_line * max_lines + max_lines - 1:
+        return len(text) <= max_chars_per_line
+    rest = text
+    for _ in range(max_lines - 1):
+        if len(rest) <= max_chars_per_line:
+            return True
+        cut = rest.rfind(" ", 0, max_chars_per_line + 1)
+        rest = rest[max_chars_per_line:] if cut == -1 else rest[cut + 1:]
+    return len(rest) <= max_chars_per_line
+
+
+def resegment(segments, limits=None):
+    """Return a new SegmentTable of readable cues; word timings are carried over when present."""
+    limits = limits or CueLimits()
+    table = as_segment_table(segments)
+    has_words = table.has_words
+    max_chars = limits.max_chars
+    max_chars_per_line, max_lines = limits.max_chars_per_line, limits.max_lines
+
+    def fits(text):
+        return len(text) <= max_chars_per_line or (len(text) <= max_chars
+                                                   and fits_lines(text, max_chars_per_line, max_lines))
+
+    min_duration, max_duration, max_cps = limits.min_duration, limits.max_duration, limits.max_cps
+
+    # 1. Split: list of [start, end, text, number of words]. Cues always cover
+    # consecutive words, so the result can share the source WordTable.
+    cues = []
+    for index, (_, start, end, text) in enumerate(table.rows()):
+        text = text.strip()
+        first_word, end_word = table.word_range(index) if has_words else (0, 0)
+        if end - start <= max_duration and fits(text):
+            cues.append([start, end, text, end_word - first_word])
+            continue
+        timed_words = end_word > first_word
+        if timed_words:
+            words = table.words_for(index)  # Words are never cut
+            raws, starts, ends = words.texts(), words.starts, words.ends
+        else:
+            raws, starts, ends = _text_tokens(text, start, end)
+            if raws and max(map(len, raws)) > max_chars:
+                raws, starts, ends = _split_long_tokens(raws, starts, ends, max_chars)
+        for first, last, cue_text in _fitted_cues(_split_tokens(raws, starts, ends, limits), raws, fits):
+            # Cues cut from text tokens own no words of the WordTable
+            cues.append([starts[first], ends[last - 1], cue_text, last - first if timed_words else 0])
+        if not raws:
+            cues.append([start, end, text, 0])
+
+    # 2. Merge cues that are too short to read into the previous one when the result still fits
+    merged = []
+    for cue in cues:
+        if merged:
+            previous = merged[-1]
+            previous_duration = previous[1] - previous[0]
+            if ((cue[1] - cue[0] < min_duration or previous_duration < min_duration)
+                    and cue[0] - previous[1] < MAX_PAUSE_SECONDS
+                    and len(previous[2]) + 1 + len(cue[2]) <= max_chars
+                    and cue[1] - previous[0] <= max_duration
+                    and not (previous_duration >= min_duration and previous[2].endswith(SENTENCE_END))
+                    and fits(f"{previous[2]} {cue[2]}")):
+                previous[1] = cue[1]
+                previous[2] = f"{previous[2]} {cue[2]}".strip()
+                previous[3] += cue[3]
+                continue
+        merged.append(cue)
+
+    # 3. Timing: minimum duration and reading speed, without running into the next cue
+    last = len(merged) - 1
+    for i, cue in enumerate(merged):
+        start, end = cue[0], cue[1]
+        needed = max(min_duration, len(cue[2]) / max_cps) if max_cps else min_duration
+        needed = min(needed, max_duration)
+        if end - start < needed:
+            limit = merged[i + 1][0] - MIN_CUE_GAP if i < last else start + needed
+            cue[1] = max(end, min(start + needed, limit))
+
+    # 4. Wrap
+    word_offsets = None
+    if has_words:
+        word_offsets = [table.word_range(0)[0] if len(table) else 0]
+        for cue in merged:
+            word_offsets.append(word_offsets[-1] + cue[3])
+    return SegmentTable.from_columns(
+        range(1, len(merged) + 1),
+        [cue[0] for cue in merged],
+        [cue[1] for cue in merged],
+        [wrap_text(cue[2], max_chars_per_line, max_lines) for cue in merged],
+        word_table=table.word_table, word_offsets=word_offsets,
+    )
+
+
+def wrap_segment_texts(segments, limits=None):
+    """Re-wrap texts (e.g. after translation) without changing timings."""
+    limits = limits or CueLimits()
+    table = as_segment_table(segments)
+    return table.with_texts([wrap_text(text, limits.max_chars_per_line, limits.max_lines) for text in table.texts()])
@@ -0,0 +1,126 @@
+"""Learned real-time factors (processing seconds per audio second).
+
+Each finished transcription records how long the model took for how much
+audio on this machine; the running average is used to estimate how long
+the next job will take before it starts, and to stabilize the ETA while
+it runs.
+"""
+import json
+import os
+import platform
+import threading
+
+DEFAULT_RTF_PATH = os.path.join(os.path.expanduser("~"), ".captionlab", "rtf.json")
+
+# Rough CPU-only starting points, replaced by measurements after the first run
+PRIOR_RTF = {"tiny": 0.15, "base": 0.3, "small": 0.9, "medium": 2.5, "large": 5.0}
+SMOOTHING = 0.3  # Weight of the newest measurement in the moving average
+ETA_PRIOR_AUDIO_SECONDS = 60.0  # Audio processed before observed speed outweighs the stored factor
+
+
+def machine_key():
+    """Identify the hardware the factors were measured on."""
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}"
+
+
+class RtfStore:
+    def __init__(self, path=DEFAULT_RTF_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reload(self):
+        """Re-read the file, e.g. after another process (the inference workers) recorded a run."""
+        data = self._load()
+        with self._lock:
+            self._data = data
+
+    def learned(self, model_key):
+        """Stored entry {"rtf": ..., "runs": ...} for this machine, or None."""
+        with self._lock:
+            return self._data.get(machine_key(), {}).get(model_key)
+
+    def estimate(self, model_key):
+        """Best known real-time factor: learned on this machine, else the prior."""
+        entry = self.learned(model_key)
+        if entry:
+            return entry["rtf"]
+        return PRIOR_RTF.get(model_key.split("|")[0].split(".")[0])  # English-only "base.en" runs like "base"
+
+    def record(self, model_key, audio_seconds, processing_seconds):
+        if audio_seconds <= 0 or processing_seconds <= 0:
+            return
+        rtf = processing_seconds / audio_seconds
+        with self._lock:
+            models = self._data.setdefault(machine_key(), {})
+            entry = models.get(model_key)
+            if entry:
+                entry["rtf"] = (1 - SMOOTHING) * entry["rtf"] + SMOOTHING * rtf
+                entry["runs"] += 1
+            else:
+                models[model_key] = {"rtf": rtf, "runs": 1}
+            try:
+                self._save()
+            except OSError as e:
+                print(f"Could not save real-time factors to {self.path}: {e}")
+
+
+_default_store = None
+
+
+def default_store():
+    global _default_store
+    if _default_store is None:
+        _default_store = RtfStore()
+    return _default_store
+
+
+class TranscriptionEta:
+    """ETA for one transcription from audio seconds processed so far.
+
+    The stored factor is trusted at first; as more audio is processed the
+    observed speed of this run takes over.
+    """
+
+    def __init__(self, audio_seconds, prior_rtf=None):
+        self.audio_seconds = audio_seconds
+        self.prior_rtf = prior_rtf
+
+    def expected_seconds(self):
+        return self.audio_seconds * self.prior_rtf if self.prior_rtf else None
+
+    def update(self, processed_seconds, elapsed_seconds):
+        """Return (fraction done, remaining seconds or None, speed in x realtime or None)."""
+        fraction = min(1.0, processed_seconds / self.audio_seconds) if self.audio_seconds else 0.0
+        rtf = self.prior_rtf
+        if processed_seconds > 0 and elapsed_seconds > 0:
+            observed = elapsed_seconds / processed_seconds
+            weight = processed_seconds / (processed_seconds + ETA_PRIOR_AUDIO_SECONDS)
+            rtf = observed if rtf is None else weight * observed + (1 - weight) * rtf
+        if rtf is None:
+            return fraction, None, None
+        remaining = max(0.0, self.audio_seconds - processed_seconds) * rtf
+        return fraction, remaining, 1.0 / rtf if rtf > 0 else None
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
@@ -0,0 +1,125 @@
+"""Corrections made to a transcript after it was transcribed.
+
+Fixing one cue used to mean translating and exporting the whole file
+again. TranscriptEdits applies an edit to the transcript and keeps, per
+translation, the segments whose source text changed since it was made:
+only those are translated again (workers.pipeline.retranslate_job) and
+spliced into the existing translation. An edit marks the summary stale
+instead of regenerating it.
+
+SrtDocument holds the SubRip block of every cue, so rewriting the VLC
+subtitle file or an export after an edit formats only the edited cues.
+"""
+from utils import tracing
+from utils.helpers import format_srt_timestamp
+from utils.segment_table import as_segment_table
+
+ORIGINAL = "original"  # SrtDocument key of the transcript; translations use their language code
+
+
+def replace_segment_texts(data, changes):
+    """Transcription or translation dict with changes ({index: text}) applied; timings are shared."""
+    segments = as_segment_table(data["segments"]).with_replaced_texts(changes)
+    return dict(data, segments=segments, text=segments.full_text())
+
+
+def changed_indexes(old_segments, new_segments):
+    """Indexes whose text differs between two versions of the same cues."""
+    old_texts = as_segment_table(old_segments).texts()
+    new_texts = as_segment_table(new_segments).texts()
+    return [i for i, (old, new) in enumerate(zip(old_texts, new_texts)) if old != new]
+
+
+class TranscriptEdits:
+    def __init__(self):
+        self.stale = {}  # Translation language -> indexes waiting to be translated again
+        self.running = {}  # Translation language -> indexes being translated again
+        self.summary_stale = False
+
+    def clear(self):
+        self.stale.clear()
+        self.running.clear()
+        self.summary_stale = False
+
+    def edit(self, subtitle_data, index, text, languages=()):
+        """Apply one edit; returns the new transcription dict, or None when the text did not change.
+
+        The segment becomes stale in every translation of languages.
+        """
+        segments = as_segment_table(subtitle_data["segments"])
+        if segments.text_at(index) == text:
+            return None
+        with tracing.span("edit.segment", segments=len(segments)):
+            edited = replace_segment_texts(subtitle_data, {index: text})
+        for language in languages:
+            self.mark_stale(language, [index])
+        self.summary_stale = True
+        return edited
+
+    def mark_stale(self, language, indexes):
+        if indexes:
+            self.stale.setdefault(language, set()).update(indexes)
+
+    def take(self, language):
+        """Stale indexes of a translation, sorted; they count as running until finish()."""
+        indexes = sorted(self.stale.pop(language, ()))
+        if indexes:
+            self.running[language] = indexes
+        return indexes
+
+    def finish(self, language, succeeded=True):
+        """End a run started with take(); a failed run's indexes become stale again."""
+        indexes = self.running.pop(language, ())
+        if not succeeded:
+            self.mark_stale(language, indexes)
+
+    def forget(self, language):
+        """A new full translation replaced this one."""
+        self.stale.pop(language, None)
+        self.running.pop(language, None)
+
+    def stale_indexes(self):
+        """Every segment with a translation still to update."""
+        indexes = set()
+        for language_indexes in list(self.stale.values()) + list(self.running.values()):
+            indexes.update(language_indexes)
+        return indexes
+
+    def to_dict(self):
+        """Project settings form: stale indexes (running ones included) by language."""
+        stale = {language: set(indexes) for language, indexes in self.stale.items()}
+        for language, indexes in self.running.items():
+            stale.setdefault(language, set()).update(indexes)
+        return {"summary_stale": self.summary_stale,
+                "stale_translations": {language: sorted(indexes) for language, indexes in stale.items() if indexes}}
+
+    def restore(self, settings):
+        self.clear()
+        self.summary_stale = bool(settings.get("summary_stale"))
+        for language, indexes in (settings.get("stale_translations") or {}).items():
+            self.mark_stale(language, indexes)
+
+
+def srt_block(number, start, end, text):
+    return f"{number}\n{format_srt_timestamp(start)} --> {format_srt_timestamp(end)}\n{text}\n\n"
+
+
+class SrtDocument:
+    """SubRip text of a segment table (the same as workers.pipeline.write_srt), one cached block per cue."""
+
+    def __init__(self, segments):
+        self.blocks = [srt_block(i + 1, start, end, text)
+                       for i, (_, start, end, text) in enumerate(as_segment_table(segments).rows())]
+
+    def update(self, segments, indexes):
+        """Format the cues at indexes again from segments (same cues, new texts)."""
+        segments = as_segment_table(segments)
+        starts, ends = segments.starts, segments.ends
+        for index in indexes:
+            self.blocks[index] = srt_block(index + 1, starts[index], ends[index], segments.text_at(index))
+
+    def write(self, output_path):
+        with tracing.span("export.srt", segments=len(self.blocks)) as sp:
+            with open(output_path, 'w', encoding='utf-8', errors='replace') as srt_file:
+                srt_file.write("".join(self.blocks))
+                sp.set(bytes=srt_file.tell())
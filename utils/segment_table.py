@@ -0,0 +1,476 @@
+"""Columnar storage for subtitle segments.
+
+A transcript used to be a list of {"id", "start", "end", "text"} dicts,
+which costs several hundred bytes of object overhead per segment and is
+copied whole by every translation. SegmentTable keeps ids and times in
+typed arrays and all texts in one string with an offsets array:
+
+- slicing (table[10:20]) returns a view over the same buffers, no copy;
+- with_texts() builds a translation that shares the id/time arrays;
+- starts/ends are exposed as memoryviews (numpy.frombuffer works on them);
+- iterating or indexing yields SegmentView rows that behave like the old
+  read-only dicts (segment["text"], segment.get("start", 0), dict(segment)),
+  so existing call sites keep working.
+
+With word_timestamps, each segment also has its words in a WordTable:
+float32 start/end/probability columns and one text buffer, about
+WORD_BYTES_BUDGET bytes per word (an hour of speech is ~10k words).
+
+Whisper's per-segment confidence (avg_logprob, no_speech_prob,
+compression_ratio) is kept in optional float32 columns as well.
+"""
+import hashlib
+from array import array
+from bisect import bisect_right
+from collections.abc import Mapping, Sequence
+
+SEGMENT_KEYS = ("id", "start", "end", "text")
+WORD_KEYS = ("word", "start", "end", "probability")
+CONFIDENCE_KEYS = ("avg_logprob", "no_speech_prob", "compression_ratio")
+# Per-word memory target: 3 float32 columns + a uint32 offset + the text itself
+WORD_BYTES_BUDGET = 24
+
+
+def _offsets_for(texts, typecode="q"):
+    offsets = array(typecode, [0])
+    position = 0
+    for text in texts:
+        position += len(text)
+        offsets.append(position)
+    return offsets
+
+
+class WordView(Mapping):
+    """Read-only row of a WordTable, shaped like Whisper's word dicts."""
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        table, i = self._table, self._index
+        if key == "word":
+            return table._buffer[table._offsets[i]:table._offsets[i + 1]]
+        if key == "start":
+            return table._starts[i]
+        if key == "end":
+            return table._ends[i]
+        if key == "probability":
+            return table._probabilities[i]
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(WORD_KEYS)
+
+    def __len__(self):
+        return len(WORD_KEYS)
+
+    def __repr__(self):
+        return f"WordView({dict(self)!r})"
+
+
+class WordTable(Sequence):
+    """Word timings of a whole transcript; SegmentTable.words_for(i) returns views into it."""
+    __slots__ = ("_starts", "_ends", "_probabilities", "_buffer", "_offsets", "_lo", "_hi")
+
+    def __init__(self, starts, ends, probabilities, buffer, offsets, lo=0, hi=None):
+        self._starts = starts
+        self._ends = ends
+        self._probabilities = probabilities
+        self._buffer = buffer
+        self._offsets = offsets
+        self._lo = lo
+        self._hi = len(starts) if hi is None else hi
+
+    @classmethod
+    def from_words(cls, words):
+        """Build from Whisper word dicts ({"word", "start", "end", "probability"})."""
+        words = list(words)
+        texts = [word.get("word", "") or "" for word in words]
+        return cls(array("f", [word.get("start", 0) or 0 for word in words]),
+                   array("f", [word.get("end", 0) or 0 for word in words]),
+                   array("f", [word.get("probability", 0) or 0 for word in words]),
+                   "".join(texts), _offsets_for(texts, "I"))
+
+    def __len__(self):
+        return self._hi - self._lo
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return WordTable.from_words([self[i] for i in range(start, stop, step)])
+            return self._view(self._lo + start, self._lo + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("word index out of range")
+        return WordView(self, self._lo + index)
+
+    def __iter__(self):
+        for i in range(self._lo, self._hi):
+            yield WordView(self, i)
+
+    def __repr__(self):
+        return f"<WordTable {len(self)} words>"
+
+    def _view(self, lo, hi):
+        return WordTable(self._starts, self._ends, self._probabilities, self._buffer, self._offsets, lo, hi)
+
+    @property
+    def starts(self):
+        return memoryview(self._starts)[self._lo:self._hi]
+
+    @property
+    def ends(self):
+        return memoryview(self._ends)[self._lo:self._hi]
+
+    @property
+    def probabilities(self):
+        return memoryview(self._probabilities)[self._lo:self._hi]
+
+    def texts(self):
+        offsets, buffer = self._offsets, self._buffer
+        return [buffer[offsets[i]:offsets[i + 1]] for i in range(self._lo, self._hi)]
+
+    def rows(self):
+        """Yield (word, start, end, probability) tuples."""
+        starts, ends, probabilities, offsets, buffer = self._starts, self._ends, self._probabilities, self._offsets, self._buffer
+        for i in range(self._lo, self._hi):
+            yield buffer[offsets[i]:offsets[i + 1]], starts[i], ends[i], probabilities[i]
+
+    def to_list(self):
+        return [{"word": w, "start": s, "end": e, "probability": p} for w, s, e, p in self.rows()]
+
+    def to_columns(self):
+        lo, hi = self._lo, self._hi
+        base = self._offsets[lo]
+        return {
+            "starts": self._starts[lo:hi].tolist(),
+            "ends": self._ends[lo:hi].tolist(),
+            "probabilities": self._probabilities[lo:hi].tolist(),
+            "text": self._buffer[base:self._offsets[hi]],
+            "offsets": [offset - base for offset in self._offsets[lo:hi + 1]],
+        }
+
+    @classmethod
+    def from_column_dict(cls, columns):
+        return cls(array("f", columns["starts"]), array("f", columns["ends"]), array("f", columns["probabilities"]),
+                   columns["text"], array("I", columns["offsets"]))
+
+    def nbytes(self):
+        arrays = (self._starts, self._ends, self._probabilities, self._offsets)
+        return sum(a.itemsize * len(a) for a in arrays) + len(self._buffer.encode("utf-8", "surrogatepass"))
+
+
+class SegmentView(Mapping):
+    """Read-only dict-like row of a SegmentTable."""
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        table, i = self._table, self._index
+        if key == "text":
+            return table._buffer[table._offsets[i]:table._offsets[i + 1]]
+        if key == "start":
+            return table._starts[i]
+        if key == "end":
+            return table._ends[i]
+        if key == "id":
+            return table._ids[i]
+        if key == "words" and table._words is not None:
+            return table._words_at(i)
+        if key in CONFIDENCE_KEYS and table._confidence is not None:
+            return table._confidence[CONFIDENCE_KEYS.index(key)][i]
+        raise KeyError(key)
+
+    def _keys(self):
+        keys = SEGMENT_KEYS
+        if self._table._words is not None:
+            keys += ("words",)
+        if self._table._confidence is not None:
+            keys += CONFIDENCE_KEYS
+        return keys
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return f"SegmentView({dict(self)!r})"
+
+
+class SegmentTable(Sequence):
+    __slots__ = ("_ids", "_starts", "_ends", "_buffer", "_offsets", "_words", "_word_offsets", "_confidence", "_lo", "_hi")
+
+    def __init__(self, ids, starts, ends, buffer, offsets, lo=0, hi=None, words=None, word_offsets=None, confidence=None):
+        self._ids = ids
+        self._starts = starts
+        self._ends = ends
+        self._buffer = buffer
+        self._offsets = offsets
+        # words is one WordTable for the whole transcript; segment i owns
+        # words word_offsets[i]:word_offsets[i + 1]
+        self._words = words
+        self._word_offsets = word_offsets
+        # Tuple of float32 arrays in CONFIDENCE_KEYS order, or None
+        self._confidence = confidence
+        self._lo = lo
+        self._hi = len(ids) if hi is None else hi
+
+    @classmethod
+    def from_columns(cls, ids, starts, ends, texts, words=None, word_table=None, word_offsets=None, confidence=None):
+        """words, if given, holds one iterable of Whisper word dicts per segment.
+
+        Alternatively word_table/word_offsets share an existing WordTable:
+        segment i gets words word_offsets[i]:word_offsets[i + 1] of it.
+        confidence maps each of CONFIDENCE_KEYS to one value per segment.
+        """
+        texts = list(texts)
+        table = cls(array("q", ids), array("d", starts), array("d", ends), "".join(texts), _offsets_for(texts))
+        if words is not None:
+            per_segment = [list(segment_words or ()) for segment_words in words]
+            table._words = WordTable.from_words(word for segment_words in per_segment for word in segment_words)
+            table._word_offsets = _offsets_for(per_segment, "I")
+        elif word_table is not None:
+            table._words = word_table
+            table._word_offsets = array("I", word_offsets)
+        if confidence is not None:
+            table._confidence = tuple(array("f", confidence[key]) for key in CONFIDENCE_KEYS)
+        return table
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build a table from Whisper-style segment dicts (or another table)."""
+        if isinstance(segments, SegmentTable):
+            return segments
+        segments = list(segments)
+        has_words = any(segment.get("words") for segment in segments)
+        has_confidence = bool(segments) and all("avg_logprob" in segment for segment in segments)
+        return cls.from_columns(
+            [i + 1 if segment.get("id") is None else segment["id"] for i, segment in enumerate(segments)],
+            [segment.get("start", 0) or 0 for segment in segments],
+            [segment.get("end", 0) or 0 for segment in segments],
+            [segment.get("text", "") or "" for segment in segments],
+            words=[segment.get("words") for segment in segments] if has_words else None,
+            confidence={key: [segment.get(key) or 0 for segment in segments] for key in CONFIDENCE_KEYS}
+            if has_confidence else None,
+        )
+
+    def __len__(self):
+        return self._hi - self._lo
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return SegmentTable.from_segments([self[i] for i in range(start, stop, step)])
+            return SegmentTable(self._ids, self._starts, self._ends, self._buffer, self._offsets,
+                                self._lo + start, self._lo + max(start, stop), self._words, self._word_offsets,
+                                self._confidence)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("segment index out of range")
+        return SegmentView(self, self._lo + index)
+
+    def __iter__(self):
+        for i in range(self._lo, self._hi):
+            yield SegmentView(self, i)
+
+    def __repr__(self):
+        return f"<SegmentTable {len(self)} segments>"
+
+    # --- Column access ---
+    @property
+    def ids(self):
+        return memoryview(self._ids)[self._lo:self._hi]
+
+    @property
+    def starts(self):
+        return memoryview(self._starts)[self._lo:self._hi]
+
+    @property
+    def ends(self):
+        return memoryview(self._ends)[self._lo:self._hi]
+
+    @property
+    def has_confidence(self):
+        return self._confidence is not None
+
+    def confidence(self, key):
+        """One of CONFIDENCE_KEYS as a float32 memoryview (None if Whisper's scores were not kept)."""
+        if self._confidence is None:
+            return None
+        return memoryview(self._confidence[CONFIDENCE_KEYS.index(key)])[self._lo:self._hi]
+
+    @property
+    def has_words(self):
+        return self._words is not None
+
+    def _words_at(self, i):
+        return self._words._view(self._word_offsets[i], self._word_offsets[i + 1])
+
+    @property
+    def word_table(self):
+        """The WordTable shared by this table and its slices (None without word timings)."""
+        return self._words
+
+    def word_range(self, index):
+        """(first, end) positions of a segment's words in word_table."""
+        i = self._lo + index
+        return self._word_offsets[i], self._word_offsets[i + 1]
+
+    def words_for(self, index):
+        """Words of one segment as a WordTable view (empty without word timings)."""
+        if self._words is None:
+            return WordTable.from_words([])
+        return self._words_at(self._lo + index)
+
+    def all_words(self):
+        """Words of every segment in this table, as one WordTable view."""
+        if self._words is None:
+            return WordTable.from_words([])
+        return self._words._view(self._word_offsets[self._lo], self._word_offsets[self._hi])
+
+    def text_at(self, index):
+        i = self._lo + index
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]]
+
+    def texts(self):
+        offsets, buffer = self._offsets, self._buffer
+        return [buffer[offsets[i]:offsets[i + 1]] for i in range(self._lo, self._hi)]
+
+    def rows(self):
+        """Yield (id, start, end, text) tuples, cheaper than dict-like rows for bulk work."""
+        ids, starts, ends, offsets, buffer = self._ids, self._starts, self._ends, self._offsets, self._buffer
+        for i in range(self._lo, self._hi):
+            yield ids[i], starts[i], ends[i], buffer[offsets[i]:offsets[i + 1]]
+
+    def digest(self):
+        """Hex digest of the ids, timings and texts, the same in every process (job keys).
+
+        Word timings and confidence are not included.
+        """
+        lo, hi = self._lo, self._hi
+        base = self._offsets[lo]
+        content = hashlib.blake2b(digest_size=16)
+        content.update(self._ids[lo:hi].tobytes())
+        content.update(self._starts[lo:hi].tobytes())
+        content.update(self._ends[lo:hi].tobytes())
+        content.update(array("q", [offset - base for offset in self._offsets[lo:hi + 1]]).tobytes())
+        content.update(self._buffer[base:self._offsets[hi]].encode("utf-8", "surrogatepass"))
+        return content.hexdigest()
+
+    def full_text(self, separator=" "):
+        """All texts joined, with cue line breaks turned into spaces."""
+        return separator.join(text.replace("\n", " ") for text in self.texts() if text)
+
+    # --- Derived tables ---
+    def with_texts(self, texts):
+        """Same ids and timings with new texts (e.g. a translation); the time arrays are shared.
+
+        Word timings and confidence belong to the original wording and are not carried over.
+        """
+        texts = list(texts)
+        if len(texts) != len(self):
+            raise ValueError(f"expected {len(self)} texts, got {len(texts)}")
+        offsets = _offsets_for(texts)
+        # Realign the shared columns with the new offsets when this is a slice
+        if self._lo or self._hi != len(self._ids):
+            return SegmentTable(self._ids[self._lo:self._hi], self._starts[self._lo:self._hi],
+                                self._ends[self._lo:self._hi], "".join(texts), offsets)
+        return SegmentTable(self._ids, self._starts, self._ends, "".join(texts), offsets)
+
+    def with_replaced_texts(self, changes):
+        """Copy with the texts in changes ({index: text}) replaced, e.g. an edited cue.
+
+        Unlike with_texts(), word timings and confidence are kept: they
+        describe the audio, which an edit does not change. Slices fall back
+        to with_texts().
+        """
+        texts = self.texts()
+        for index, text in changes.items():
+            texts[index] = text
+        if self._lo or self._hi != len(self._ids):
+            return self.with_texts(texts)
+        return SegmentTable(self._ids, self._starts, self._ends, "".join(texts), _offsets_for(texts),
+                            words=self._words, word_offsets=self._word_offsets, confidence=self._confidence)
+
+    def to_list(self):
+        """Plain list of dicts, for JSON and older code."""
+        segments = [{"id": i, "start": s, "end": e, "text": t} for i, s, e, t in self.rows()]
+        if self._words is not None:
+            for index, segment in enumerate(segments):
+                segment["words"] = self.words_for(index).to_list()
+        if self._confidence is not None:
+            for key in CONFIDENCE_KEYS:
+                for segment, value in zip(segments, self.confidence(key)):
+                    segment[key] = value
+        return segments
+
+    def to_columns(self):
+        """Compact JSON-friendly form; see from_column_dict."""
+        lo, hi = self._lo, self._hi
+        base = self._offsets[lo]
+        columns = {
+            "ids": self._ids[lo:hi].tolist(),
+            "starts": self._starts[lo:hi].tolist(),
+            "ends": self._ends[lo:hi].tolist(),
+            "text": self._buffer[base:self._offsets[hi]],
+            "offsets": [offset - base for offset in self._offsets[lo:hi + 1]],
+        }
+        if self._words is not None:
+            word_base = self._word_offsets[lo]
+            columns["words"] = self.all_words().to_columns()
+            columns["word_offsets"] = [offset - word_base for offset in self._word_offsets[lo:hi + 1]]
+        if self._confidence is not None:
+            columns["confidence"] = {key: self.confidence(key).tolist() for key in CONFIDENCE_KEYS}
+        return columns
+
+    @classmethod
+    def from_column_dict(cls, columns):
+        table = cls(array("q", columns["ids"]), array("d", columns["starts"]), array("d", columns["ends"]),
+                    columns["text"], array("q", columns["offsets"]))
+        if columns.get("words") is not None:
+            table._words = WordTable.from_column_dict(columns["words"])
+            table._word_offsets = array("I", columns["word_offsets"])
+        if columns.get("confidence") is not None:
+            table._confidence = tuple(array("f", columns["confidence"][key]) for key in CONFIDENCE_KEYS)
+        return table
+
+    # --- Lookup ---
+    def index_at(self, time_sec):
+        """Index of the segment shown at time_sec (segments are in time order), or -1."""
+        i = bisect_right(self._starts, time_sec, self._lo, self._hi) - 1
+        if i >= self._lo and time_sec <= self._ends[i]:
+            return i - self._lo
+        return -1
+
+    def text_at_time(self, time_sec):
+        index = self.index_at(time_sec)
+        return self.text_at(index) if index >= 0 else ""
+
+    def nbytes(self):
+        """Approximate memory used by the underlying buffers (shared buffers counted once)."""
+        arrays = (self._ids, self._starts, self._ends, self._offsets)
+        total = sum(a.itemsize * len(a) for a in arrays) + len(self._buffer.encode("utf-8", "surrogatepass"))
+        if self._words is not None:
+            total += self._words.nbytes() + self._word_offsets.itemsize * len(self._word_offsets)
+        if self._confidence is not None:
+            total += sum(a.itemsize * len(a) for a in self._confidence)
+        return total
+
+
+def as_segment_table(segments):
+    """Accept a SegmentTable or any iterable of segment dicts."""
+    return segments if isinstance(segments, SegmentTable) else SegmentTable.from_segments(segments or [])
@@ -0,0 +1,83 @@
+"""Opt-in startup profiler.
+
+Set CAPTIONLAB_PROFILE_STARTUP to a file path to record how long each
+startup phase takes; the JSON report is written once the main window is
+shown. When the variable is unset, phase() returns a shared no-op context
+manager, so the instrumentation can stay in place.
+"""
+import contextlib
+import json
+import os
+import sys
+import time
+
+PROFILE_ENV = "CAPTIONLAB_PROFILE_STARTUP"
+
+_report_path = os.getenv(PROFILE_ENV)
+_origin = time.perf_counter()
+_phases = {}  # name -> {"start": first start offset, "seconds": total, "calls": n}
+_marks = {}
+_noop = contextlib.nullcontext()
+
+
+def enabled():
+    return bool(_report_path)
+
+
+def phase(name):
+    """Time a block; repeated phases with the same name are accumulated."""
+    if not _report_path:
+        return _noop
+    return _timed_phase(name)
+
+
+@contextlib.contextmanager
+def _timed_phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        entry = _phases.setdefault(name, {"start": started - _origin, "seconds": 0.0, "calls": 0})
+        entry["seconds"] += ended - started
+        entry["calls"] += 1
+
+
+def mark(name):
+    """Record a point in time (seconds since the profiler was imported)."""
+    if _report_path:
+        _marks[name] = time.perf_counter() - _origin
+
+
+def parse_importtime(stderr_text):
+    """Parse `python -X importtime` output into {module: {"self": s, "cumulative": s}}."""
+    modules = {}
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules[name.strip()] = {"self": int(self_us) / 1e6, "cumulative": int(cumulative_us) / 1e6}
+        except ValueError:
+            continue
+    return modules
+
+
+def build_report():
+    return {
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "importtime_enabled": "importtime" in getattr(sys, "_xoptions", {}),
+        "phases": {name: dict(entry) for name, entry in sorted(_phases.items(), key=lambda item: item[1]["start"])},
+        "marks": dict(_marks),
+    }
+
+
+def write_report(path=None):
+    path = path or _report_path
+    if not path:
+        return None
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(build_report(), f, indent=2)
+    return path
@@ -0,0 +1,182 @@
+"""Lightweight span tracing for the pipeline stages.
+
+    with tracing.span("whisper.transcribe", model=name) as sp:
+        ...
+        sp.set(segments=len(segments))
+
+Tracing is off unless CAPTIONLAB_TRACE is set or set_enabled(True) is
+called (the Diagnostics dialog does this). While off, span() returns a
+shared no-op object and count() returns immediately, so the calls can stay
+in production code. Finished spans are kept in a bounded ring buffer and
+can be summarized or exported as Chrome trace JSON (chrome://tracing,
+Perfetto).
+
+Inference jobs run in other processes (utils.job_executor): take() drains
+a process's spans and counters there and merge() adds them to the buffer of
+the process that submitted the job, so they show up in the same summary
+and trace, under the pid of the process that recorded them.
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+MAX_SPANS = 20000
+
+_enabled = bool(os.getenv("CAPTIONLAB_TRACE"))
+_spans = collections.deque(maxlen=MAX_SPANS)
+_counters = collections.Counter()
+_lock = threading.Lock()
+_origin_ns = time.perf_counter_ns()
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "start_ns", "end_ns", "thread_id", "thread_name", "pid")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.pid = None  # Set by take() when the span leaves its process
+
+    def __enter__(self):
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        with _lock:
+            _spans.append(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @property
+    def seconds(self):
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+def span(name, **attrs):
+    """Context manager timing one stage; attrs (counts, bytes...) are attached to it."""
+    if not _enabled:
+        return _NOOP
+    return _Span(name, attrs)
+
+
+def count(name, n=1):
+    """Increment a counter, e.g. count("whisper.model_cache.hit")."""
+    if _enabled:
+        with _lock:
+            _counters[name] += n
+
+
+def clear():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def take():
+    """Remove and return the finished spans and counters of this process (picklable), for merge()."""
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+        _spans.clear()
+        _counters.clear()
+    pid = os.getpid()
+    for sp in spans:
+        if sp.pid is None:
+            sp.pid = pid
+    return spans, counters
+
+
+def merge(records):
+    """Add spans and counters returned by take() in another process."""
+    spans, counters = records
+    with _lock:
+        _spans.extend(spans)
+        _counters.update(counters)
+
+
+def summary():
+    """Aggregate finished spans per name, plus counters and cache hit rates."""
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+    stages = {}
+    for sp in spans:
+        entry = stages.setdefault(sp.name, {"count": 0, "total": 0.0, "max": 0.0, "attrs": collections.Counter()})
+        entry["count"] += 1
+        entry["total"] += sp.seconds
+        entry["max"] = max(entry["max"], sp.seconds)
+        for key, value in sp.attrs.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                entry["attrs"][key] += value
+    for entry in stages.values():
+        entry["mean"] = entry["total"] / entry["count"]
+        entry["attrs"] = dict(entry["attrs"])
+
+    hit_rates = {}
+    for name, hits in counters.items():
+        if name.endswith(".hit"):
+            prefix = name[:-len(".hit")]
+            total = hits + counters.get(prefix + ".miss", 0)
+            hit_rates[prefix] = hits / total if total else 0.0
+    return {"stages": stages, "counters": counters, "hit_rates": hit_rates}
+
+
+def export_chrome_trace(path):
+    """Write the recorded spans in the Chrome trace event format; return the event count."""
+    pid = os.getpid()
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+    events = []
+    thread_names = {}
+    for sp in spans:
+        thread_names[(sp.pid or pid, sp.thread_id)] = sp.thread_name
+        events.append({
+            "name": sp.name,
+            "cat": sp.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": (sp.start_ns - _origin_ns) / 1000.0,
+            "dur": (sp.end_ns - sp.start_ns) / 1000.0,
+            "pid": sp.pid or pid,
+            "tid": sp.thread_id,
+            "args": {key: value if isinstance(value, (int, float, str, bool)) else str(value)
+                     for key, value in sp.attrs.items()},
+        })
+    for (span_pid, tid), name in thread_names.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": span_pid, "tid": tid, "args": {"name": name}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": counters}}, f)
+    return len(spans)
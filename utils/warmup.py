@@ -0,0 +1,45 @@
+import importlib
+import importlib.util
+import threading
+
+# Libraries that take seconds to import (whisper pulls in torch). They are
+# never imported at startup; see start_background_warmup.
+HEAVY_MODULES = ("whisper", "deep_translator", "google.generativeai")
+
+
+def missing_dependencies(module_names):
+    """Return the modules that are not installed, without importing them."""
+    missing = []
+    for name in module_names:
+        try:
+            found = importlib.util.find_spec(name) is not None
+        except (ImportError, ValueError):  # Parent package missing
+            found = False
+        if not found:
+            missing.append(name)
+    return missing
+
+
+def _warm_up(module_names, extra_tasks):
+    for name in module_names:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Background import of '{name}' failed: {e}")
+    for task in extra_tasks:
+        try:
+            task()
+        except Exception as e:
+            print(f"Background warm-up task failed: {e}")
+
+
+def start_background_warmup(module_names=HEAVY_MODULES, extra_tasks=()):
+    """Import heavy libraries in a daemon thread so the first job does not pay for them.
+
+    A worker that needs one of these modules before the warm-up got to it
+    simply waits on Python's import lock for the same module.
+    """
+    thread = threading.Thread(target=_warm_up, args=(tuple(module_names), tuple(extra_tasks)),
+                              name="Warmup", daemon=True)
+    thread.start()
+    return thread
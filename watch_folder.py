@@ -0,0 +1,228 @@
+"""CaptionLab watch-folder service.
+
+Media dropped into the watched folder is fingerprinted and added to a
+SQLite job queue; a pool of worker threads runs the Whisper -> translate ->
+export chain on each job and writes the SRT files to the output folder.
+The queue survives restarts: interrupted jobs are picked up again and files
+that were already processed are skipped.
+
+Example:
+    python watch_folder.py //share/inbox --output //share/subtitles --target fr --target es --workers 2
+    python watch_folder.py inbox --output subs --target fr:marian --target ja:google   # translator per language
+"""
+import argparse
+import os
+import signal
+import sys
+import threading
+import time
+
+from utils.cancellation import CancellationToken, JobCancelled
+from utils.fingerprint import media_fingerprint
+from utils.folder_watcher import FolderWatcher
+from utils.job_queue import JobQueue, DEFAULT_MAX_ATTEMPTS
+from utils.resegment import CueLimits
+from workers.backends import BACKENDS, DEFAULT_BACKEND
+from workers.pipeline import DEFAULT_WHISPER_MODEL, run_pipeline
+from workers.translators import parse_target
+
+DEFAULT_QUEUE_DB = "captionlab_jobs.db"
+IDLE_SLEEP_SECONDS = 1.0
+
+
+class WatchFolderService:
+    def __init__(self, folder, output_dir, queue, model_name=DEFAULT_WHISPER_MODEL, source_language=None,
+                 target_languages=(), workers=1, stable_seconds=5.0, poll_interval=2.0,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, use_inotify=True, word_timestamps=False, cue_limits=None,
+                 backend=DEFAULT_BACKEND, threads=None, refine_model=None, language_id=True, allow_downgrade=True,
+                 translators=None):
+        self.output_dir = output_dir
+        self.queue = queue
+        self.params = {
+            "model": model_name,
+            "backend": backend,
+            "threads": threads,
+            "refine_model": refine_model,
+            "source_language": source_language,
+            "language_id": language_id,
+            "allow_downgrade": allow_downgrade,
+            "target_languages": list(target_languages),
+            "translators": dict(translators or {}),
+            "word_timestamps": word_timestamps,
+            "cue_limits": cue_limits.to_dict() if cue_limits else None,
+        }
+        self.worker_count = max(1, workers)
+        self.max_attempts = max_attempts
+        self.watcher = FolderWatcher(folder, self.on_file_ready, stable_seconds=stable_seconds,
+                                     poll_interval=poll_interval, use_inotify=use_inotify)
+        self._stop_event = threading.Event()
+        self._cancel_token = CancellationToken()  # Shared by running jobs, cancelled on a forced stop
+        self._threads = []
+
+    def on_file_ready(self, path):
+        try:
+            fingerprint = media_fingerprint(path)
+        except OSError as e:
+            print(f"Could not read {path}: {e}")
+            return
+        job_id = self.queue.enqueue(path, fingerprint, self.params)
+        if job_id is None:
+            print(f"Skipping {os.path.basename(path)}: already queued or processed.")
+        else:
+            print(f"Queued job {job_id}: {os.path.basename(path)}")
+
+    def start(self):
+        requeued = self.queue.recover()
+        if requeued:
+            print(f"Resuming {requeued} interrupted job(s).")
+        self.watcher.start()
+        for i in range(self.worker_count):
+            thread = threading.Thread(target=self._worker_loop, name=f"PipelineWorker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, cancel_running=False):
+        """Stop watching and wait for running jobs to finish (or cancel them, they are requeued)."""
+        self._stop_event.set()
+        self.watcher.stop()
+        if cancel_running:
+            self.cancel_running()
+        for thread in self._threads:
+            thread.join()
+
+    def cancel_running(self):
+        self._cancel_token.cancel("Service stopping")
+
+    def _worker_loop(self):
+        name = threading.current_thread().name
+        while not self._stop_event.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._stop_event.wait(IDLE_SLEEP_SECONDS)
+                continue
+            self._run_job(job, name)
+
+    def _run_job(self, job, worker_name):
+        params = job["params"]
+        label = f"[{worker_name}] job {job['id']} ({os.path.basename(job['path'])})"
+        if not os.path.exists(job["path"]):
+            self.queue.fail(job["id"], "File no longer exists", max_attempts=0)
+            print(f"{label}: file no longer exists, dropped.")
+            return
+        started = time.monotonic()
+        try:
+            result = run_pipeline(
+                job["path"], self.output_dir,
+                model_name=params.get("model", DEFAULT_WHISPER_MODEL),
+                backend=params.get("backend", DEFAULT_BACKEND),
+                threads=params.get("threads"),
+                refine_model=params.get("refine_model"),
+                source_language=params.get("source_language"),
+                language_id=params.get("language_id", True),
+                allow_downgrade=params.get("allow_downgrade", True),
+                target_languages=params.get("target_languages", ()),
+                translators=params.get("translators"),
+                word_timestamps=params.get("word_timestamps", False),
+                cue_limits=CueLimits.from_dict(params["cue_limits"]) if params.get("cue_limits") else None,
+                on_progress=lambda text: print(f"{label}: {text}..."),
+                cancel_token=self._cancel_token
+            )
+        except JobCancelled:
+            self.queue.release(job["id"])
+            print(f"{label}: cancelled, will run again on the next start.")
+            return
+        except Exception as e:
+            status = self.queue.fail(job["id"], e, max_attempts=self.max_attempts)
+            print(f"{label}: failed ({e}); {'will retry' if status == 'pending' else 'giving up'}.")
+            return
+        result["seconds"] = round(time.monotonic() - started, 2)
+        self.queue.complete(job["id"], result)
+        print(f"{label}: done in {result['seconds']}s -> {', '.join(os.path.basename(p) for p in result['outputs'])}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a folder and subtitle new media automatically.")
+    parser.add_argument("folder", help="Folder to watch for new media files")
+    parser.add_argument("--output", required=True, help="Folder where SRT files are written")
+    parser.add_argument("--db", default=DEFAULT_QUEUE_DB, help=f"Job queue database (default: {DEFAULT_QUEUE_DB})")
+    parser.add_argument("--model", default=DEFAULT_WHISPER_MODEL, help="Whisper model name")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=sorted(BACKENDS),
+                        help=f"Transcription backend (default: {DEFAULT_BACKEND})")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads per transcription (default: all cores)")
+    parser.add_argument("--refine-model", default=None,
+                        help="Larger model for a second pass over low-confidence passages (two-pass cascade)")
+    parser.add_argument("--no-downgrade", action="store_true",
+                        help="Fail a job whose model does not fit in memory instead of using a smaller model")
+    parser.add_argument("--source-language", default=None, help="Whisper source language code (default: auto)")
+    parser.add_argument("--no-language-id", action="store_true",
+                        help="With an automatic source language, skip the language pre-pass that routes English to .en models")
+    parser.add_argument("--target", action="append", default=[],
+                        help="Target language code, optionally with its translator (fr:marian, fr:google); repeat for several")
+    parser.add_argument("--word-timestamps", action="store_true", help="Keep per-word timings from Whisper")
+    defaults = CueLimits()
+    parser.add_argument("--no-resegment", action="store_true", help="Keep Whisper's segments as they are")
+    parser.add_argument("--max-chars-per-line", type=int, default=defaults.max_chars_per_line, help="Cue line length")
+    parser.add_argument("--max-lines", type=int, default=defaults.max_lines, help="Lines per cue")
+    parser.add_argument("--max-cps", type=float, default=defaults.max_cps, help="Reading speed limit, characters per second")
+    parser.add_argument("--min-duration", type=float, default=defaults.min_duration, help="Minimum cue duration in seconds")
+    parser.add_argument("--max-duration", type=float, default=defaults.max_duration, help="Maximum cue duration in seconds")
+    parser.add_argument("--workers", type=int, default=1, help="Number of concurrent pipeline workers")
+    parser.add_argument("--stable-seconds", type=float, default=5.0, help="Seconds a file must stay unchanged")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Polling interval in seconds")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Attempts before a job is marked failed")
+    parser.add_argument("--no-inotify", action="store_true", help="Always poll the folder")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue failed jobs on startup")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        targets = [parse_target(text) for text in args.target]
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    if not os.path.isdir(args.folder):
+        print(f"Watch folder not found: {args.folder}")
+        sys.exit(1)
+
+    queue = JobQueue(args.db)
+    if args.retry_failed:
+        print(f"Requeued {queue.retry_failed()} failed job(s).")
+    service = WatchFolderService(
+        args.folder, args.output, queue,
+        model_name=args.model, source_language=args.source_language, target_languages=[target for target, _ in targets],
+        workers=args.workers, stable_seconds=args.stable_seconds, poll_interval=args.poll_interval,
+        max_attempts=args.max_attempts, use_inotify=not args.no_inotify, word_timestamps=args.word_timestamps,
+        cue_limits=None if args.no_resegment else CueLimits(args.max_chars_per_line, args.max_lines, args.max_cps,
+                                                             args.min_duration, args.max_duration),
+        backend=args.backend, threads=args.threads, refine_model=args.refine_model,
+        language_id=not args.no_language_id, allow_downgrade=not args.no_downgrade,
+        translators={target: choice for target, choice in targets if choice}
+    )
+
+    stop_requested = threading.Event()
+
+    def on_signal(*_):
+        if stop_requested.is_set():
+            # Second Ctrl+C: do not wait for the running jobs
+            print("Cancelling running jobs...")
+            service.cancel_running()
+        stop_requested.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    service.start()
+    print(f"Watching {os.path.abspath(args.folder)} with {service.worker_count} worker(s). Press Ctrl+C to stop.")
+    while not stop_requested.wait(1.0):
+        pass
+    print("Stopping, waiting for running jobs to finish (Ctrl+C again to cancel them)...")
+    service.stop()
+    counts = queue.counts()
+    print(f"Queue: {counts['pending']} pending, {counts['done']} done, {counts['failed']} failed.")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""Transcription backends.
+
+A backend loads a model and turns 16 kHz mono float32 audio into a
+Whisper-shaped result:
+
+    {"text", "language", "segments": [{"start", "end", "text", "avg_logprob",
+     "no_speech_prob", "compression_ratio", "words" (optional)}]}
+
+so format_transcription(), re-segmentation and export do not depend on which
+engine ran. Two are provided:
+
+    whisper      openai-whisper on PyTorch (float32 on CPU)
+    ctranslate2  the same Whisper weights converted to CTranslate2 and run
+                 with int8 quantization (faster-whisper); several times
+                 faster on CPU-only machines with the same segment output
+
+Backends are picked by name; a backend whose package is not installed is
+reported as unavailable instead of failing at import time.
+"""
+import sys
+import threading
+import types
+from contextlib import contextmanager
+
+from utils.cancellation import check
+from utils.model_store import CTRANSLATE2_KIND, WHISPER_KIND, default_model_store, offline
+from utils.warmup import missing_dependencies
+
+WHISPER_BACKEND = "whisper"
+CTRANSLATE2_BACKEND = "ctranslate2"
+DEFAULT_BACKEND = WHISPER_BACKEND
+WHISPER_FRAMES_PER_SECOND = 100  # Mel frames per audio second (HOP_LENGTH 160)
+WHISPER_TIME_PRECISION = 0.02  # Seconds per timestamp token
+WHISPER_SAMPLE_RATE = 16000
+# Same rules as whisper.transcribe: a greedy window beyond these is decoded again
+# on its own, unless it is likely silence, which is dropped
+FALLBACK_COMPRESSION_RATIO = 2.4
+FALLBACK_LOGPROB = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class TranscriptionBackend:
+    name = None
+    label = None
+    requires = ()  # Modules the backend imports
+    store_kind = None  # utils.model_store kind of the backend's models
+    threads_at_load = False  # True when the thread count is fixed when the model is loaded
+    quantized = False  # int8 weights: about a third of the float32 memory footprint (utils.memory)
+
+    def available(self):
+        return not missing_dependencies(self.requires)
+
+    def known_models(self):
+        """Model names the installed package can download, or None when it cannot tell."""
+        return None
+
+    def can_load(self, model_name):
+        """Whether load_model(model_name) can find the model: in the store, or downloadable when not offline."""
+        if default_model_store().model_path(self.store_kind, model_name) is not None:
+            return True
+        if offline():
+            return False
+        known = self.known_models()
+        return known is None or model_name in known
+
+    def load_model(self, model_name, threads=None):
+        raise NotImplementedError
+
+    def transcribe(self, model, audio, language=None, word_timestamps=False, threads=None, on_window=None,
+                   cancel_token=None, initial_prompt=None):
+        """Transcribe audio; on_window(processed_seconds) is called after each decoded window.
+
+        initial_prompt is text assumed to precede the audio (context for a
+        passage cut out of a longer recording).
+        """
+        raise NotImplementedError
+
+    def detect_language(self, model, audio):
+        """Language probabilities {code: probability} for (the first 30 s of) audio."""
+        raise NotImplementedError
+
+    def transcribe_batch(self, model, audios, languages=None, threads=None, on_item=None, cancel_token=None):
+        """Transcribe several clips of at most one 30 s window each; one result per clip, in order.
+
+        languages gives each clip's language (None: detect). on_item(index)
+        is called as clips finish. This runs the clips one after the other;
+        backends that can decode several windows in one pass override it.
+        """
+        results = []
+        for index, audio in enumerate(audios):
+            check(cancel_token)
+            results.append(self.transcribe(model, audio, language=languages[index] if languages else None,
+                                           threads=threads, cancel_token=cancel_token))
+            if on_item: on_item(index)
+        return results
+
+
+_progress_local = threading.local()
+
+
+class _WhisperProgressBar:
+    """Stands in for tqdm.tqdm inside whisper.transcribe.
+
+    Whisper advances its progress bar by the number of mel frames decoded
+    after each 30 s window; this forwards that to the callback registered
+    by the current thread (the bar is disabled in our calls anyway).
+    """
+
+    def __init__(self, total=None, **kwargs):
+        self.total = total
+        self.n = 0
+        self.callback = getattr(_progress_local, "callback", None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def update(self, n=1):
+        self.n += n
+        if self.callback:
+            self.callback(self.n / WHISPER_FRAMES_PER_SECOND)
+
+
+def _install_progress_hook():
+    transcribe_module = sys.modules["whisper.transcribe"]  # whisper.transcribe is also the function
+    if not isinstance(transcribe_module.tqdm, types.SimpleNamespace):
+        transcribe_module.tqdm = types.SimpleNamespace(tqdm=_WhisperProgressBar)
+
+
+class WhisperBackend(TranscriptionBackend):
+    name = WHISPER_BACKEND
+    label = "Whisper (PyTorch)"
+    requires = ("whisper",)
+    store_kind = WHISPER_KIND
+
+    def known_models(self):
+        import whisper
+        return whisper.available_models()  # turbo only from openai-whisper 20240930
+
+    def load_model(self, model_name, threads=None):
+        import whisper  # Heavy (pulls in torch), only imported when a model is needed
+        path = default_model_store().require(WHISPER_KIND, model_name)
+        if path is None:
+            return whisper.load_model(model_name)  # Downloaded to ~/.cache/whisper on first use
+        return _load_mapped_checkpoint(path, model_name)
+
+    def transcribe(self, model, audio, language=None, word_timestamps=False, threads=None, on_window=None,
+                   cancel_token=None, initial_prompt=None):
+        transcribe_args = {"audio": audio, "fp16": False} # fp16=False for broader CPU compatibility
+        if language:
+            transcribe_args["language"] = language
+        if word_timestamps:
+            transcribe_args["word_timestamps"] = True
+        if initial_prompt:
+            transcribe_args["initial_prompt"] = initial_prompt
+
+        _install_progress_hook()
+        _progress_local.callback = on_window
+        # Checked before every decoder forward pass (one per generated token), so a
+        # cancelled job stops within a fraction of a second instead of after its 30 s window
+        cancel_hook = None
+        if cancel_token is not None and hasattr(model, "decoder"):
+            cancel_hook = model.decoder.register_forward_pre_hook(lambda module, inputs: cancel_token.raise_if_cancelled())
+        try:
+            with _torch_threads(threads):
+                return model.transcribe(**transcribe_args) # This is blocking
+        finally:
+            _progress_local.callback = None
+            if cancel_hook is not None: cancel_hook.remove()
+
+    def detect_language(self, model, audio):
+        import whisper
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+        _, probabilities = model.detect_language(mel)
+        return probabilities
+
+    def transcribe_batch(self, model, audios, languages=None, threads=None, on_item=None, cancel_token=None):
+        """Decode the clips' windows together: one encoder pass and one batched decoding loop per language."""
+        import torch
+        import whisper
+        from whisper.tokenizer import get_tokenizer
+        languages = list(languages) if languages else [None] * len(audios)
+        groups = {}
+        for index, language in enumerate(languages):
+            groups.setdefault(language, []).append(index)
+
+        results = [None] * len(audios)
+        cancel_hook = None
+        if cancel_token is not None:
+            cancel_hook = model.decoder.register_forward_pre_hook(lambda module, inputs: cancel_token.raise_if_cancelled())
+        try:
+            with _torch_threads(threads):
+                for language, indices in groups.items():
+                    check(cancel_token)
+                    mels = torch.stack([whisper.log_mel_spectrogram(whisper.pad_or_trim(audios[i]), model.dims.n_mels)
+                                        for i in indices]).to(model.device)
+                    options = whisper.DecodingOptions(language=language, fp16=False)  # Greedy, with timestamps
+                    for index, decoded in zip(indices, whisper.decode(model, mels, options)):
+                        tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                                  language=decoded.language, task="transcribe")
+                        results[index] = _window_result(decoded, tokenizer,
+                                                        len(audios[index]) / WHISPER_SAMPLE_RATE)
+        finally:
+            if cancel_hook is not None: cancel_hook.remove()
+
+        for index, result in enumerate(results):
+            window = result["segments"][0] if result["segments"] else None
+            if window and (window["compression_ratio"] > FALLBACK_COMPRESSION_RATIO
+                           or window["avg_logprob"] < FALLBACK_LOGPROB):
+                # Greedy decoding went wrong: let transcribe() retry with its temperature fallback
+                results[index] = self.transcribe(model, audios[index], language=result["language"],
+                                                 threads=threads, cancel_token=cancel_token)
+            if on_item: on_item(index)
+        return results
+
+
+@contextmanager
+def _torch_threads(threads):
+    """Run the block with torch limited to threads (process-wide), then restore the previous count."""
+    if not threads:
+        yield
+        return
+    import torch
+    previous = torch.get_num_threads()
+    torch.set_num_threads(threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+def _load_mapped_checkpoint(path, model_name):
+    """Load a Whisper checkpoint with its weights memory-mapped from the file.
+
+    whisper.load_model() reads the whole checkpoint into memory and then
+    copies it into freshly allocated parameters. Here the model is built on
+    the meta device (no allocation) and the mapped tensors become its
+    parameters. Weights are upcast to float32 as whisper.load_model() does,
+    since transcribe() decodes in float32 on the CPU: a float32 checkpoint
+    stays mapped (paged in as used, page cache shared between processes),
+    a float16 one (OpenAI's) is copied, which still skips whisper's
+    read-then-copy. Needs torch >= 2.1; older versions fall back to a
+    normal load.
+    """
+    import itertools
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+    try:
+        checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+        dims = ModelDimensions(**checkpoint["dims"])
+        with torch.device("meta"):
+            model = Whisper(dims)
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        model.float()  # No-op for float32 tensors; mixed float16/float32 inputs fail in LayerNorm and the decoder
+    except (TypeError, AttributeError, RuntimeError):
+        model = whisper.load_model(path)  # Old torch, or a legacy checkpoint that cannot be mapped
+    else:
+        # Buffers that are not saved in the checkpoint, rebuilt as Whisper.__init__ does
+        n_ctx = dims.n_text_ctx
+        model.decoder.register_buffer("mask", torch.empty(n_ctx, n_ctx).fill_(-float("inf")).triu_(1),
+                                      persistent=False)
+        all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+        all_heads[dims.n_text_layer // 2:] = True
+        model.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+        if any(tensor.is_meta for tensor in itertools.chain(model.parameters(), model.buffers())):
+            model = whisper.load_model(path)  # A whisper version with other unsaved buffers
+    alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(model_name)
+    if alignment_heads:
+        model.set_alignment_heads(alignment_heads)  # Word timestamps; whisper.load_model only sets them for names
+    return model
+
+
+def _window_result(decoded, tokenizer, duration):
+    """Whisper-shaped result of one decoded 30 s window (a whisper DecodingResult).
+
+    The sampled tokens alternate timestamp pairs and text, as in
+    whisper.transcribe; every segment of the window gets the window's scores.
+    """
+    scores = {"avg_logprob": decoded.avg_logprob, "no_speech_prob": decoded.no_speech_prob,
+              "compression_ratio": decoded.compression_ratio}
+    if decoded.no_speech_prob > NO_SPEECH_THRESHOLD and decoded.avg_logprob < FALLBACK_LOGPROB:
+        return {"text": "", "segments": [], "language": decoded.language}
+    segments = []
+    start = None
+    text_tokens = []
+    for token in decoded.tokens:
+        if token >= tokenizer.timestamp_begin:
+            time = (token - tokenizer.timestamp_begin) * WHISPER_TIME_PRECISION
+            if start is not None and text_tokens:
+                segments.append(dict(scores, start=start, end=min(time, duration), text=tokenizer.decode(text_tokens)))
+                start, text_tokens = None, []
+            else:
+                start = time
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+    if text_tokens:  # Last segment without its closing timestamp
+        segments.append(dict(scores, start=start or 0.0, end=duration, text=tokenizer.decode(text_tokens)))
+    segments = [segment for segment in segments if segment["text"].strip()]
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments,
+            "language": decoded.language}
+
+
+class CTranslate2Backend(TranscriptionBackend):
+    name = CTRANSLATE2_BACKEND
+    label = "CTranslate2 int8 (faster-whisper)"
+    requires = ("faster_whisper",)
+    store_kind = CTRANSLATE2_KIND
+    threads_at_load = True
+    quantized = True
+    compute_type = "int8"
+
+    def known_models(self):
+        try:
+            from faster_whisper.utils import available_models
+        except ImportError:
+            return None  # faster-whisper < 0.10
+        return available_models()
+
+    def load_model(self, model_name, threads=None):
+        from faster_whisper import WhisperModel
+        # A model directory from the store, else converted weights downloaded once and cached like Whisper's
+        path = default_model_store().require(CTRANSLATE2_KIND, model_name)
+        return WhisperModel(path or model_name, device="cpu", compute_type=self.compute_type,
+                            cpu_threads=threads or 0, local_files_only=offline())
+
+    def transcribe(self, model, audio, language=None, word_timestamps=False, threads=None, on_window=None,
+                   cancel_token=None, initial_prompt=None):
+        # Greedy decoding, like whisper's transcribe() defaults, so both backends are compared on equal terms
+        segments, info = model.transcribe(audio, language=language, word_timestamps=word_timestamps, beam_size=1,
+                                          initial_prompt=initial_prompt)
+        result_segments = []
+        for segment in segments:  # Decoded lazily, window by window
+            check(cancel_token)
+            item = {
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+                "no_speech_prob": segment.no_speech_prob,
+                "compression_ratio": segment.compression_ratio,
+            }
+            if segment.words is not None:
+                item["words"] = [{"word": word.word, "start": word.start, "end": word.end, "probability": word.probability}
+                                 for word in segment.words]
+            result_segments.append(item)
+            if on_window: on_window(segment.end)
+        return {"text": "".join(item["text"] for item in result_segments), "segments": result_segments,
+                "language": info.language}
+
+    def detect_language(self, model, audio):
+        if hasattr(model, "detect_language"):  # faster-whisper >= 1.1
+            _, _, probabilities = model.detect_language(audio)
+        else:
+            # Detection runs eagerly in transcribe(); the segments generator is never consumed
+            _, info = model.transcribe(audio, beam_size=1, without_timestamps=True)
+            probabilities = info.all_language_probs
+        return dict(probabilities or ())
+
+
+BACKENDS = {backend.name: backend for backend in (WhisperBackend(), CTranslate2Backend())}
+
+
+def get_backend(name=None):
+    try:
+        return BACKENDS[name or DEFAULT_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown transcription backend '{name}' (choose from {', '.join(BACKENDS)})") from None
+
+
+def available_backends():
+    return [backend for backend in BACKENDS.values() if backend.available()]
+
+
+def rtf_key(model_name, backend=None):
+    """Key under which real-time factors are learned: the model name for Whisper, "model|backend" otherwise."""
+    if not backend or backend == DEFAULT_BACKEND:
+        return model_name
+    return f"{model_name}|{backend}"
@@ -0,0 +1,99 @@
+"""Two-pass transcription: a fast draft, then a larger model on the weak spots.
+
+The whole file is transcribed with a small model. Segments whose scores
+look unreliable (low average log-probability, repetitive output, or likely
+silence transcribed as words) are grouped into spans, each span is cut out
+of the audio (with a little padding that never reaches into a neighbouring
+segment) and transcribed again with the larger model, and the result
+replaces the draft segments of that span. On typical recordings only a
+small fraction of the audio is re-decoded, so the cost stays close to the
+small model's while the hard passages get the large model's accuracy.
+
+Works on raw backend results (lists of segment dicts), before formatting.
+"""
+from utils.cancellation import check
+
+SAMPLE_RATE = 16000
+# Whisper's own fallback thresholds are -1.0 and 2.4; the draft is held to a
+# stricter log-probability since the large model is there to fix it
+LOGPROB_THRESHOLD = -0.7
+COMPRESSION_RATIO_THRESHOLD = 2.4
+NO_SPEECH_THRESHOLD = 0.6
+SPAN_PADDING_SECONDS = 0.5
+MERGE_GAP_SECONDS = 2.0  # Weak segments this close are re-decoded as one span
+PROMPT_SEGMENTS = 3  # Draft segments before a span passed as context
+
+
+def is_low_confidence(segment, logprob_threshold=LOGPROB_THRESHOLD,
+                      compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
+                      no_speech_threshold=NO_SPEECH_THRESHOLD):
+    if "avg_logprob" not in segment:
+        return False  # Nothing to judge by
+    return (segment["avg_logprob"] < logprob_threshold
+            or segment.get("compression_ratio", 0) > compression_ratio_threshold
+            or segment.get("no_speech_prob", 0) > no_speech_threshold)
+
+
+def low_confidence_spans(segments, merge_gap=MERGE_GAP_SECONDS, **thresholds):
+    """(first, end) index ranges of segments to re-decode, in order."""
+    spans = []
+    for index, segment in enumerate(segments):
+        if not is_low_confidence(segment, **thresholds):
+            continue
+        if spans and segment["start"] - segments[spans[-1][1] - 1]["end"] <= merge_gap:
+            spans[-1][1] = index + 1
+        else:
+            spans.append([index, index + 1])
+    return [tuple(span) for span in spans]
+
+
+def shift_segment(segment, offset, limit):
+    """Copy of a segment (and its words) moved by offset seconds, times capped at limit."""
+    shifted = dict(segment)
+    shifted["start"] = min(limit, offset + segment["start"])
+    shifted["end"] = min(limit, offset + segment["end"])
+    if segment.get("words"):
+        shifted["words"] = [dict(word, start=min(limit, offset + word["start"]), end=min(limit, offset + word["end"]))
+                            for word in segment["words"]]
+    return shifted
+
+
+def refine_result(result, audio, transcribe_span, padding=SPAN_PADDING_SECONDS, merge_gap=MERGE_GAP_SECONDS,
+                  on_span=None, cancel_token=None, **thresholds):
+    """Re-decode the low-confidence spans of a draft result.
+
+    transcribe_span(audio_slice, initial_prompt) must return a result for
+    the slice (times relative to its start). on_span(done, total,
+    span_seconds) is called before each span. Returns (result, stats).
+    """
+    segments = result.get("segments", [])
+    no_speech_threshold = thresholds.get("no_speech_threshold", NO_SPEECH_THRESHOLD)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    spans = low_confidence_spans(segments, merge_gap=merge_gap, **thresholds)
+    refined = []
+    cursor = 0
+    stats = {"spans": len(spans), "draft_segments": len(segments), "replaced_segments": 0, "refined_seconds": 0.0}
+    for number, (first, end) in enumerate(spans):
+        check(cancel_token)
+        refined.extend(segments[cursor:first])
+        lower = segments[first - 1]["end"] if first > 0 else 0.0
+        upper = segments[end]["start"] if end < len(segments) else audio_seconds
+        span_start = max(lower, segments[first]["start"] - padding)
+        span_end = max(span_start, min(upper, segments[end - 1]["end"] + padding))
+        if on_span: on_span(number, len(spans), span_end - span_start)
+        prompt = " ".join(segment["text"].strip() for segment in refined[-PROMPT_SEGMENTS:])
+        span_result = transcribe_span(audio[int(span_start * SAMPLE_RATE):int(span_end * SAMPLE_RATE)], prompt or None)
+        replacement = [shift_segment(segment, span_start, span_end) for segment in span_result.get("segments", [])
+                       if segment.get("text", "").strip()]
+        if replacement:
+            refined.extend(replacement)
+            stats["replaced_segments"] += end - first
+        elif all(segment.get("no_speech_prob", 0) > no_speech_threshold for segment in segments[first:end]):
+            stats["replaced_segments"] += end - first  # Silence the draft filled with words: drop it
+        else:
+            refined.extend(segments[first:end])  # The large model heard nothing, but the draft was speech
+        stats["refined_seconds"] += span_end - span_start
+        cursor = end
+    refined.extend(segments[cursor:])
+    stats["refined_fraction"] = stats["refined_seconds"] / audio_seconds if audio_seconds else 0.0
+    return dict(result, segments=refined, text="".join(segment.get("text", "") for segment in refined)), stats
@@ -0,0 +1,508 @@
+"""Coordinator/worker mode: spread queued media over several machines.
+
+The coordinator owns the job queue (utils.job_queue, the same database as
+watch_folder.py) and the output folder. Workers connect to it, register
+what they can run and pull the jobs that fit them:
+
+    worker -> ("register", worker_id, capabilities)      -> ("registered", heartbeat_seconds)
+    worker -> ("heartbeat", worker_id, [job ids])        -> ("ok", [revoked job ids])
+    worker -> ("pull", worker_id)                        -> ("job", job) or ("idle", drained)
+    worker -> ("chunk", worker_id, job_id, offset)       -> ("data", bytes) or ("revoked",)
+    worker -> ("result", worker_id, job_id, result)      -> ("accepted", first_result)
+    worker -> ("failed", worker_id, job_id, message)     -> ("ok",)
+    worker -> ("leave", worker_id)                       -> ("ok",)
+
+Capabilities are {"name", "cores", "ram_mb", "models", "backends",
+"translators", "slots"}; a job is only handed to a worker that has its
+backend, model and translators and enough memory for it (or may downgrade). The media is streamed to the
+worker in MEDIA_CHUNK_BYTES chunks, checked against the job's fingerprint,
+transcribed and translated there with the pipeline core; the segments come
+back and the coordinator writes the SRT files.
+
+A worker that sends no heartbeat for LEASE_SECONDS is lost: its jobs go
+back to the queue as a failed attempt and run elsewhere. If it comes back,
+those jobs are revoked on its next heartbeat. Results are deduplicated per
+job: the first one is stored, later ones are dropped.
+
+Messages are pickled (multiprocessing.connection) after an HMAC handshake
+with the cluster key. Anyone holding the key can make the coordinator and
+workers unpickle data, so keep it secret and the port on a trusted network.
+"""
+import concurrent.futures
+import os
+import secrets
+import socket
+import threading
+import time
+import uuid
+from multiprocessing.connection import Client, Listener
+
+from utils.cancellation import CancellationToken, JobCancelled, check
+from utils.fingerprint import media_fingerprint
+from utils.job_executor import INFERENCE, JobExecutor
+from utils.job_queue import DEFAULT_MAX_ATTEMPTS, DONE
+from utils.memory import MEMORY_RESERVE_MB, model_footprint_mb, total_memory_mb
+from utils.model_store import default_model_store, offline
+from utils.resegment import CueLimits
+from workers.backends import DEFAULT_BACKEND, available_backends, get_backend
+from workers.pipeline import (
+    DEFAULT_WHISPER_MODEL, remove_checkpoint, srt_output_path, transcribe_job, translate_segments, write_srt
+)
+from workers.translators import AUTO_TRANSLATOR, TRANSLATORS
+
+DEFAULT_PORT = 7650
+KEY_ENV = "CAPTIONLAB_CLUSTER_KEY"
+DEFAULT_KEY_FILE = os.path.join(os.path.expanduser("~"), ".captionlab", "cluster.key")
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".captionlab", "cluster-cache")
+HEARTBEAT_SECONDS = 5.0
+LEASE_SECONDS = 30.0  # A worker silent for this long is lost and its jobs are requeued
+MEDIA_CHUNK_BYTES = 4 << 20
+IDLE_POLL_SECONDS = 2.0
+RECONNECT_SECONDS = 3.0
+
+
+def load_cluster_key(path=DEFAULT_KEY_FILE, create=False):
+    """Cluster key from CAPTIONLAB_CLUSTER_KEY or the key file; with create, a new key file is written if needed."""
+    if os.getenv(KEY_ENV):
+        return os.getenv(KEY_ENV).encode("utf-8")
+    try:
+        with open(path, encoding="ascii") as f:
+            return f.read().strip().encode("ascii")
+    except FileNotFoundError:
+        if not create:
+            raise
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    key = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="ascii") as f:
+        f.write(key + "\n")
+    return key.encode("ascii")
+
+
+def fits_worker(job, capabilities):
+    """Whether a queued job (utils.job_queue) can run on a worker with these capabilities."""
+    params = job["params"]
+    model_name = params.get("model") or DEFAULT_WHISPER_MODEL
+    backend = params.get("backend") or DEFAULT_BACKEND
+    if backend not in capabilities["backends"]:
+        return False
+    if any(choice not in capabilities.get("translators", ()) for choice in params.get("translators", {}).values()
+           if choice != AUTO_TRANSLATOR):
+        return False
+    models = capabilities.get("models")
+    if models is not None and model_name not in models and model_name.split(".")[0] not in models:
+        return False
+    ram_mb = capabilities.get("ram_mb")
+    if ram_mb is not None and not params.get("allow_downgrade", True):
+        return model_footprint_mb(model_name, get_backend(backend).quantized) + MEMORY_RESERVE_MB <= ram_mb
+    return True
+
+
+# --- Coordinator ---
+class Coordinator:
+    def __init__(self, queue, output_dir, address=("127.0.0.1", DEFAULT_PORT), authkey=None,
+                 lease_seconds=LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.queue = queue
+        self.output_dir = output_dir
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.listener = Listener(address, authkey=authkey)
+        self.workers = {}  # worker_id -> {"info", "last_seen", "jobs"}
+        self.stats = {"completed": 0, "duplicates": 0, "requeued": 0}
+        self._leases = {}  # job_id -> worker_id
+        self._revoked = {}  # worker_id -> job ids to cancel on its next heartbeat
+        self._completing = set()  # Job ids whose outputs are being written
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def drained(self):
+        counts = self.queue.counts()
+        return counts["pending"] == 0 and counts["running"] == 0
+
+    def serve_forever(self):
+        requeued = self.queue.recover()
+        if requeued:
+            print(f"Requeued {requeued} job(s) interrupted by the last shutdown.")
+        threading.Thread(target=self._reap_lost_workers, name="ClusterReaper", daemon=True).start()
+        while not self._closed.is_set():
+            try:
+                connection = self.listener.accept()
+            except Exception:
+                if self._closed.is_set():
+                    return
+                continue  # Failed handshake: keep serving
+            threading.Thread(target=self._serve_connection, args=(connection,), name="ClusterWorker",
+                             daemon=True).start()
+
+    def close(self):
+        self._closed.set()
+        try:
+            socket.create_connection(self.address, timeout=1).close()  # Wake up accept()
+        except OSError:
+            pass
+        self.listener.close()
+
+    def _serve_connection(self, connection):
+        try:
+            while True:
+                message = connection.recv()
+                try:
+                    reply = self._handle(message)
+                except Exception as e:
+                    print(f"Request '{message[0]}' failed: {e}")
+                    reply = ("error", str(e))
+                connection.send(reply)
+        except (OSError, EOFError):
+            pass  # The worker reconnects, or is reaped once its lease runs out
+        finally:
+            connection.close()
+
+    def _handle(self, message):
+        action, worker_id = message[0], message[1]
+        if action == "register":
+            with self._lock:
+                known = self.workers.get(worker_id)
+                self.workers[worker_id] = {"info": message[2], "last_seen": time.monotonic(),
+                                           "jobs": known["jobs"] if known else set()}
+            if known is None:
+                info = message[2]
+                print(f"Worker '{info['name']}' registered: {info['cores']} cores, {info['slots']} slot(s), "
+                      f"{(info['ram_mb'] or 0) / 1024:.1f} GB RAM, models: {', '.join(info['models'] or ['any'])}")
+            return ("registered", HEARTBEAT_SECONDS)
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            if worker is None:
+                return ("unknown",)  # Reaped: it has to register again
+            worker["last_seen"] = time.monotonic()
+        if action == "heartbeat":
+            return ("ok", self._revoke_stale(worker_id, message[2]))
+        if action == "pull":
+            return self._pull(worker_id, worker)
+        if action == "chunk":
+            return self._chunk(worker_id, message[2], message[3])
+        if action == "result":
+            return ("accepted", self._complete(worker_id, worker, message[2], message[3]))
+        if action == "failed":
+            self._fail(worker_id, message[2], message[3])
+            return ("ok",)
+        if action == "leave":
+            self._leave(worker_id)
+            return ("ok",)
+        return ("error", f"Unknown request '{action}'")
+
+    def _revoke_stale(self, worker_id, job_ids):
+        with self._lock:
+            revoked = self._revoked.pop(worker_id, set())
+            revoked.update(job_id for job_id in job_ids if self._leases.get(job_id) != worker_id)
+        return sorted(revoked)
+
+    def _pull(self, worker_id, worker):
+        while True:
+            job = self.queue.claim(accept=lambda queued: fits_worker(queued, worker["info"]))
+            if job is None:
+                return ("idle", self.drained())
+            try:
+                size = os.path.getsize(job["path"])
+            except OSError as e:
+                self.queue.fail(job["id"], e, max_attempts=0)
+                print(f"Job {job['id']}: media not readable ({e}), failed.")
+                continue
+            with self._lock:
+                self._leases[job["id"]] = worker_id
+                worker["jobs"].add(job["id"])
+            print(f"Job {job['id']} ({os.path.basename(job['path'])}) -> '{worker['info']['name']}'")
+            return ("job", {"id": job["id"], "name": os.path.basename(job["path"]), "size": size,
+                            "fingerprint": job["fingerprint"], "params": job["params"], "attempts": job["attempts"]})
+
+    def _chunk(self, worker_id, job_id, offset):
+        with self._lock:
+            if self._leases.get(job_id) != worker_id:
+                return ("revoked",)
+        job = self.queue.get(job_id)
+        with open(job["path"], "rb") as f:
+            f.seek(offset)
+            return ("data", f.read(MEDIA_CHUNK_BYTES))
+
+    def _complete(self, worker_id, worker, job_id, result):
+        with self._lock:
+            job = self.queue.get(job_id)
+            if job is None or job["status"] == DONE or job_id in self._completing:
+                self.stats["duplicates"] += 1
+                print(f"Job {job_id}: duplicate result from '{worker['info']['name']}' dropped.")
+                return False
+            self._completing.add(job_id)
+        try:
+            # Written without the lock: heartbeats and pulls of the other workers go on meanwhile
+            outputs = [srt_output_path(job["path"], self.output_dir, result["language"])]
+            os.makedirs(self.output_dir, exist_ok=True)
+            write_srt(result["segments"], outputs[0])
+            for target_language, segments in result["translations"].items():
+                outputs.append(srt_output_path(job["path"], self.output_dir, target_language))
+                write_srt(segments, outputs[-1])
+            self.queue.complete(job_id, {"language": result["language"], "segments": len(result["segments"]),
+                                         "outputs": outputs, "model": result["model"],
+                                         "worker": worker["info"]["name"], "seconds": result["seconds"]})
+        finally:
+            with self._lock:
+                self._completing.discard(job_id)
+        with self._lock:
+            self.stats["completed"] += 1
+            holder = self._leases.pop(job_id, None)
+            if holder is not None and holder != worker_id:
+                self._revoked.setdefault(holder, set()).add(job_id)  # The retry is no longer needed
+            for known in self.workers.values():
+                known["jobs"].discard(job_id)
+        print(f"Job {job_id}: done by '{worker['info']['name']}' in {result['seconds']}s -> "
+              f"{', '.join(os.path.basename(path) for path in outputs)}")
+        return True
+
+    def _fail(self, worker_id, job_id, message):
+        with self._lock:
+            if self._leases.get(job_id) != worker_id:
+                return  # Already reassigned
+            del self._leases[job_id]
+            self.workers.get(worker_id, {"jobs": set()})["jobs"].discard(job_id)
+        status = self.queue.fail(job_id, message, max_attempts=self.max_attempts)
+        print(f"Job {job_id}: failed ({message}); {'will retry' if status == 'pending' else 'giving up'}.")
+
+    def _leave(self, worker_id):
+        with self._lock:
+            worker = self.workers.pop(worker_id)
+            released = [job_id for job_id in worker["jobs"] if self._leases.pop(job_id, None) == worker_id]
+        for job_id in released:
+            self.queue.release(job_id)  # Stopped by its operator: not a failed attempt
+        print(f"Worker '{worker['info']['name']}' left" + (f", {len(released)} job(s) requeued." if released else "."))
+
+    def _reap_lost_workers(self):
+        while not self._closed.wait(HEARTBEAT_SECONDS):
+            now = time.monotonic()
+            with self._lock:
+                lost = {worker_id: worker for worker_id, worker in self.workers.items()
+                        if now - worker["last_seen"] > self.lease_seconds}
+                for worker_id in lost:
+                    del self.workers[worker_id]
+                requeue = [(job_id, worker) for worker_id, worker in lost.items() for job_id in worker["jobs"]
+                           if self._leases.pop(job_id, None) == worker_id]
+            for worker in lost.values():
+                print(f"Worker '{worker['info']['name']}' lost.")
+            for job_id, worker in requeue:
+                self.stats["requeued"] += 1
+                status = self.queue.fail(job_id, f"Worker '{worker['info']['name']}' lost",
+                                         max_attempts=self.max_attempts)
+                print(f"Job {job_id}: {'requeued' if status == 'pending' else 'failed, no attempts left'}.")
+
+
+# --- Worker ---
+def worker_capabilities(slots=1, models=None):
+    """What this machine offers; models defaults to the model store's content when offline (else: any)."""
+    if models is None and offline():
+        models = sorted({model_name for _, model_name in default_model_store().models()})
+    return {"name": socket.gethostname(), "cores": os.cpu_count(), "ram_mb": total_memory_mb(),
+            "models": list(models) if models is not None else None,
+            "backends": [backend.name for backend in available_backends()],
+            "translators": [name for name, translator in TRANSLATORS.items() if translator.available()], "slots": slots}
+
+
+class CoordinatorUnavailable(ConnectionError):
+    pass
+
+
+class ClusterWorker:
+    def __init__(self, address, authkey, slots=1, models=None, threads=None, cache_dir=DEFAULT_CACHE_DIR,
+                 exit_when_idle=False, name=None):
+        self.address = address
+        self.authkey = authkey
+        self.slots = max(1, slots)
+        self.threads = threads
+        self.cache_dir = cache_dir
+        self.exit_when_idle = exit_when_idle
+        self.worker_id = uuid.uuid4().hex
+        self.capabilities = worker_capabilities(self.slots, models)
+        if name: self.capabilities["name"] = name
+        self.heartbeat_seconds = HEARTBEAT_SECONDS
+        self.completed = 0
+        self._connection = None
+        self._connection_lock = threading.Lock()
+        self._running = {}  # job_id -> CancellationToken
+        self._stop = threading.Event()
+        self._executor = None
+
+    # --- Connection ---
+    def _exchange(self, message):
+        if self._connection is None:
+            self._connection = Client(self.address, authkey=self.authkey)
+            self._connection.send(("register", self.worker_id, self.capabilities))
+            self.heartbeat_seconds = self._connection.recv()[1]
+        self._connection.send(message)
+        return self._connection.recv()
+
+    def request(self, message):
+        """Send a request and return the reply; raises CoordinatorUnavailable, or RuntimeError if the request failed there."""
+        with self._connection_lock:
+            try:
+                reply = self._exchange(message)
+                if reply[0] == "unknown":  # Presumed lost by the coordinator
+                    self._connection.send(("register", self.worker_id, self.capabilities))
+                    self._connection.recv()
+                    reply = self._exchange(message)
+            except (OSError, EOFError) as e:
+                if self._connection is not None:
+                    self._connection.close()
+                    self._connection = None
+                raise CoordinatorUnavailable(f"Coordinator {self.address[0]}:{self.address[1]} unreachable: {e}") from e
+        if reply[0] == "error":
+            raise RuntimeError(f"Coordinator error: {reply[1]}")
+        return reply
+
+    # --- Main loop ---
+    def run(self):
+        """Pull and run jobs until stop() (or, with exit_when_idle, until the queue is drained)."""
+        self._executor = JobExecutor(inference_workers=self.slots, io_workers=self.slots)
+        threading.Thread(target=self._heartbeat_loop, name="ClusterHeartbeat", daemon=True).start()
+        slots = [threading.Thread(target=self._slot_loop, name=f"ClusterSlot-{i + 1}", daemon=True)
+                 for i in range(self.slots)]
+        for thread in slots:
+            thread.start()
+        for thread in slots:
+            thread.join()
+        self._executor.shutdown()
+        try:
+            self.request(("leave", self.worker_id))
+        except (CoordinatorUnavailable, RuntimeError):
+            pass
+        with self._connection_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stop(self, cancel_running=False):
+        self._stop.set()
+        if cancel_running:
+            for token in list(self._running.values()):
+                token.cancel("Worker stopping")
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            try:
+                reply = self.request(("heartbeat", self.worker_id, list(self._running)))
+            except (CoordinatorUnavailable, RuntimeError):
+                continue
+            for job_id in reply[1]:
+                token = self._running.get(job_id)
+                if token is not None:
+                    print(f"Job {job_id}: revoked by the coordinator.")
+                    token.cancel("Reassigned by the coordinator")
+
+    def _slot_loop(self):
+        while not self._stop.is_set():
+            try:
+                reply = self.request(("pull", self.worker_id))
+            except (CoordinatorUnavailable, RuntimeError) as e:
+                print(f"{e}; retrying in {RECONNECT_SECONDS:.0f}s")
+                self._stop.wait(RECONNECT_SECONDS)
+                continue
+            if reply[0] == "job":
+                self._run_job(reply[1])
+            elif self.exit_when_idle and reply[1]:
+                self._stop.set()
+            else:
+                self._stop.wait(IDLE_POLL_SECONDS)
+
+    # --- One job ---
+    def _run_job(self, job):
+        token = CancellationToken()
+        self._running[job["id"]] = token
+        started = time.monotonic()
+        print(f"Job {job['id']}: {job['name']} ({job['size'] / (1024 * 1024):.1f} MB, attempt {job['attempts']})")
+        try:
+            media_path = self._download(job, token)
+            result = self.process(media_path, job["params"], token)
+            result["seconds"] = round(time.monotonic() - started, 2)
+            checkpoint = result.pop("checkpoint", None)
+            accepted = self.request(("result", self.worker_id, job["id"], result))[1]
+            remove_checkpoint({"checkpoint": checkpoint})
+            os.remove(media_path)
+            self.completed += accepted
+            print(f"Job {job['id']}: done in {result['seconds']}s" + ("" if accepted else " (already done elsewhere)"))
+        except JobCancelled as e:
+            print(f"Job {job['id']}: cancelled ({e}).")
+        except CoordinatorUnavailable as e:
+            print(f"Job {job['id']}: {e}; the coordinator will requeue it.")
+        except Exception as e:
+            print(f"Job {job['id']}: failed ({e}).")
+            try:
+                self.request(("failed", self.worker_id, job["id"], str(e)))
+            except (CoordinatorUnavailable, RuntimeError):
+                pass
+        finally:
+            self._running.pop(job["id"], None)
+
+    def _download(self, job, token):
+        """Stream the media into the cache and check its fingerprint; returns the job's own copy.
+
+        The data goes to "<fingerprint>.<job id>.part" (continuing a partial
+        download of an earlier attempt) and is renamed once complete, so
+        jobs of the same media in other slots never write to the same file.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        name = f"{job['fingerprint']}.{job['id']}"
+        path = os.path.join(self.cache_dir, name + os.path.splitext(job["name"])[1])
+        if os.path.exists(path) and media_fingerprint(path) == job["fingerprint"]:
+            return path  # Downloaded by an attempt whose transcription failed
+        part_path = os.path.join(self.cache_dir, name + ".part")
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset > job["size"]:
+            os.remove(part_path)
+            offset = 0
+        with open(part_path, "ab") as f:
+            while offset < job["size"]:
+                check(token)
+                reply = self.request(("chunk", self.worker_id, job["id"], offset))
+                if reply[0] != "data":
+                    raise JobCancelled("Reassigned by the coordinator")
+                if not reply[1]:
+                    break  # The file shrank on the coordinator; the fingerprint check fails below
+                f.write(reply[1])
+                offset += len(reply[1])
+        if media_fingerprint(part_path) != job["fingerprint"]:
+            os.remove(part_path)
+            raise ValueError("The media changed on the coordinator or was corrupted in transfer")
+        os.replace(part_path, path)
+        return path
+
+    def process(self, media_path, params, token):
+        """Transcribe (in the worker's inference process, where models stay loaded) and translate one file."""
+        used = {"model": params.get("model") or DEFAULT_WHISPER_MODEL}
+
+        def on_event(event):
+            if event[0] == "language":
+                used["model"] = event[3]
+            elif event[0] == "downgraded":
+                used["model"] = event[2]
+
+        cue_limits = CueLimits.from_dict(params["cue_limits"]) if params.get("cue_limits") else None
+        handle = self._executor.submit(
+            INFERENCE, transcribe_job, media_path, model_name=used["model"],
+            source_language=params.get("source_language"), word_timestamps=params.get("word_timestamps", False),
+            cue_limits=cue_limits, backend=params.get("backend", DEFAULT_BACKEND), threads=self.threads,
+            refine_model=params.get("refine_model"), language_id=params.get("language_id", True),
+            allow_downgrade=params.get("allow_downgrade", True), on_progress=on_event)
+        unregister = token.on_cancel(lambda: handle.cancel(token.reason))
+        try:
+            transcription = handle.result()
+        except concurrent.futures.CancelledError:
+            raise JobCancelled(token.reason) from None
+        finally:
+            unregister()
+        translations = {}
+        for target_language in params.get("target_languages", ()):
+            translations[target_language] = translate_segments(
+                transcription, target_language, cue_limits=cue_limits, cancel_token=token, threads=self.threads,
+                translator=params.get("translators", {}).get(target_language))["segments"]
+        return {"language": transcription["language"], "segments": transcription["segments"],
+                "translations": translations, "model": used["model"],
+                "checkpoint": transcription.get("checkpoint")}
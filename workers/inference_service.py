@@ -0,0 +1,322 @@
+"""Optional local inference service shared by several CaptionLab instances.
+
+Every window and job otherwise loads its own copy of the Whisper weights.
+The service (inference_server.py) owns one JobExecutor, so models stay
+loaded in its inference process and identical requests from different
+instances are deduplicated by job key. Clients reach it over a localhost
+socket (multiprocessing.connection, authenticated with a shared key):
+
+    client -> ("submit", job name, args, kwargs, key, priority)
+    server -> ("event", event)*  then  ("result", value) or ("error", exception)
+    client -> ("cancel", reason)        at any time; closing the connection also cancels
+
+Only the job entry points of workers.pipeline listed in JOBS can be run.
+The server writes its address and key to ~/.captionlab/daemon.json
+(readable by the current user only; CAPTIONLAB_DAEMON_FILE points elsewhere,
+e.g. to a group-readable file on a multi-seat machine). submit_job() sends
+a job to the service when one is running and falls back to the in-process
+default_executor() otherwise.
+"""
+import concurrent.futures
+import json
+import os
+import pickle
+import secrets
+import socket
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+from utils.cancellation import CancellationToken, JobCancelled
+from utils.job_executor import INFERENCE, IO, PRIORITY_NORMAL, JobExecutor, default_executor
+from workers import pipeline
+
+DAEMON_FILE_ENV = "CAPTIONLAB_DAEMON_FILE"
+DEFAULT_DAEMON_FILE = os.path.join(os.path.expanduser("~"), ".captionlab", "daemon.json")
+DISABLE_ENV = "CAPTIONLAB_NO_DAEMON"  # "1": always run in process
+DEFAULT_HOST = "127.0.0.1"
+RETRY_DISCOVERY_SECONDS = 10.0  # After a failed connection, run in process for this long before trying again
+
+# Job name -> (lane, entry point); the entry points follow the JobExecutor calling convention
+JOBS = {
+    "transcribe": (INFERENCE, pipeline.transcribe_job),
+    "transcribe_batch": (INFERENCE, pipeline.transcribe_batch_job),
+    "translate": (IO, pipeline.translate_job),
+    "retranslate": (IO, pipeline.retranslate_job),
+    "summarize": (IO, pipeline.summarize_job),
+}
+_JOB_NAMES = {fn: name for name, (_, fn) in JOBS.items()}
+
+
+def daemon_file():
+    return os.getenv(DAEMON_FILE_ENV) or DEFAULT_DAEMON_FILE
+
+
+class ServiceUnavailable(ConnectionError):
+    """The inference service went away while a job was running."""
+
+
+# --- Server ---
+class InferenceServer:
+    def __init__(self, host=DEFAULT_HOST, port=0, executor=None, path=None):
+        self.authkey = secrets.token_bytes(32)
+        self.listener = Listener((host, port), authkey=self.authkey)
+        self.executor = executor or JobExecutor()
+        self.path = path or daemon_file()
+        self._closed = threading.Event()
+        self.connections = 0
+
+    @property
+    def address(self):
+        return self.listener.address
+
+    def write_daemon_file(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"host": self.address[0], "port": self.address[1], "authkey": self.authkey.hex(),
+                       "pid": os.getpid()}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove_daemon_file(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                if json.load(f).get("pid") != os.getpid():
+                    return  # Another server has taken over
+            os.remove(self.path)
+        except (OSError, ValueError):
+            pass
+
+    def serve_forever(self):
+        self.write_daemon_file()
+        try:
+            while not self._closed.is_set():
+                try:
+                    connection = self.listener.accept()
+                except Exception:
+                    if self._closed.is_set():
+                        return
+                    continue  # Failed handshake (wrong key, port scanner): keep serving
+                self.connections += 1
+                threading.Thread(target=self._serve_connection, args=(connection,), name="ServiceClient",
+                                 daemon=True).start()
+        finally:
+            self.remove_daemon_file()
+
+    def close(self):
+        self._closed.set()
+        try:
+            socket.create_connection(self.address, timeout=1).close()  # Wake up accept()
+        except OSError:
+            pass
+        self.listener.close()
+        self.executor.shutdown()
+
+    def _serve_connection(self, connection):
+        send_lock = threading.Lock()
+
+        def send(message):
+            with send_lock:
+                try:
+                    connection.send(message)
+                except (OSError, EOFError, ValueError):
+                    pass  # The client is gone; its reader thread cancels the job
+
+        try:
+            message = connection.recv()
+        except (OSError, EOFError):
+            connection.close()
+            return
+        if message[0] == "ping":
+            send(("pong", {"pid": os.getpid(), "jobs": sorted(JOBS), "stats": self.executor.stats()}))
+            connection.close()
+            return
+        _, name, args, kwargs, key, priority = message
+        if name not in JOBS:
+            send(("error", ValueError(f"Unknown job '{name}'")))
+            connection.close()
+            return
+        kind, fn = JOBS[name]
+        handle = self.executor.submit(kind, fn, *args, key=key, priority=priority,
+                                      on_progress=lambda event: send(("event", event)), **kwargs)
+
+        def read_cancel():
+            # A cancel message, or the client going away, withdraws this client from the job
+            try:
+                while True:
+                    message = connection.recv()
+                    if message[0] == "cancel":
+                        handle.cancel(message[1])
+                        return
+            except (OSError, EOFError):
+                if not handle.done():
+                    handle.cancel("Client disconnected")
+
+        threading.Thread(target=read_cancel, name="ServiceCancel", daemon=True).start()
+        try:
+            send(("result", handle.result()))
+        except concurrent.futures.CancelledError:
+            send(("error", JobCancelled("Cancelled")))
+        except Exception as e:
+            send(("error", _picklable(e)))
+        finally:
+            connection.close()
+
+
+def _picklable(error):
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+# --- Client ---
+class RemoteJobHandle:
+    """JobHandle (utils.job_executor) of a job running in the inference service."""
+
+    def __init__(self, connection, key=None, priority=PRIORITY_NORMAL):
+        self.key = key
+        self.priority = priority
+        self.future = concurrent.futures.Future()
+        self.future.set_running_or_notify_cancel()
+        self.cancel_token = CancellationToken()
+        self._connection = connection
+        self._send_lock = threading.Lock()
+        self._listeners = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._read, name="ServiceJob", daemon=True).start()
+
+    def _read(self):
+        try:
+            while True:
+                message = self._connection.recv()
+                if message[0] == "event":
+                    self._emit(*message[1])
+                elif message[0] == "result":
+                    self.future.set_result(message[1])
+                    return
+                else:
+                    self.future.set_exception(message[1])
+                    return
+        except (OSError, EOFError) as e:
+            if not self.future.done():
+                if self.cancel_token.cancelled:
+                    self.future.set_exception(JobCancelled(self.cancel_token.reason))
+                else:
+                    self.future.set_exception(ServiceUnavailable(f"The inference service stopped: {e or 'connection closed'}"))
+        finally:
+            self._connection.close()
+
+    def add_progress_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _emit(self, *event):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Progress listener failed: {e}")
+
+    def add_done_callback(self, callback):
+        self.future.add_done_callback(callback)
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def cancel(self, reason="Cancelled"):
+        self.cancel_token.cancel(reason)
+        with self._send_lock:
+            try:
+                self._connection.send(("cancel", reason))
+            except (OSError, ValueError):
+                pass
+        return True
+
+
+class InferenceClient:
+    def __init__(self, info):
+        self.address = (info["host"], info["port"])
+        self.authkey = bytes.fromhex(info["authkey"])
+
+    @staticmethod
+    def discover():
+        """Client of the running service, or None."""
+        try:
+            with open(daemon_file(), encoding="utf-8") as f:
+                info = json.load(f)
+            os.kill(info["pid"], 0)  # A stale file from a server that died
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return InferenceClient(info)
+
+    def _connect(self):
+        return Client(self.address, authkey=self.authkey)
+
+    def ping(self):
+        connection = self._connect()
+        try:
+            connection.send(("ping",))
+            return connection.recv()[1]
+        finally:
+            connection.close()
+
+    def submit(self, name, *args, key=None, priority=PRIORITY_NORMAL, on_progress=None, **kwargs):
+        """Start a job in the service and return its RemoteJobHandle; raises OSError if it cannot be reached."""
+        connection = self._connect()
+        try:
+            connection.send(("submit", name, args, kwargs, key, priority))
+        except BaseException:
+            connection.close()
+            raise
+        handle = RemoteJobHandle(connection, key, priority)
+        if on_progress: handle.add_progress_listener(on_progress)
+        return handle
+
+
+_client = None
+_client_checked = 0.0
+_client_lock = threading.Lock()
+
+
+def service_client():
+    """Client of the running service (rediscovered after RETRY_DISCOVERY_SECONDS), or None."""
+    global _client, _client_checked
+    if os.getenv(DISABLE_ENV) == "1":
+        return None
+    with _client_lock:
+        if _client is None and time.monotonic() - _client_checked > RETRY_DISCOVERY_SECONDS:
+            _client_checked = time.monotonic()
+            _client = InferenceClient.discover()
+        return _client
+
+
+def _forget_client():
+    global _client, _client_checked
+    with _client_lock:
+        _client = None
+        _client_checked = time.monotonic()
+
+
+def submit_job(kind, fn, *args, key=None, priority=PRIORITY_NORMAL, on_progress=None, **kwargs):
+    """Run a job in the inference service if one is up, else on default_executor(); returns its handle.
+
+    Events registered through on_progress may arrive before the call returns,
+    as with JobExecutor.submit().
+    """
+    name = _JOB_NAMES.get(fn)
+    client = service_client() if name else None
+    if client is not None:
+        try:
+            return client.submit(name, *args, key=key, priority=priority, on_progress=on_progress, **kwargs)
+        except (OSError, EOFError) as e:
+            print(f"Inference service unavailable ({e}), running in process")
+            _forget_client()
+    return default_executor().submit(kind, fn, *args, key=key, priority=priority, on_progress=on_progress, **kwargs)
@@ -0,0 +1,89 @@
+"""Language identification before transcription.
+
+Whisper's "auto" language looks at the first 30 seconds only, which an
+intro, music or a bilingual presenter can fool, and the multilingual
+models are used even for English. identify_language() instead scores a
+few short windows spread over the whole file with a small model and
+returns a report:
+
+    {"language": "en", "probability": 0.94, "code_switching": False,
+     "languages": {"en": 0.8, "fr": 0.2},        # share of windows won
+     "windows": [[start_seconds, "en", 0.97], ...]}
+
+route_model() then picks the English-only variant of a model ("base" ->
+"base.en", faster and more accurate on English) when the whole file is
+English. A file where a second language wins a fair share of the windows
+is reported as code-switching and keeps the multilingual model with no
+fixed language.
+"""
+from utils.cancellation import check
+
+SAMPLE_RATE = 16000
+LANGUAGE_ID_MODEL = "tiny"  # Small enough that the pre-pass costs about a second
+SAMPLE_WINDOWS = 5
+WINDOW_SECONDS = 10.0
+MIN_WINDOW_RMS = 0.01  # Quieter windows (silence, fades) do not vote
+MIN_WINDOW_PROBABILITY = 0.5  # A window votes only when its top language is at least this likely
+CODE_SWITCHING_SHARE = 0.2  # A second language winning this share of the windows
+ENGLISH_ONLY_MODELS = ("tiny", "base", "small", "medium")  # Whisper has no large.en
+
+
+def sample_windows(sample_count, windows=SAMPLE_WINDOWS, window_seconds=WINDOW_SECONDS):
+    """(first, end) sample ranges of windows centred evenly over the audio."""
+    window = int(window_seconds * SAMPLE_RATE)
+    if sample_count <= window:
+        return [(0, sample_count)] if sample_count else []
+    count = max(1, min(windows, sample_count // window))
+    ranges = []
+    for i in range(count):
+        centre = int(sample_count * (i + 0.5) / count)
+        first = min(max(0, centre - window // 2), sample_count - window)
+        ranges.append((first, first + window))
+    return ranges
+
+
+def identify_language(audio, detect, windows=SAMPLE_WINDOWS, window_seconds=WINDOW_SECONDS, cancel_token=None):
+    """Score sampled windows of audio (16 kHz float32 numpy array) with detect(window) -> {code: probability}."""
+    totals = {}
+    votes = {}
+    window_results = []
+    ranges = sample_windows(len(audio), windows, window_seconds)
+    for first, end in ranges:
+        check(cancel_token)
+        window = audio[first:end]
+        if len(ranges) > 1 and float((window ** 2).mean()) ** 0.5 < MIN_WINDOW_RMS:
+            continue
+        probabilities = detect(window)
+        if not probabilities:
+            continue
+        language = max(probabilities, key=probabilities.get)
+        for code, probability in probabilities.items():
+            totals[code] = totals.get(code, 0.0) + probability
+        window_results.append([round(first / SAMPLE_RATE, 2), language, round(float(probabilities[language]), 3)])
+        if probabilities[language] >= MIN_WINDOW_PROBABILITY:
+            votes[language] = votes.get(language, 0) + 1
+    if not totals:
+        return {"language": None, "probability": 0.0, "code_switching": False, "languages": {}, "windows": window_results}
+    language = max(totals, key=totals.get)
+    voted = sum(votes.values())
+    shares = {code: round(count / voted, 3) for code, count in sorted(votes.items(), key=lambda item: -item[1])}
+    code_switching = sum(1 for code, share in shares.items() if share >= CODE_SWITCHING_SHARE) > 1
+    return {
+        "language": language,
+        "probability": round(totals[language] / len(window_results), 3),
+        "code_switching": code_switching,
+        "languages": shares,
+        "windows": window_results,
+    }
+
+
+def english_model(model_name):
+    """English-only variant of a model, or the model itself when there is none."""
+    return f"{model_name}.en" if model_name in ENGLISH_ONLY_MODELS else model_name
+
+
+def route_model(model_name, report):
+    """Model to transcribe with, given a language report."""
+    if report and report.get("language") == "en" and not report.get("code_switching"):
+        return english_model(model_name)
+    return model_name
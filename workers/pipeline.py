@@ -0,0 +1,810 @@
+"""Qt-free transcription / translation / export steps.
+
+The GUI workers in version2.py and the watch-folder service both run the
+same chain through these functions, so there is only one place where a
+Whisper result is formatted or an SRT file is written.
+"""
+import gc
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils import tracing
+from utils.cancellation import check
+from utils.checkpoint_log import collect_garbage, open_checkpoint
+from utils.fingerprint import media_fingerprint
+from utils.helpers import format_srt_timestamp
+from utils.language_cache import default_language_cache
+from utils.memory import (InsufficientMemoryError, Reservation, default_governor, memory_stage, peak_rss_mb,
+                          track_memory)
+from utils.model_store import ModelStoreError
+from utils.resegment import resegment, wrap_segment_texts, wrap_text
+from utils.rtf_store import default_store
+from utils.segment_table import CONFIDENCE_KEYS, SegmentTable, as_segment_table
+from workers.backends import DEFAULT_BACKEND, get_backend, rtf_key
+from workers.cascade import PROMPT_SEGMENTS, low_confidence_spans, refine_result, shift_segment
+from workers.language_id import LANGUAGE_ID_MODEL, identify_language, route_model
+from workers.translators import GoogleTranslatorBackend, translator_for
+
+DEFAULT_WHISPER_MODEL = "base"
+WHISPER_SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE
+DECODE_CHUNK_BYTES = 1 << 20  # ffmpeg output read per cancellation check (~33 s of 16 kHz s16le)
+CHECKPOINT_MIN_SECONDS = 600  # Shorter files are transcribed in one go, without checkpoints
+CHECKPOINT_CHUNK_SECONDS = 120  # Audio per checkpointed chunk: at most this much work is lost
+CHUNK_CUT_SEARCH_SECONDS = 5.0  # A chunk ends at the quietest frame of the last seconds before its nominal end
+CHUNK_CUT_FRAME_SAMPLES = 320  # 20 ms
+CHECKPOINT_SEGMENT_KEYS = ("start", "end", "text", "words") + CONFIDENCE_KEYS
+BATCH_MAX_CLIP_SECONDS = 30.0  # Clips that fit one decoder window can be transcribed together
+DEFAULT_BATCH_SIZE = 8  # Windows per batched forward pass
+
+# Idle models, per (backend, model name, threads). A model is checked out by
+# one job at a time (decoding installs hooks on the model, so it must not be
+# shared between concurrent transcriptions) and handed back for the next job
+# afterwards.
+_idle_models = {}
+_models_lock = threading.Lock()
+
+
+def _model_key(model_name, backend, threads):
+    backend = get_backend(backend)
+    return backend.name, model_name, threads if backend.threads_at_load else None
+
+
+def acquire_whisper_model(model_name=DEFAULT_WHISPER_MODEL, backend=DEFAULT_BACKEND, threads=None):
+    """Take an idle loaded model, loading a new copy only if none is idle."""
+    key = _model_key(model_name, backend, threads)
+    with _models_lock:
+        idle = _idle_models.setdefault(key, [])
+        model = idle.pop() if idle else None
+    if model is None:
+        tracing.count("whisper.model_cache.miss")
+        with tracing.span("whisper.model_load", model=model_name, backend=key[0]), memory_stage("model_load"):
+            model = get_backend(backend).load_model(model_name, threads)
+    else:
+        tracing.count("whisper.model_cache.hit")
+    return model
+
+
+def release_whisper_model(model_name, model, backend=DEFAULT_BACKEND, threads=None):
+    """Hand a model taken with acquire_whisper_model back for the next job."""
+    with _models_lock:
+        _idle_models.setdefault(_model_key(model_name, backend, threads), []).append(model)
+
+
+def release_idle_models():
+    """Drop every idle loaded model (memory pressure); returns how many were dropped."""
+    with _models_lock:
+        dropped = sum(len(models) for models in _idle_models.values())
+        _idle_models.clear()
+    if dropped:
+        gc.collect()
+        tracing.count("whisper.model_cache.released", dropped)
+    return dropped
+
+
+def admit_model(model_name, backend=DEFAULT_BACKEND, threads=None, allow_downgrade=True, wait=True, on_wait=None,
+                cancel_token=None):
+    """Reservation (utils.memory.Reservation) of the model to load for a job under the memory budget.
+
+    A model already loaded and idle is always admitted. Otherwise idle
+    models are released if that makes room, the job waits for memory when
+    wait is set, and finally a smaller model the backend can load is picked
+    when allow_downgrade is set. Raises InsufficientMemoryError when nothing
+    fits. Release the reservation once the model is loaded or its load
+    failed, e.g. by loading it in a "with reservation:" block.
+    """
+    with _models_lock:
+        if _idle_models.get(_model_key(model_name, backend, threads)):
+            return Reservation(model_name)  # Nothing to load, nothing to hold
+    governor = default_governor()
+    if not wait:
+        governor = governor.without_wait()
+    engine = get_backend(backend)
+    return governor.admit(model_name, quantized=engine.quantized, allow_downgrade=allow_downgrade,
+                          release_cached=release_idle_models, on_wait=on_wait, cancel_token=cancel_token,
+                          loadable=engine.can_load)
+
+
+def relieve_memory_pressure():
+    """Release idle models when the machine is short of memory after a job."""
+    budget = default_governor().budget_mb()
+    if budget is not None and budget < 0:
+        release_idle_models()
+
+
+@contextmanager
+def checkout_whisper_model(model_name=DEFAULT_WHISPER_MODEL, backend=DEFAULT_BACKEND, threads=None, reservation=None):
+    """Model for the with block, handed back after it; reservation (from admit_model()) is released once loaded."""
+    try:
+        model = acquire_whisper_model(model_name, backend, threads)
+    finally:
+        if reservation is not None:
+            reservation.release()
+    try:
+        yield model
+    finally:
+        release_whisper_model(model_name, model, backend, threads)
+
+
+class ModelLoadError(RuntimeError):
+    """A Whisper model could not be loaded (download failed, not enough memory...)."""
+
+
+def format_transcription(result):
+    """Keep only what the application uses from a Whisper result.
+
+    Segments are stored as a SegmentTable; its rows still read like the
+    {"id", "start", "end", "text"} dicts used elsewhere. Word timings, when
+    Whisper produced them, are kept in the table's compact word columns, and
+    the per-segment confidence (avg_logprob, no_speech_prob,
+    compression_ratio) in its confidence columns.
+    """
+    raw_segments = result.get("segments", []) if result else []
+    has_words = any("words" in segment for segment in raw_segments)
+    has_confidence = bool(raw_segments) and all("avg_logprob" in segment for segment in raw_segments)
+    segments = SegmentTable.from_columns(
+        range(1, len(raw_segments) + 1),
+        [segment.get("start", 0) for segment in raw_segments],
+        [segment.get("end", 0) for segment in raw_segments],
+        [segment.get("text", "").strip() for segment in raw_segments],
+        words=[segment.get("words") for segment in raw_segments] if has_words else None,
+        confidence={key: [segment.get(key) or 0 for segment in raw_segments] for key in CONFIDENCE_KEYS}
+        if has_confidence else None,
+    )
+    return {
+        "text": result.get("text", "") if result else "",
+        "segments": segments,
+        "language": result.get("language", "unknown") if result else "unknown"
+    }
+
+
+def probe_duration(media_path):
+    """Media duration in seconds from ffprobe, without decoding; None if unknown."""
+    ffprobe = shutil.which("ffprobe")
+    if not ffprobe:
+        return None
+    try:
+        output = subprocess.run(
+            [ffprobe, "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", media_path],
+            capture_output=True, text=True, check=True, timeout=30).stdout
+        return float(output.strip())
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def decode_audio(media_path, cancel_token=None):
+    """Decode a media file to 16 kHz mono float32 samples (through ffmpeg).
+
+    Same conversion as whisper.load_audio, but the output is streamed so a
+    cancelled job kills ffmpeg instead of waiting for the whole file.
+    """
+    import numpy as np
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0", "-i", media_path,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(WHISPER_SAMPLE_RATE), "-"]
+    with tracing.span("whisper.decode", bytes=os.path.getsize(media_path)) as sp, memory_stage("decode"):
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        unregister = cancel_token.on_cancel(process.kill) if cancel_token else None
+        try:
+            pcm = bytearray()
+            while True:
+                chunk = process.stdout.read(DECODE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                pcm += chunk
+            errors = process.stderr.read()
+            process.wait()
+        finally:
+            if unregister: unregister()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        check(cancel_token)
+        if process.returncode != 0:
+            raise RuntimeError(f"Failed to load audio: {errors.decode(errors='replace').strip()}")
+        audio = np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+        sp.set(audio_seconds=len(audio) / WHISPER_SAMPLE_RATE)
+    return audio
+
+
+def transcribe_media(model, media_path, source_language=None, model_name=None, on_progress=None, on_decoded=None,
+                     word_timestamps=False, cue_limits=None, cancel_token=None, backend=DEFAULT_BACKEND, threads=None,
+                     refine_model=None, on_refine=None, audio=None, checkpoint=True, on_resumed=None):
+    """Run Whisper on a media file and return the formatted transcription.
+
+    model must come from the same backend (workers.backends), e.g. through
+    checkout_whisper_model(model_name, backend, threads); threads limits the
+    CPU threads used for decoding (None: the backend's default).
+
+    With refine_model (a larger model name) this is a two-pass cascade: the
+    low-confidence spans of the first transcription are decoded again with
+    refine_model and spliced in (workers.cascade); on_refine(done, total,
+    span_seconds) reports each span, and the result gets a "cascade" entry
+    with what was re-decoded.
+
+    word_timestamps keeps per-word start/end/probability on each segment
+    (Whisper's cross-attention alignment; adds roughly 10-20% decode time).
+    With cue_limits (utils.resegment.CueLimits) the segments are re-cut into
+    readable cues before they are returned, so display, translation and
+    export all see the same cues.
+
+    audio skips decoding when the samples are already at hand (16 kHz
+    float32, e.g. from detect_media_language()).
+
+    With checkpoint and model_name, files of CHECKPOINT_MIN_SECONDS or more
+    are transcribed in chunks saved to a checkpoint log as they finish
+    (utils.checkpoint_log); a run that was interrupted resumes after its
+    last saved chunk, and on_resumed(resume_seconds) is called when it does.
+    The log is kept until remove_checkpoint() is called with the result.
+    While another run is writing the same log, this one runs without it.
+
+    on_decoded(audio_seconds) is called once the audio is decoded and
+    on_progress(processed_seconds, audio_seconds) after each decoded window.
+    When model_name is given, the run's real-time factor is recorded (per
+    model and backend) so later jobs get an ETA before they start. A cancelled cancel_token
+    (utils.cancellation) stops ffmpeg or the decoder at its next step and
+    raises JobCancelled.
+    """
+    if audio is None:
+        audio = decode_audio(media_path, cancel_token)
+    audio_seconds = len(audio) / WHISPER_SAMPLE_RATE
+    if on_decoded: on_decoded(audio_seconds)
+    language = source_language if source_language and source_language.lower() != "auto" else None
+
+    def window_done(processed):
+        check(cancel_token)
+        if on_progress: on_progress(min(processed, audio_seconds), audio_seconds)
+
+    engine = get_backend(backend)
+    log = None
+    if checkpoint and model_name and audio_seconds >= CHECKPOINT_MIN_SECONDS:
+        log = _open_checkpoint(media_path, model_name, engine.name, language, word_timestamps)
+    try:
+        resumed_seconds = log.resume_seconds if log else 0.0
+        if resumed_seconds and on_resumed: on_resumed(resumed_seconds)
+
+        started = time.perf_counter()
+        with tracing.span("whisper.transcribe", audio_seconds=audio_seconds, backend=backend) as sp, \
+                memory_stage("transcribe"):
+            if log is None:
+                result = engine.transcribe(model, audio, language=language, word_timestamps=word_timestamps,
+                                           threads=threads, on_window=window_done, cancel_token=cancel_token)
+            else:
+                sp.set(resumed_seconds=resumed_seconds)
+                result = transcribe_checkpointed(engine, model, audio, log, language=language,
+                                                 word_timestamps=word_timestamps, threads=threads,
+                                                 on_window=window_done, cancel_token=cancel_token)
+            sp.set(segments=len(result.get("segments", [])))
+    finally:
+        if log is not None:
+            log.close()  # Finished or interrupted, another run may now resume from it
+    if model_name:
+        default_store().record(rtf_key(model_name, backend), audio_seconds - resumed_seconds,
+                               time.perf_counter() - started)
+    cascade_stats = None
+    if refine_model and refine_model != model_name:
+        result, cascade_stats = refine_low_confidence(result, audio, refine_model, backend=backend, threads=threads,
+                                                      word_timestamps=word_timestamps, on_span=on_refine,
+                                                      cancel_token=cancel_token)
+    with tracing.span("format.segments") as sp, memory_stage("format"):
+        formatted = format_transcription(result)
+        if tracing.enabled():
+            segments = formatted["segments"]
+            sp.set(segments=len(segments), words=len(segments.all_words()), bytes=segments.nbytes())
+    if log is not None:
+        formatted["checkpoint"] = {"path": log.path, "resumed_seconds": resumed_seconds}
+    if cascade_stats is not None:
+        formatted["cascade"] = dict(cascade_stats, draft_model=model_name, refine_model=refine_model)
+    if cue_limits is not None:
+        with tracing.span("resegment", segments=len(formatted["segments"])) as sp, memory_stage("format"):
+            formatted["segments"] = resegment(formatted["segments"], cue_limits)
+            sp.set(cues=len(formatted["segments"]))
+    return formatted
+
+
+def _open_checkpoint(media_path, model_name, backend, language, word_timestamps):
+    try:
+        collect_garbage()
+        return open_checkpoint(media_fingerprint(media_path), model_name, backend, language, word_timestamps)
+    except OSError as e:
+        print(f"Transcribing without checkpoints: {e}")
+        return None
+
+
+def remove_checkpoint(result):
+    """Delete the checkpoint log of a transcription once its result is stored."""
+    checkpoint = result.pop("checkpoint", None) if result else None
+    if checkpoint:
+        try:
+            os.remove(checkpoint["path"])
+        except OSError:
+            pass
+
+
+def _chunk_end(audio, first):
+    """End sample of the chunk starting at first: a quiet point near CHECKPOINT_CHUNK_SECONDS later."""
+    chunk = CHECKPOINT_CHUNK_SECONDS * WHISPER_SAMPLE_RATE
+    if len(audio) - first <= chunk * 1.5:
+        return len(audio)  # No short trailing chunk
+    search = int(CHUNK_CUT_SEARCH_SECONDS * WHISPER_SAMPLE_RATE)
+    window_start = first + chunk - search
+    frames = audio[window_start:first + chunk].reshape(-1, CHUNK_CUT_FRAME_SAMPLES)
+    quietest = int((frames ** 2).mean(axis=1).argmin())
+    return window_start + quietest * CHUNK_CUT_FRAME_SAMPLES + CHUNK_CUT_FRAME_SAMPLES // 2
+
+
+def transcribe_checkpointed(engine, model, audio, log, language=None, word_timestamps=False, threads=None,
+                            on_window=None, cancel_token=None):
+    """Transcribe audio chunk by chunk, appending each finished chunk to log.
+
+    Starts after the chunks the log already holds. Each chunk gets the end of
+    the previous text as initial prompt and the language of the first chunk,
+    so the chunks read as one transcription.
+    """
+    segments = log.segments()
+    language = language or log.language()
+    first = int(round(log.resume_seconds * WHISPER_SAMPLE_RATE))
+    while first < len(audio):
+        check(cancel_token)
+        end = _chunk_end(audio, first)
+        offset = first / WHISPER_SAMPLE_RATE
+        prompt = " ".join(segment["text"].strip() for segment in segments[-PROMPT_SEGMENTS:])
+        chunk = engine.transcribe(model, audio[first:end], language=language, word_timestamps=word_timestamps,
+                                  threads=threads, cancel_token=cancel_token, initial_prompt=prompt or None,
+                                  on_window=(lambda processed: on_window(offset + processed)) if on_window else None)
+        language = language or chunk.get("language")
+        chunk_segments = [shift_segment({key: segment[key] for key in CHECKPOINT_SEGMENT_KEYS if key in segment},
+                                        offset, end / WHISPER_SAMPLE_RATE)
+                          for segment in chunk.get("segments", []) if segment.get("text", "").strip()]
+        log.append(end / WHISPER_SAMPLE_RATE, chunk_segments, language)
+        segments.extend(chunk_segments)
+        first = end
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": language}
+
+
+def refine_low_confidence(result, audio, refine_model, backend=DEFAULT_BACKEND, threads=None, word_timestamps=False,
+                          on_span=None, cancel_token=None):
+    """Second pass of the cascade: re-decode the weak spans of a raw result with refine_model.
+
+    Returns (result, stats); the larger model is only loaded when there is a span to re-decode,
+    and when it fits in memory right away (stats then has "skipped" with the reason).
+    """
+    stats = {"spans": 0, "draft_segments": len(result.get("segments", [])), "replaced_segments": 0,
+             "refined_seconds": 0.0, "refined_fraction": 0.0}
+    if not low_confidence_spans(result.get("segments", [])):
+        return result, stats
+    try:
+        reservation = admit_model(refine_model, backend, threads, allow_downgrade=False, wait=False,
+                                  cancel_token=cancel_token)
+    except InsufficientMemoryError as e:
+        return result, dict(stats, skipped=str(e))  # The draft is still a full transcription
+    engine = get_backend(backend)
+    with checkout_whisper_model(refine_model, backend, threads, reservation) as model:
+        def transcribe_span(samples, prompt):
+            # The draft's language is kept, a short passage is too little to detect it again
+            return engine.transcribe(model, samples, language=result.get("language"), word_timestamps=word_timestamps,
+                                     threads=threads, cancel_token=cancel_token, initial_prompt=prompt)
+
+        with tracing.span("cascade.refine", model=refine_model) as sp, memory_stage("refine"):
+            refined, stats = refine_result(result, audio, transcribe_span, on_span=on_span, cancel_token=cancel_token)
+            sp.set(**stats)
+    return refined, stats
+
+
+def is_auto_language(source_language):
+    return not source_language or source_language.lower() == "auto"
+
+
+def detect_media_language(media_path, backend=DEFAULT_BACKEND, threads=None, cancel_token=None):
+    """Language report of a media file (workers.language_id), cached per media fingerprint.
+
+    Returns (report, audio): audio is the decoded samples when detection had
+    to decode the file (to be reused for transcription), None on a cache hit.
+    """
+    cache = default_language_cache()
+    try:
+        fingerprint = media_fingerprint(media_path)
+    except OSError:
+        fingerprint = None  # decode_audio() reports the real problem
+    report = cache.get(fingerprint) if fingerprint else None
+    if report is not None:
+        tracing.count("language_id.cache.hit")
+        return report, None
+    tracing.count("language_id.cache.miss")
+    audio = decode_audio(media_path, cancel_token)
+    engine = get_backend(backend)
+    with checkout_whisper_model(LANGUAGE_ID_MODEL, backend, threads) as model:
+        with tracing.span("language_id", model=LANGUAGE_ID_MODEL, backend=engine.name) as sp:
+            report = identify_language(audio, lambda window: engine.detect_language(model, window),
+                                       cancel_token=cancel_token)
+            sp.set(language=report["language"], code_switching=report["code_switching"])
+    if fingerprint and report["language"]:
+        cache.put(fingerprint, report)
+    return report, audio
+
+
+def route_transcription(model_name, refine_model, report):
+    """(model_name, source_language, refine_model) to transcribe with, given a language report.
+
+    English audio goes to the .en models; a code-switching file keeps the
+    multilingual models and automatic detection (Whisper decodes a run in
+    one language at most).
+    """
+    if not report or not report.get("language") or report.get("code_switching"):
+        return model_name, None, refine_model
+    return route_model(model_name, report), report["language"], refine_model and route_model(refine_model, report)
+
+
+def translate_segments(subtitle_data, target_language, on_progress=None, on_warning=None,
+                       translator_factory=None, cue_limits=None, cancel_token=None, translator=None, threads=None):
+    """Translate every segment of a transcription.
+
+    on_progress(value, text) and on_warning(message) are optional callbacks.
+    translator names the backend (workers.translators: "google", "marian",
+    or "auto"/None for the local model when one is stored for the language
+    pair, Google otherwise); threads limits the CPU threads of a local
+    model. translator_factory(source=..., target=...) overrides it with an
+    object with a translate(text) method, called like Google Translate.
+    Cue line breaks are removed before translating; with cue_limits the
+    translated texts are wrapped again to the same limits. cancel_token is
+    checked before every request or batch. The result's "translator" is the
+    backend that ran.
+    """
+    def progress(value, text):
+        if on_progress: on_progress(value, text)
+
+    def warn(message):
+        if on_warning: on_warning(message)
+
+    if not subtitle_data or not subtitle_data.get("segments"):
+        return {"text": "", "segments": SegmentTable.from_segments([]), "language": target_language}
+
+    source_language = subtitle_data.get("language", "auto")
+    if translator_factory is not None:
+        engine = GoogleTranslatorBackend(translator_factory)
+    else:
+        engine = translator_for(source_language, target_language, translator)
+    progress(10, f"Translating from '{source_language}' to '{target_language}' ({engine.label})...")
+
+    segments = as_segment_table(subtitle_data["segments"])
+    total_segments = len(segments)
+    texts_to_translate = [" ".join(source_text.split()) for source_text in segments.texts()]
+    with tracing.span("translate", target=target_language, segments=total_segments, translator=engine.name) as stage_span:
+        translated_texts = engine.translate_batch(
+            texts_to_translate, source_language, target_language, threads=threads, on_warning=warn,
+            on_done=lambda done: progress(int(10 + (done / total_segments) * 80),
+                                          f"Translating segment {done}/{total_segments}..."),
+            cancel_token=cancel_token)
+
+        # Ids and timings are shared with the source table, only the texts are new
+        translated_segments = segments.with_texts(translated_texts)
+        if cue_limits is not None:
+            translated_segments = wrap_segment_texts(translated_segments, cue_limits)
+        progress(95, "Finalizing translation...")
+        # Traduire le texte complet si disponible
+        joined_segments = translated_segments.full_text()
+        full_text = subtitle_data.get("text", "")
+        translated_full_text = joined_segments
+        if full_text.strip() and engine.translates_full_text:
+            check(cancel_token)
+            try:
+                with tracing.span("translate.request", chars=len(full_text)):
+                    translated_full_text = engine.translate_text(full_text, source_language, target_language)
+            except Exception:
+                # En cas d'erreur, concaténer les segments traduits
+                pass
+        stage_span.set(chars=sum(len(text) for text in segments.texts()))
+
+    return {
+        "text": translated_full_text,
+        "segments": translated_segments,
+        "language": target_language,
+        "translator": engine.name
+    }
+
+
+def retranslate_texts(texts, source_language, target_language, translator=None, cue_limits=None, threads=None,
+                      on_warning=None, cancel_token=None):
+    """Translate a few edited cue texts again; returns the translations in order.
+
+    translator should be the backend of the translation they are spliced
+    into (its "translator"), so edited cues read like the others. The
+    translation's full text is not requested again.
+    """
+    engine = translator_for(source_language, target_language, translator)
+    texts = [" ".join(text.split()) for text in texts]
+    with tracing.span("translate.edits", target=target_language, segments=len(texts), translator=engine.name):
+        translated = engine.translate_batch(texts, source_language, target_language, threads=threads,
+                                            on_warning=on_warning, cancel_token=cancel_token)
+    if cue_limits is not None:
+        translated = [wrap_text(text, cue_limits.max_chars_per_line, cue_limits.max_lines) for text in translated]
+    return translated
+
+
+def summarize_text(text, api_key, on_progress=None, cancel_token=None):
+    """Summarize text with Gemini; the response is streamed so a cancelled job stops between chunks."""
+    def progress(value, message):
+        if on_progress: on_progress(value, message)
+
+    progress(10, "Initializing Gemini model...")
+    check(cancel_token)
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    # Using gemini-1.5-flash for potentially faster summarization
+    model = genai.GenerativeModel('gemini-2.0-flash')
+    progress(30, "Model initialized.")
+
+    progress(40, "Generating summary...")
+    prompt = f"""Summarize the following text:
+
+{text}"""
+    with tracing.span("summarize.gemini", chars=len(text)) as sp:
+        response = model.generate_content(prompt, stream=True)
+        chunks = []
+        for chunk in response:
+            check(cancel_token)
+            chunks.append(chunk.text)
+        summary = "".join(chunks)
+        sp.set(summary_chars=len(summary))
+    check(cancel_token)
+    return summary
+
+
+def write_srt(segments, output_path):
+    """Write segments (a SegmentTable or a list of segment dicts) to a SubRip file."""
+    segments = as_segment_table(segments)
+    with tracing.span("export.srt", segments=len(segments)) as sp:
+        with open(output_path, 'w', encoding='utf-8', errors='replace') as srt_file:
+            for i, (_, start, end, text) in enumerate(segments.rows()):
+                srt_file.write(f"{i + 1}\n")
+                srt_file.write(f"{format_srt_timestamp(start)} --> {format_srt_timestamp(end)}\n")
+                srt_file.write(f"{text}\n\n")
+            sp.set(bytes=srt_file.tell())
+
+
+def transcribe_batch_media(model, items, model_name=None, backend=DEFAULT_BACKEND, threads=None, on_decoded=None,
+                           on_item=None, cancel_token=None):
+    """Transcribe several short media files together (cross-file batching).
+
+    items are (media_path, source_language, cue_limits) of clips no longer
+    than BATCH_MAX_CLIP_SECONDS. Their audio windows go through the model
+    in one batch (TranscriptionBackend.transcribe_batch) instead of one
+    transcribe() call each, which is where the per-call overhead of short
+    clips goes. Returns one formatted transcription per item, in order; an
+    item that failed (it could not be decoded, or is too long) gets
+    {"error": message} instead. on_decoded(index, audio_seconds) and
+    on_item(index) report each file.
+    """
+    results = [None] * len(items)
+    audios, indices, languages = [], [], []
+    for index, (media_path, source_language, _) in enumerate(items):
+        check(cancel_token)
+        try:
+            audio = decode_audio(media_path, cancel_token)
+        except RuntimeError as e:
+            results[index] = {"error": str(e)}
+            continue
+        audio_seconds = len(audio) / WHISPER_SAMPLE_RATE
+        if on_decoded: on_decoded(index, audio_seconds)
+        if audio_seconds > BATCH_MAX_CLIP_SECONDS:
+            results[index] = {"error": f"{audio_seconds:.0f} s of audio is too long for a batch"}
+            continue
+        audios.append(audio)
+        indices.append(index)
+        languages.append(None if is_auto_language(source_language) else source_language)
+
+    audio_seconds = sum(len(audio) for audio in audios) / WHISPER_SAMPLE_RATE
+    started = time.perf_counter()
+    with tracing.span("whisper.transcribe_batch", clips=len(audios), audio_seconds=audio_seconds, backend=backend):
+        raw_results = get_backend(backend).transcribe_batch(
+            model, audios, languages, threads=threads, cancel_token=cancel_token,
+            on_item=(lambda position: on_item(indices[position])) if on_item else None)
+    if model_name:
+        default_store().record(rtf_key(model_name, backend), audio_seconds, time.perf_counter() - started)
+    for index, result in zip(indices, raw_results):
+        formatted = format_transcription(result)
+        cue_limits = items[index][2]
+        if cue_limits is not None:
+            formatted["segments"] = resegment(formatted["segments"], cue_limits)
+        results[index] = formatted
+    return results
+
+
+def srt_output_path(media_path, output_dir, lang_code):
+    """Default export name, matching the GUI's "<stem>_subs_<lang>.srt"."""
+    return os.path.join(output_dir, f"{Path(media_path).stem}_subs_{lang_code}.srt")
+
+
+def run_pipeline(media_path, output_dir, model_name=DEFAULT_WHISPER_MODEL, source_language=None,
+                 target_languages=(), on_progress=None, word_timestamps=False, cue_limits=None, cancel_token=None,
+                 backend=DEFAULT_BACKEND, threads=None, refine_model=None, language_id=True, allow_downgrade=True,
+                 translators=None):
+    """Transcribe, translate and export one media file; return the written paths.
+
+    With an automatic source language and language_id, the language is
+    identified first and English files are transcribed with the .en models.
+    The model goes through the memory budget first (admit_model()); the
+    result reports the model actually used and the peak RSS per stage.
+    translators maps target languages to a translator (workers.translators);
+    the others use "auto".
+    """
+    def progress(text):
+        if on_progress: on_progress(text)
+
+    os.makedirs(output_dir, exist_ok=True)
+    with tracing.span("pipeline.run", model=model_name, media=os.path.basename(media_path)), track_memory() as peaks:
+        audio = language_report = None
+        if language_id and is_auto_language(source_language):
+            with memory_stage("language_id"):
+                language_report, audio = detect_media_language(media_path, backend, threads, cancel_token)
+            model_name, source_language, refine_model = route_transcription(model_name, refine_model, language_report)
+            progress(f"Detected language '{language_report['language']}'"
+                     + (" (code-switching)" if language_report["code_switching"] else ""))
+        reservation = admit_model(model_name, backend, threads, allow_downgrade=allow_downgrade,
+                                  cancel_token=cancel_token,
+                                  on_wait=lambda needed, budget: progress(f"Waiting for memory: '{model_name}' needs "
+                                                                          f"about {needed:.0f} MB, {budget:.0f} MB free"))
+        if reservation.model_name != model_name:
+            progress(f"Not enough memory for '{model_name}', using '{reservation.model_name}'")
+            model_name = reservation.model_name
+        progress(f"Transcribing with '{model_name}' ({backend})")
+        with checkout_whisper_model(model_name, backend, threads, reservation) as model:
+            subtitle_data = transcribe_media(model, media_path, source_language, model_name=model_name,
+                                             word_timestamps=word_timestamps, cue_limits=cue_limits,
+                                             cancel_token=cancel_token, backend=backend, threads=threads,
+                                             refine_model=refine_model, audio=audio)
+        del audio  # Not needed for translation
+
+        outputs = []
+        original_path = srt_output_path(media_path, output_dir, subtitle_data["language"])
+        write_srt(subtitle_data["segments"], original_path)
+        outputs.append(original_path)
+        remove_checkpoint(subtitle_data)
+
+        for target_language in target_languages:
+            progress(f"Translating to '{target_language}'")
+            with memory_stage("translate"):
+                translated_data = translate_segments(subtitle_data, target_language, cue_limits=cue_limits,
+                                                     cancel_token=cancel_token, threads=threads,
+                                                     translator=(translators or {}).get(target_language))
+            translated_path = srt_output_path(media_path, output_dir, target_language)
+            write_srt(translated_data["segments"], translated_path)
+            outputs.append(translated_path)
+    relieve_memory_pressure()
+
+    return {"language": subtitle_data["language"], "segments": len(subtitle_data["segments"]), "outputs": outputs,
+            "model": model_name, "memory": {"stages": peaks, "process_peak_mb": peak_rss_mb()}}
+
+
+# --- Job executor entry points (utils.job_executor) ---
+# Each reports progress as event tuples and returns a picklable result, so
+# transcription can run in the executor's inference process.
+
+def transcribe_job(media_path, model_name=DEFAULT_WHISPER_MODEL, source_language=None, word_timestamps=False,
+                   cue_limits=None, backend=DEFAULT_BACKEND, threads=None, refine_model=None, language_id=True,
+                   allow_downgrade=True, progress=None, cancel_token=None):
+    """Transcribe one file; events: ("model_loaded",), ("decoded", audio_seconds), ("progress", processed, total),
+    with refine_model ("refine", done, total, span_seconds), with an automatic source language
+    ("language", code, code_switching, model_name, refine_model) once the language is identified,
+    ("resumed", seconds) when an interrupted run is continued from its checkpoint, and from the memory
+    budget (admit_model) ("memory_wait", needed_mb, budget_mb) and ("downgraded", model_name, smaller_model).
+
+    The result gets "memory" ({"stages": {stage: peak RSS MB}, "process_peak_mb"}) and keeps its
+    "checkpoint" entry; the caller passes it to remove_checkpoint() once the result is stored."""
+    def report(*event):
+        if progress: progress(*event)
+
+    audio = language_report = None
+    with track_memory() as peaks:
+        if language_id and is_auto_language(source_language):
+            with memory_stage("language_id"):
+                language_report, audio = detect_media_language(media_path, backend, threads, cancel_token)
+            model_name, source_language, refine_model = route_transcription(model_name, refine_model, language_report)
+            report("language", language_report["language"], language_report["code_switching"], model_name,
+                   refine_model)
+        reservation = admit_model(model_name, backend, threads, allow_downgrade=allow_downgrade,
+                                  on_wait=lambda needed, budget: report("memory_wait", needed, budget),
+                                  cancel_token=cancel_token)
+        with reservation:  # Held until the load has finished or failed
+            if reservation.model_name != model_name:
+                report("downgraded", model_name, reservation.model_name)
+                model_name = reservation.model_name
+            try:
+                model = acquire_whisper_model(model_name, backend, threads)
+            except ModelStoreError:
+                raise  # Its message says what to do; not a RAM problem
+            except Exception as e:
+                raise ModelLoadError(str(e)) from e
+        report("model_loaded")
+        try:
+            result = transcribe_media(model, media_path, source_language, model_name=model_name,
+                                      on_progress=lambda processed, total: report("progress", processed, total),
+                                      on_decoded=lambda audio_seconds: report("decoded", audio_seconds),
+                                      word_timestamps=word_timestamps, cue_limits=cue_limits,
+                                      cancel_token=cancel_token, backend=backend, threads=threads,
+                                      refine_model=refine_model,
+                                      on_refine=lambda done, total, seconds: report("refine", done, total, seconds),
+                                      audio=audio, on_resumed=lambda seconds: report("resumed", seconds))
+        finally:
+            release_whisper_model(model_name, model, backend, threads)
+    if language_report is not None:
+        result["language_id"] = dict(language_report, model=model_name)
+    result["memory"] = {"stages": peaks, "process_peak_mb": peak_rss_mb()}
+    relieve_memory_pressure()
+    return result
+
+
+def transcribe_batch_job(items, model_name=DEFAULT_WHISPER_MODEL, backend=DEFAULT_BACKEND, threads=None,
+                         allow_downgrade=True, progress=None, cancel_token=None):
+    """transcribe_batch_media(); events: ("model_loaded",), ("decoded", index, audio_seconds), ("item_done", index),
+    and ("memory_wait", needed_mb, budget_mb), ("downgraded", model_name, smaller_model) as for transcribe_job()."""
+    def report(*event):
+        if progress: progress(*event)
+
+    reservation = admit_model(model_name, backend, threads, allow_downgrade=allow_downgrade,
+                              on_wait=lambda needed, budget: report("memory_wait", needed, budget),
+                              cancel_token=cancel_token)
+    with reservation:  # Held until the load has finished or failed
+        if reservation.model_name != model_name:
+            report("downgraded", model_name, reservation.model_name)
+            model_name = reservation.model_name
+        try:
+            model = acquire_whisper_model(model_name, backend, threads)
+        except ModelStoreError:
+            raise  # Its message says what to do; not a RAM problem
+        except Exception as e:
+            raise ModelLoadError(str(e)) from e
+    report("model_loaded")
+    try:
+        return transcribe_batch_media(model, items, model_name=model_name, backend=backend, threads=threads,
+                                      on_decoded=lambda index, seconds: report("decoded", index, seconds),
+                                      on_item=lambda index: report("item_done", index), cancel_token=cancel_token)
+    finally:
+        release_whisper_model(model_name, model, backend, threads)
+        relieve_memory_pressure()
+
+
+def transcript_key(subtitle_data):
+    """Content key of a transcription for job deduplication, valid across processes (unlike id())."""
+    full_text = subtitle_data.get("text", "") or ""
+    return (as_segment_table(subtitle_data["segments"]).digest(), subtitle_data.get("language"),
+            hashlib.blake2b(full_text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest())
+
+
+def translate_job(subtitle_data, target_language, cue_limits=None, translator=None, threads=None, progress=None,
+                  cancel_token=None):
+    """translate_segments(); events: ("progress", value, text), ("warning", message)."""
+    def report(*event):
+        if progress: progress(*event)
+
+    return translate_segments(subtitle_data, target_language,
+                              on_progress=lambda value, text: report("progress", value, text),
+                              on_warning=lambda message: report("warning", message),
+                              cue_limits=cue_limits, cancel_token=cancel_token, translator=translator,
+                              threads=threads)
+
+
+def retranslate_job(texts, source_language, target_language, translator=None, cue_limits=None, threads=None,
+                    progress=None, cancel_token=None):
+    """retranslate_texts(); events: ("warning", message)."""
+    return retranslate_texts(texts, source_language, target_language, translator=translator, cue_limits=cue_limits,
+                             threads=threads, on_warning=(lambda message: progress("warning", message)) if progress else None,
+                             cancel_token=cancel_token)
+
+
+def summarize_job(text, api_key, progress=None, cancel_token=None):
+    """summarize_text(); events: ("progress", value, text)."""
+    return summarize_text(text, api_key, on_progress=(lambda value, message: progress("progress", value, message)) if progress else None,
+                          cancel_token=cancel_token)
+
+
+def preload_job(model_name=DEFAULT_WHISPER_MODEL, backend=DEFAULT_BACKEND, threads=None, progress=None,
+                cancel_token=None):
+    """Load a model into the model cache of the process that runs it (the inference service's warm start)."""
+    check(cancel_token)
+    release_whisper_model(model_name, acquire_whisper_model(model_name, backend, threads), backend, threads)
+    return model_name
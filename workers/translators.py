@@ -0,0 +1,238 @@
+"""Machine-translation backends.
+
+translate_segments() (workers.pipeline) hands the cue texts of a
+transcription to one of:
+
+    google   Google Translate through deep_translator: online, one request
+             per cue, subject to the service's rate limits
+    marian   OPUS-MT (Marian) language-pair models converted to CTranslate2,
+             run on the CPU with int8 weights: cues are translated in
+             batches on several threads, without a network
+
+Local models live in the model store (utils.model_store, kind "mt", one
+directory per pair such as mt/en-fr/); model_store.py download-mt en fr
+fetches and converts one, model_store.py import adds converted ones.
+
+The backend is chosen per target language: translator_for() takes the
+caller's choice, and "auto" (or None) uses the local model when one is
+stored for the pair and Google otherwise (an error when offline).
+"""
+import os
+import shutil
+import tempfile
+import threading
+
+from utils import tracing
+from utils.cancellation import check
+from utils.model_store import MT_KIND, ModelStoreError, default_model_store, offline
+from utils.warmup import missing_dependencies
+
+AUTO_TRANSLATOR = "auto"
+GOOGLE_TRANSLATOR = "google"
+MARIAN_TRANSLATOR = "marian"
+MT_BATCH_SIZE = 32  # Cues per CTranslate2 batch
+MT_CHUNK_CUES = 128  # Cues per translate_batch call: progress and cancellation granularity
+MT_BEAM_SIZE = 2  # Decoding time grows with the beam; cue-length sentences gain little from wider beams
+MT_MAX_DECODING_LENGTH = 256
+OPUS_MT_REPO = "Helsinki-NLP/opus-mt-{source}-{target}"
+
+
+def map_whisper_to_google_lang_code(whisper_code):
+    # Mapping des codes de langue Whisper vers les codes Google Translate
+    mapping = {
+        "zh": "zh-CN",  # Chinois simplifié par défaut
+        "zh-cn": "zh-CN",
+        "zh-tw": "zh-TW",
+        "ko": "ko",
+        "ja": "ja",
+        "en": "en",
+        "fr": "fr",
+        "de": "de",
+        "es": "es",
+        "it": "it",
+        "pt": "pt",
+        "nl": "nl",
+        "ru": "ru",
+        "ar": "ar",
+        "hi": "hi",
+        "auto": "auto"
+    }
+    return mapping.get(whisper_code.lower(), "auto")
+
+
+def language_pair(source, target):
+    """Model store name of a language pair: Whisper/Google codes reduced to their language ("zh-CN" -> "zh")."""
+    return f"{source.split('-')[0].lower()}-{target.split('-')[0].lower()}"
+
+
+class TranslationBackend:
+    name = None
+    label = None
+    requires = ()  # Modules the backend imports
+    online = False
+    translates_full_text = False  # True: the transcript's full text is translated too, else the cues are joined
+
+    def available(self):
+        return not missing_dependencies(self.requires)
+
+    def has_pair(self, source, target):
+        return True
+
+    def translate_batch(self, texts, source, target, threads=None, on_done=None, on_warning=None, cancel_token=None):
+        """Translate texts (source is a Whisper language code); returns the translations in order.
+
+        on_done(count) reports how many texts are done, on_warning(message)
+        a text that could not be translated (it is kept as it was).
+        """
+        raise NotImplementedError
+
+    def translate_text(self, text, source, target):
+        return self.translate_batch([text], source, target)[0]
+
+
+class GoogleTranslatorBackend(TranslationBackend):
+    name = GOOGLE_TRANSLATOR
+    label = "Google Translate (online)"
+    requires = ("deep_translator",)
+    online = True
+    translates_full_text = True
+
+    def __init__(self, factory=None):
+        self.factory = factory  # factory(source=..., target=...) -> object with translate(text)
+
+    def _translator(self, source, target, on_warning=None):
+        factory = self.factory
+        if factory is None:
+            from deep_translator import GoogleTranslator
+            factory = GoogleTranslator
+        source_lang = map_whisper_to_google_lang_code(source or "auto")
+        try:
+            return factory(source=source_lang, target=target)
+        except Exception:
+            # Si la langue source pose problème, essayer avec 'auto'
+            if on_warning: on_warning(f"Warning: Using auto-detection instead of {source_lang}")
+            return factory(source="auto", target=target)
+
+    def translate_batch(self, texts, source, target, threads=None, on_done=None, on_warning=None, cancel_token=None):
+        translator = self._translator(source, target, on_warning)
+        translated = []
+        for i, text in enumerate(texts):
+            check(cancel_token)
+            try:
+                with tracing.span("translate.request", chars=len(text)):
+                    translated_text = translator.translate(text) if text else ""
+            except Exception as e:
+                if on_warning: on_warning(f"Warning: Error translating segment {i+1}: {str(e)}")
+                translated_text = text  # Garder le texte original en cas d'erreur
+            translated.append(translated_text or "")
+            if on_done: on_done(i + 1)
+        return translated
+
+    def translate_text(self, text, source, target):
+        return self._translator(source, target).translate(text)
+
+
+class MarianTranslatorBackend(TranslationBackend):
+    name = MARIAN_TRANSLATOR
+    label = "Local OPUS-MT model (offline)"
+    requires = ("ctranslate2", "sentencepiece")
+
+    def __init__(self):
+        self._models = {}  # (pair, threads) -> (ctranslate2.Translator, source spm, target spm)
+        self._lock = threading.Lock()
+
+    def has_pair(self, source, target):
+        if not source or source.lower() == "auto":
+            return False
+        return default_model_store().model_path(MT_KIND, language_pair(source, target)) is not None
+
+    def _load(self, pair, threads):
+        key = (pair, threads)
+        with self._lock:
+            if key in self._models:
+                return self._models[key]
+        path = default_model_store().require(MT_KIND, pair)
+        if path is None:
+            raise ModelStoreError(f"No offline translation model for '{pair}'; "
+                                  f"get one with: python model_store.py download-mt {pair.replace('-', ' ')}")
+        import ctranslate2
+        import sentencepiece
+        with tracing.span("translate.model_load", pair=pair):
+            translator = ctranslate2.Translator(path, device="cpu", compute_type="int8", inter_threads=1,
+                                                intra_threads=threads or 0)  # 0: all cores
+            source_spm = sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, "source.spm"))
+            target_spm = sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, "target.spm"))
+        with self._lock:
+            return self._models.setdefault(key, (translator, source_spm, target_spm))
+
+    def translate_batch(self, texts, source, target, threads=None, on_done=None, on_warning=None, cancel_token=None):
+        if not source or source.lower() == "auto":
+            raise ValueError("The local translator needs the source language (transcribe with language detection)")
+        translator, source_spm, target_spm = self._load(language_pair(source, target), threads)
+        translated = list(texts)
+        pending = [i for i, text in enumerate(texts) if text]
+        done = len(texts) - len(pending)
+        for start in range(0, len(pending), MT_CHUNK_CUES):
+            check(cancel_token)
+            indexes = pending[start:start + MT_CHUNK_CUES]
+            tokens = [source_spm.encode(texts[i], out_type=str) + ["</s>"] for i in indexes]
+            with tracing.span("translate.batch", cues=len(indexes)):
+                results = translator.translate_batch(tokens, max_batch_size=MT_BATCH_SIZE, beam_size=MT_BEAM_SIZE,
+                                                     max_decoding_length=MT_MAX_DECODING_LENGTH)
+            for i, result in zip(indexes, results):
+                translated[i] = target_spm.decode(result.hypotheses[0])
+            done += len(indexes)
+            if on_done: on_done(done)
+        return translated
+
+
+TRANSLATORS = {backend.name: backend for backend in (GoogleTranslatorBackend(), MarianTranslatorBackend())}
+
+
+def parse_target(text):
+    """"fr" or "fr:marian" (command lines) -> (target language, translator or None)."""
+    target, _, choice = text.partition(":")
+    if choice and choice != AUTO_TRANSLATOR:
+        get_translator(choice)
+    return target, choice or None
+
+
+def get_translator(name):
+    try:
+        return TRANSLATORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown translator '{name}' (choose from {', '.join([AUTO_TRANSLATOR] + list(TRANSLATORS))})") from None
+
+
+def translator_for(source, target, choice=None):
+    """Backend translating source -> target: the one chosen, or with "auto" the local model if one is stored."""
+    if choice and choice != AUTO_TRANSLATOR:
+        return get_translator(choice)
+    local = TRANSLATORS[MARIAN_TRANSLATOR]
+    if local.available() and local.has_pair(source, target):
+        return local
+    if offline():
+        raise ModelStoreError(f"Offline and no local translation model for '{language_pair(source or 'auto', target)}'")
+    return TRANSLATORS[GOOGLE_TRANSLATOR]
+
+
+def download_mt_model(source, target, store=None):
+    """Download the OPUS-MT model of a language pair, convert it to int8 CTranslate2 and add it to the model store."""
+    if offline():
+        raise ModelStoreError("Downloads are disabled (CAPTIONLAB_OFFLINE=1)")
+    missing = missing_dependencies(("ctranslate2", "transformers", "sentencepiece"))
+    if missing:
+        raise ModelStoreError(f"Converting OPUS-MT models needs {', '.join(missing)} (pip install ctranslate2 "
+                              f"transformers sentencepiece)")
+    from ctranslate2.converters import TransformersConverter
+    store = store or default_model_store()
+    pair = language_pair(source, target)
+    tmp_dir = tempfile.mkdtemp(prefix="captionlab-mt-")
+    try:
+        output_dir = os.path.join(tmp_dir, f"opus-mt-{pair}")
+        converter = TransformersConverter(OPUS_MT_REPO.format(source=pair.split("-")[0], target=pair.split("-")[1]),
+                                          copy_files=["source.spm", "target.spm"])
+        converter.convert(output_dir, quantization="int8")
+        return store.import_directory(tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)